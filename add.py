@@ -1,262 +1,40 @@
-import streamlit as st
-from docx import Document
-from docx.shared import Pt, Cm
-from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
-import tempfile
 import os
-import zipfile
-import io
-from datetime import datetime
-import locale
-
-# Configurar localização para português do Brasil
-try:
-    locale.setlocale(locale.LC_TIME, 'pt_BR.UTF-8')
-except:
-    try:
-        locale.setlocale(locale.LC_TIME, 'Portuguese_Brazil.1252')
-    except:
-        pass  # Fallback para a localização padrão se pt_BR não estiver disponível
-
-# Função para formatar o número do ofício com o ano atual
-def formatar_numero_oficio(numero):
-    ano_atual = datetime.now().year
-    return f"{numero}/{ano_atual}"
-
-# Função para obter data formatada em português do Brasil
-def formatar_data_ptbr(data):
-    try:
-        # Tentativa de formatar com locale
-        return data.strftime("%d de %B de %Y").lower()
-    except:
-        # Fallback para manual mapping se o locale não funcionar
-        meses = {
-            1: "janeiro", 2: "fevereiro", 3: "março", 4: "abril",
-            5: "maio", 6: "junho", 7: "julho", 8: "agosto",
-            9: "setembro", 10: "outubro", 11: "novembro", 12: "dezembro"
-        }
-        return f"{data.day} de {meses[data.month]} de {data.year}"
-
-# Função para formatar o documento
-def formatar_documento(doc):
-    # Estilo para todo o documento
-    style = doc.styles['Normal']
-    font = style.font
-    font.name = 'Arial'
-    font.size = Pt(12)
-    
-    # Configurar margens (em cm)
-    sections = doc.sections
-    for section in sections:
-        section.top_margin = Cm(2.5)
-        section.bottom_margin = Cm(2.5)
-        section.left_margin = Cm(3)
-        section.right_margin = Cm(2)
-    
-    return doc
-
-# Função para adicionar parágrafo com espaçamento controlado
-def adicionar_paragrafo(doc, texto, bold=False, italic=False, alignment=WD_PARAGRAPH_ALIGNMENT.LEFT, espacamento_antes=0, espacamento_depois=0):
-    paragraph = doc.add_paragraph()
-    paragraph.alignment = alignment
-    run = paragraph.add_run(texto)
-    run.bold = bold
-    run.italic = italic
-    
-    # Ajustar espaçamento se fornecido
-    if espacamento_antes > 0 or espacamento_depois > 0:
-        paragraph_format = paragraph.paragraph_format
-        paragraph_format.space_before = Pt(espacamento_antes)
-        paragraph_format.space_after = Pt(espacamento_depois)
-        
-    return paragraph
-
-# Função para criar ofício modelo de comunicação de arquivamento
-def criar_oficio_arquivamento(numero_oficio, data, numero_idea):
-    doc = Document()
-    doc = formatar_documento(doc)
-    
-    # Número do ofício com ano atual - ALINHADO À ESQUERDA
-    adicionar_paragrafo(doc, f"OFÍCIO Nº {formatar_numero_oficio(numero_oficio)}/SP-FSA/25ªPJ", 
-                    bold=True, alignment=WD_PARAGRAPH_ALIGNMENT.LEFT, espacamento_depois=6)
-    
-    # Referência IDEA - ALINHADO À ESQUERDA
-    adicionar_paragrafo(doc, f"(Ref.: IDEA nº {numero_idea}/{datetime.now().year})", 
-                    bold=True, italic=True, alignment=WD_PARAGRAPH_ALIGNMENT.LEFT, espacamento_depois=12)
-    
-    # Local e data - ALINHADO À DIREITA
-    adicionar_paragrafo(doc, f"Feira de Santana, {data}", alignment=WD_PARAGRAPH_ALIGNMENT.RIGHT, espacamento_depois=12)
-    
-    # Destinatário (sem espaçamento entre linhas)
-    adicionar_paragrafo(doc, "A Sua Excelência a Senhora", espacamento_depois=0)
-    adicionar_paragrafo(doc, "MARIA CLÉCIA VASCONCELOS DE MORAIS FIRMINO COSTA", bold=True, espacamento_depois=0)
-    adicionar_paragrafo(doc, "Delegacia Especializada de Atendimento à Mulher de Feira de Santana --", espacamento_depois=0)
-    adicionar_paragrafo(doc, "DEAM", espacamento_depois=0)
-    adicionar_paragrafo(doc, "Avenida Maria Quitéria nº 1870, Centro", espacamento_depois=0)
-    adicionar_paragrafo(doc, "Feira de Santana -- Bahia, CEP: 44001-344", espacamento_depois=0)
-    adicionar_paragrafo(doc, "E-mail: deam.feiradesantana@pcivil.ba.gov.br", espacamento_depois=12)
-    
-    # Vocativo
-    adicionar_paragrafo(doc, "Excelentíssima Senhora,", espacamento_depois=12)
-    
-    # Conteúdo - JUSTIFICADO
-    conteudo = (
-        "Com os nossos cordiais cumprimentos, DE ORDEM DE DRA. NAYARA VALTÉRCIA "
-        "GONÇALVES BARRETO, Promotora de Justiça titular da 25ª Promotoria de "
-        "Justiça, sirvo-me do presente para, atendendo ao quanto disposto no art. "
-        "28 do Código de Processo Penal, comunicar a Vossa Excelência o "
-        f"ARQUIVAMENTO do Inquérito Policial IDEA nº {numero_idea}/{datetime.now().year}, consoante "
-        "Promoção anexa."
-    )
-    adicionar_paragrafo(doc, conteudo, alignment=WD_PARAGRAPH_ALIGNMENT.JUSTIFY, espacamento_depois=12)
-    
-    # Despedida
-    adicionar_paragrafo(doc, "Cordialmente,", alignment=WD_PARAGRAPH_ALIGNMENT.CENTER, espacamento_depois=18)
-    
-    # Assinatura - CENTRALIZADA sem espaçamento
-    adicionar_paragrafo(doc, "(assinado eletronicamente)", alignment=WD_PARAGRAPH_ALIGNMENT.CENTER, espacamento_depois=0)
-    adicionar_paragrafo(doc, "ANDERSON MELO FIUSA BASTOS", bold=True, alignment=WD_PARAGRAPH_ALIGNMENT.CENTER, espacamento_depois=0)
-    adicionar_paragrafo(doc, "Secretaria Processual", alignment=WD_PARAGRAPH_ALIGNMENT.CENTER)
-    
-    # Criar arquivo temporário
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".docx")
-    doc.save(temp_file.name)
-    
-    return temp_file.name
-
-# Função para criar ofício de notificação para vítima (ofício 2)
-def criar_oficio_notificacao_vitima(numero_oficio, data, numero_idea, nome_vitima, endereco, telefone):
-    doc = Document()
-    doc = formatar_documento(doc)
-    
-    # Número do ofício - ALINHADO À ESQUERDA
-    adicionar_paragrafo(doc, f"OFÍCIO Nº {formatar_numero_oficio(numero_oficio)}/SP-FSA/25ªPJ", 
-                    bold=True, alignment=WD_PARAGRAPH_ALIGNMENT.LEFT, espacamento_depois=6)
-
-    # Referência IDEA - ALINHADO À ESQUERDA
-    adicionar_paragrafo(doc, f"(Ref.: IDEA nº {numero_idea}/{datetime.now().year})", 
-                    bold=True, italic=True, alignment=WD_PARAGRAPH_ALIGNMENT.LEFT, espacamento_depois=12)
-    
-    # Local e data - ALINHADO À DIREITA
-    adicionar_paragrafo(doc, f"Feira de Santana, {data}", alignment=WD_PARAGRAPH_ALIGNMENT.RIGHT, espacamento_depois=12)
-    
-    # Destinatário (sem espaçamento entre linhas)
-    adicionar_paragrafo(doc, "A Sua Senhoria", espacamento_depois=0)
-    adicionar_paragrafo(doc, f"{nome_vitima}", espacamento_depois=0)
-    adicionar_paragrafo(doc, f"{endereco}", espacamento_depois=0)
-    
-    if telefone:
-        adicionar_paragrafo(doc, f"Tel: {telefone}", espacamento_depois=0)
-    
-    # Adicionar espaçamento após o bloco de destinatário
-    adicionar_paragrafo(doc, "", espacamento_depois=12)
-    
-    # Vocativo
-    adicionar_paragrafo(doc, "Ilustríssima Senhora,", espacamento_depois=12)
-    
-    # Conteúdo fixo para o ofício 2 - JUSTIFICADO
-    conteudo = (
-        "Com os nossos cordiais cumprimentos, DE ORDEM DE DRA. NAYARA VALTÉRCIA "
-        "GONÇALVES BARRETO, Promotora de Justiça titular da 25ª Promotoria de "
-        "Justiça de Feira de Santana, sirvo-me do presente para Notificá-la acerca "
-        f"do ARQUIVAMENTO do Inquérito Policial IDEA nº {numero_idea}/{datetime.now().year}, "
-        "no qual a Vossa Senhoria figura como vítima, consoante Promoção anexa."
-    )
-    adicionar_paragrafo(doc, conteudo, alignment=WD_PARAGRAPH_ALIGNMENT.JUSTIFY, espacamento_depois=12)
-    
-    conteudo2 = (
-        "Em não concordando com o arquivamento do expediente criminal em questão, "
-        "poderá, no prazo de 30 (trinta) dias a contar do recebimento do presente, "
-        "encaminhar recurso dirigido à Procuradoria-Geral de Justiça, nos termos "
-        "do art. 28, §1º, do Código de Processo Penal). Para tanto, recomendamos "
-        "que procure orientação jurídica adequada para o exercício desse direito."
-    )
-    adicionar_paragrafo(doc, conteudo2, alignment=WD_PARAGRAPH_ALIGNMENT.JUSTIFY, espacamento_depois=12)
-    
-    conteudo3 = (
-        "Por fim, requer que a resposta, se for o caso, seja enviada, preferencialmente, "
-        "por meio eletrônico para o endereço de e-mail: sp.feiradesantana@mpba.mp.br."
-    )
-    adicionar_paragrafo(doc, conteudo3, alignment=WD_PARAGRAPH_ALIGNMENT.JUSTIFY, espacamento_depois=12)
-    
-    # Despedida
-    adicionar_paragrafo(doc, "Atenciosamente,", alignment=WD_PARAGRAPH_ALIGNMENT.CENTER, espacamento_depois=18)
-    
-    # Assinatura - CENTRALIZADA sem espaçamento
-    adicionar_paragrafo(doc, "(assinado eletronicamente)", alignment=WD_PARAGRAPH_ALIGNMENT.CENTER, espacamento_depois=0)
-    adicionar_paragrafo(doc, "ANDERSON MELO FIUSA BASTOS", bold=True, alignment=WD_PARAGRAPH_ALIGNMENT.CENTER, espacamento_depois=0)
-    adicionar_paragrafo(doc, "Secretaria Processual", alignment=WD_PARAGRAPH_ALIGNMENT.CENTER)
-    
-    # Criar arquivo temporário
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".docx")
-    doc.save(temp_file.name)
-    
-    return temp_file.name
+import uuid
+from datetime import date
+from functools import partial
+import streamlit as st
+from metricas import resumo
+from lote import preparar_casos, usos_do_lote, OFICIOS_POR_CASO, FORMATOS_LOTE
+from validacao import importar_planilha
+from modelos import MODELOS
+from numeracao import reservar_numeros, registrar_usos, proximo_numero, numeros_do_caso
+from historico import buscar_oficios, obter_conteudo, versao_producao
+from tarefas import (
+    FilaTarefas,
+    enviar_tarefa,
+    listar_tarefas,
+    ler_resultado,
+    ler_oficio_do_resultado,
+    oficios_do_resultado,
+    PENDENTE,
+    EXECUTANDO,
+    CONCLUIDA,
+    ERRO,
+)
+from oficios import (
+    formatar_numero_oficio,
+    formatar_data_ptbr,
+    DIRETORIO_CACHE,
+)
 
-# Função para criar ofício de notificação para o acusado (ofício 3)
-def criar_oficio_notificacao_acusado(numero_oficio, data, numero_idea, nome_acusado, endereco, telefone):
-    doc = Document()
-    doc = formatar_documento(doc)
-    
-    # Número do ofício - ALINHADO À ESQUERDA
-    adicionar_paragrafo(doc, f"OFÍCIO Nº {formatar_numero_oficio(numero_oficio)}/SP-FSA/25ªPJ", 
-                    bold=True, alignment=WD_PARAGRAPH_ALIGNMENT.LEFT, espacamento_depois=6)
+# Nome de cada opção de formato dos arquivos gerados (ver lote.FORMATOS_LOTE)
+ROTULOS_FORMATOS = {"docx": "Word (.docx)", "pdf": "PDF", "ambos": "Word (.docx) e PDF"}
 
-    # Referência IDEA - ALINHADO À ESQUERDA
-    adicionar_paragrafo(doc, f"(Ref.: IDEA nº {numero_idea}/{datetime.now().year})", 
-                    bold=True, italic=True, alignment=WD_PARAGRAPH_ALIGNMENT.LEFT, espacamento_depois=12)
-    
-    # Local e data - ALINHADO À DIREITA
-    adicionar_paragrafo(doc, f"Feira de Santana, {data}", alignment=WD_PARAGRAPH_ALIGNMENT.RIGHT, espacamento_depois=12)
-    
-    # Destinatário (sem espaçamento entre linhas)
-    adicionar_paragrafo(doc, "A Sua Senhoria", espacamento_depois=0)
-    adicionar_paragrafo(doc, f"{nome_acusado}", espacamento_depois=0)
-    adicionar_paragrafo(doc, f"{endereco}", espacamento_depois=0)
-    
-    if telefone:
-        adicionar_paragrafo(doc, f"Tel: {telefone}", espacamento_depois=0)
-    
-    # Adicionar espaçamento após o bloco de destinatário
-    adicionar_paragrafo(doc, "", espacamento_depois=12)
-    
-    # Vocativo
-    adicionar_paragrafo(doc, "Ilustríssimo Senhor,", espacamento_depois=12)
-    
-    # Conteúdo fixo para o ofício 3 - JUSTIFICADO
-    conteudo = (
-        "Com os nossos cordiais cumprimentos, DE ORDEM DE DRA. NAYARA VALTÉRCIA "
-        "GONÇALVES BARRETO, Promotora de Justiça titular da 25ª Promotoria de "
-        "Justiça de Feira de Santana, sirvo-me do presente para Notificá-lo acerca "
-        f"do ARQUIVAMENTO do Inquérito Policial IDEA Nº {numero_idea}/{datetime.now().year}."
-    )
-    adicionar_paragrafo(doc, conteudo, alignment=WD_PARAGRAPH_ALIGNMENT.JUSTIFY, espacamento_depois=12)
-    
-    # Despedida
-    adicionar_paragrafo(doc, "Atenciosamente,", alignment=WD_PARAGRAPH_ALIGNMENT.CENTER, espacamento_depois=18)
-    
-    # Assinatura - CENTRALIZADA sem espaçamento
-    adicionar_paragrafo(doc, "(assinado eletronicamente)", alignment=WD_PARAGRAPH_ALIGNMENT.CENTER, espacamento_depois=0)
-    adicionar_paragrafo(doc, "ANDERSON MELO FIUSA BASTOS", bold=True, alignment=WD_PARAGRAPH_ALIGNMENT.CENTER, espacamento_depois=0)
-    adicionar_paragrafo(doc, "Secretaria Processual", alignment=WD_PARAGRAPH_ALIGNMENT.CENTER)
-    
-    # Criar arquivo temporário
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".docx")
-    doc.save(temp_file.name)
-    
-    return temp_file.name
-
-# Função para criar um arquivo ZIP com os ofícios
-def criar_zip_oficios(arquivos):
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
-        for nome_arquivo, caminho_arquivo in arquivos.items():
-            # Adicionar cada arquivo ao ZIP com nome adequado
-            with open(caminho_arquivo, "rb") as f:
-                zip_file.writestr(f"{nome_arquivo}.docx", f.read())
-    
-    zip_buffer.seek(0)
-    return zip_buffer
+# Tipo MIME dos arquivos baixados, pela extensão
+TIPOS_MIME = {
+    ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    ".pdf": "application/pdf",
+}
 
 # Inicializar o estado da sessão para armazenar os dados dos ofícios
 if "dados_oficios" not in st.session_state:
@@ -265,27 +43,78 @@ if "dados_oficios" not in st.session_state:
 # Interface do Streamlit
 st.set_page_config(page_title="Gerador de Ofícios - MPBA", layout="wide")
 
+# Fila de tarefas de geração compartilhada entre as sessões. Os processos da fila usam
+# o cache de ofícios prontos em disco, também compartilhado entre eles.
+@st.cache_resource
+def obter_fila_tarefas():
+    return FilaTarefas(diretorio_cache=os.path.join(DIRETORIO_CACHE, "documentos")).iniciar()
+
+obter_fila_tarefas()
+
+# Painel de produção, montado a partir dos totais pré-somados do histórico. Os gráficos são
+# desenhados uma única vez por versão dos dados e semana (compartilhados entre as sessões) e só
+# são refeitos quando novos ofícios são registrados ou quando começa uma nova semana, que
+# desloca a janela do painel.
+@st.cache_data(max_entries=4, show_spinner=False)
+def obter_painel_producao(versao, semana):
+    from estatisticas import painel_producao
+    return painel_producao()
+
+# Função para mostrar o próximo número livre na numeração compartilhada do ano atual
+def mostrar_proximo_numero():
+    ano = date.today().year
+    proximo = proximo_numero(ano)
+    if proximo is not None:
+        st.caption(f"Próximo número livre na numeração de {ano}: {proximo}")
+
+# Identificador desta sessão na fila de tarefas. Fica no endereço da página, então as
+# gerações enviadas continuam visíveis depois de recarregar a página.
+if "sessao" not in st.query_params:
+    st.query_params["sessao"] = uuid.uuid4().hex
+dono_sessao = st.query_params["sessao"]
+
 st.title("Gerador de Ofícios Automáticos - MPBA")
 st.write("Preencha os dados abaixo para gerar os ofícios.")
 
 # Criar abas para cada ofício
-tab1, tab2, tab3 = st.tabs([
+tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
     "Ofício 1 - Comunicação à Delegacia", 
     "Ofício 2 - Notificação à Vítima", 
-    "Ofício 3 - Notificação ao Acusado"
+    "Ofício 3 - Notificação ao Acusado",
+    "Geração em Lote",
+    "Consultar Ofícios Emitidos",
+    "Estatísticas de Produção"
 ])
 
 with tab1:
     st.subheader("Dados do Ofício 1 - Comunicação de Arquivamento à Delegacia")
+    mostrar_proximo_numero()
     
     with st.form("dados_oficio_1"):
         numero_oficio = st.text_input("Número do Ofício", "4886")
         data_oficio = st.date_input("Data do Ofício")
         idea_numero = st.text_input("Número IDEA (número do processo)", "596.9.489799")
+        reservar_automatico = st.checkbox(
+            "Reservar numeração automaticamente", value=True,
+            help="Reserva três números seguidos na numeração compartilhada do ano. "
+                 "O número digitado só é usado no primeiro ofício do ano."
+        )
         
         submit_1 = st.form_submit_button("Salvar Dados do Ofício 1")
     
     if submit_1:
+        # Reservar três números seguidos na numeração do ano (uma única vez por caso)
+        if reservar_automatico:
+            reserva = st.session_state.get("reserva_numeros")
+            if not reserva or reserva["ano"] != data_oficio.year:
+                numero_sugerido = numero_oficio.strip() if numero_oficio.strip().isdigit() else None
+                reserva = {
+                    "ano": data_oficio.year,
+                    "inicio": reservar_numeros(OFICIOS_POR_CASO, data_oficio.year, numero_sugerido)
+                }
+                st.session_state.reserva_numeros = reserva
+            numero_oficio = str(reserva["inicio"])
+        
         # Calcular os números sequenciais para os outros ofícios
         try:
             num_oficio_1 = int(numero_oficio)
@@ -303,6 +132,7 @@ with tab1:
         st.session_state.dados_oficios["oficio_1"] = {
             "numero_oficio": numero_oficio,
             "data_oficio": data_formatada,
+            "data_referencia": data_oficio,
             "idea_numero": idea_numero
         }
         
@@ -375,11 +205,174 @@ with tab3:
         }
         st.success("Dados do Ofício 3 salvos!")
 
-# Mostrar o status atual dos dados salvos
+with tab4:
+    st.subheader("Geração em Lote a partir de Planilha")
+    mostrar_proximo_numero()
+    st.write(
+        "Envie uma planilha CSV ou XLSX com uma linha por caso e as colunas: "
+        "idea_numero, nome_vitima, endereco_vitima, telefone_vitima, "
+        "nome_acusado, endereco_acusado, telefone_acusado."
+    )
+    
+    with st.form("dados_lote"):
+        planilha = st.file_uploader("Planilha de casos", type=["csv", "xlsx"])
+        numero_inicial_lote = st.text_input("Número do Primeiro Ofício", "4886")
+        data_lote = st.date_input("Data dos Ofícios")
+        reservar_lote = st.checkbox(
+            "Reservar numeração automaticamente", value=True,
+            help="Reserva a faixa de números do lote na numeração compartilhada do ano. "
+                 "O número digitado só é usado no primeiro ofício do ano."
+        )
+        arquivo_impressao = st.checkbox(
+            "Gerar também um arquivo único para impressão", value=False,
+            help="Junta todos os ofícios do lote em um só .docx, cada um começando em uma nova página."
+        )
+        formato_lote = st.radio(
+            "Formato dos arquivos no ZIP", list(FORMATOS_LOTE), format_func=ROTULOS_FORMATOS.get, horizontal=True,
+            help="Os PDFs são gerados direto pelo sistema, prontos para envio por e-mail."
+        )
+        
+        submit_lote = st.form_submit_button("Gerar Ofícios do Lote")
+    
+    if submit_lote:
+        if planilha is None:
+            st.warning("Envie a planilha de casos antes de gerar o lote!")
+        elif not reservar_lote and not numero_inicial_lote.strip().isdigit():
+            st.warning("O número do primeiro ofício deve ser um número inteiro.")
+        else:
+            try:
+                importacao = importar_planilha(
+                    planilha, ano=data_lote.year,
+                    numero_inicial=None if reservar_lote else int(numero_inicial_lote.strip())
+                )
+            except ValueError as erro:
+                st.error(str(erro))
+            else:
+                linhas_casos = importacao.casos
+                if not linhas_casos:
+                    st.warning("A planilha não possui casos.")
+                    st.stop()
+                if len(importacao.avisos):
+                    st.warning(f"{len(importacao.avisos)} avisos na planilha (o lote será gerado mesmo assim):")
+                    st.dataframe(importacao.avisos, hide_index=True)
+                # Todos os problemas são mostrados de uma vez; nada é reservado nem gerado
+                if len(importacao.erros):
+                    st.error(
+                        f"A planilha possui {len(importacao.erros)} problemas. "
+                        "Corrija as linhas indicadas e envie-a novamente."
+                    )
+                    st.dataframe(importacao.erros, hide_index=True)
+                    st.stop()
+                
+                numero_inicial = numero_inicial_lote.strip()
+                if reservar_lote:
+                    numero_inicial = reservar_numeros(
+                        len(linhas_casos) * OFICIOS_POR_CASO, data_lote.year,
+                        numero_inicial if numero_inicial.isdigit() else None
+                    )
+                casos = preparar_casos(linhas_casos, numero_inicial, data_lote)
+                ultimo_numero = int(numero_inicial) + len(casos) * OFICIOS_POR_CASO - 1
+                
+                conflitos = registrar_usos(data_lote.year, usos_do_lote(casos))
+                if conflitos:
+                    st.warning(
+                        f"{len(conflitos)} números já estavam registrados para outros casos: "
+                        + ", ".join(str(conflito["numero"]) for conflito in conflitos[:20])
+                    )
+                
+                # A geração roda na fila de tarefas; o andamento aparece abaixo das abas
+                enviar_tarefa(
+                    dono_sessao, f"Lote com {len(casos)} casos (ofícios nº {numero_inicial} a {ultimo_numero})",
+                    casos, data_lote, impressao=arquivo_impressao, formatos=FORMATOS_LOTE[formato_lote]
+                )
+                obter_fila_tarefas().avisar()
+                st.success(f"{len(casos)} casos enviados para geração (ofícios nº {numero_inicial} a {ultimo_numero}).")
+
+with tab5:
+    st.subheader("Consultar Ofícios Emitidos")
+    st.write("Busque pelo número IDEA, pelo número do ofício ou pelo nome do destinatário.")
+    
+    busca_col1, busca_col2 = st.columns([3, 1])
+    with busca_col1:
+        termo_busca = st.text_input("Buscar", key="termo_busca")
+    with busca_col2:
+        filtrar_data = st.checkbox("Filtrar por data", key="filtrar_data_busca")
+        data_busca = st.date_input("Data dos Ofícios", key="data_busca", disabled=not filtrar_data)
+    
+    if termo_busca.strip() or filtrar_data:
+        resultados = buscar_oficios(termo_busca, data_busca if filtrar_data else None)
+        if not resultados:
+            st.info("Nenhum ofício encontrado.")
+        else:
+            st.dataframe(
+                [
+                    {
+                        "Ofício": formatar_numero_oficio(resultado["numero_oficio"], resultado["ano"]),
+                        "IDEA": resultado["idea_numero"],
+                        "Destinatário": resultado["destinatario"],
+                        "Data": resultado["data_referencia"],
+                        "Arquivo": resultado["nome_arquivo"],
+                    }
+                    for resultado in resultados
+                ],
+                hide_index=True
+            )
+            indice_escolhido = st.selectbox(
+                "Ofício para baixar",
+                range(len(resultados)),
+                format_func=lambda i: f"{resultados[i]['nome_arquivo']} (IDEA {resultados[i]['idea_numero']})",
+                key="oficio_busca"
+            )
+            escolhido = resultados[indice_escolhido]
+            st.download_button(
+                label=f"Baixar {escolhido['nome_arquivo']}",
+                data=partial(obter_conteudo, escolhido["hash"]),
+                file_name=f"{escolhido['nome_arquivo']}.docx",
+                mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+                on_click="ignore",
+                key="download-busca"
+            )
+            
+            # Todos os números já dados ao caso do ofício escolhido, inclusive os de ofícios
+            # que não estão no histórico (ex.: gerados fora do sistema)
+            numeros_caso = numeros_do_caso(escolhido["idea_numero"])
+            if numeros_caso:
+                st.write(f"Números dados ao caso IDEA {escolhido['idea_numero']}")
+                st.dataframe(
+                    [
+                        {
+                            "Ofício": formatar_numero_oficio(numero["numero"], numero["ano"]),
+                            "Tipo": MODELOS[numero["tipo"]].titulo if numero["tipo"] in MODELOS else numero["tipo"],
+                            "Registrado em": numero["registrado_em"].replace("T", " "),
+                        }
+                        for numero in numeros_caso
+                    ],
+                    hide_index=True
+                )
+
+with tab6:
+    st.subheader("Estatísticas de Produção")
+    painel = obter_painel_producao(versao_producao(), date.today().isocalendar()[:2])
+    if not painel["semanal"].to_numpy().sum():
+        st.info("Nenhum ofício emitido nas últimas semanas.")
+    else:
+        st.write("Ofícios emitidos por semana e tipo")
+        st.image(painel["grafico_semanal"])
+        st.dataframe(
+            painel["semanal"].assign(Total=painel["semanal"].sum(axis=1)).rename_axis("Semana")
+        )
+        if painel["grafico_faixas"] is not None:
+            st.write("Ofícios emitidos por faixa de números")
+            st.image(painel["grafico_faixas"])
+
+# Mostrar o status atual dos dados salvos, com os números no ano da data de referência do
+# ofício 1 (o ano atual enquanto ele não foi salvo)
+data_referencia_status = st.session_state.dados_oficios.get("oficio_1", {}).get("data_referencia")
+ano_status = data_referencia_status.year if data_referencia_status else None
 status_col1, status_col2, status_col3 = st.columns(3)
 with status_col1:
     if "oficio_1" in st.session_state.dados_oficios:
-        st.info(f"Ofício 1: Dados do Ofício nº {formatar_numero_oficio(st.session_state.dados_oficios['oficio_1']['numero_oficio'])} salvos ✅")
+        st.info(f"Ofício 1: Dados do Ofício nº {formatar_numero_oficio(st.session_state.dados_oficios['oficio_1']['numero_oficio'], ano_status)} salvos ✅")
     else:
         st.warning("Ofício 1: Dados não salvos ❌")
         
@@ -387,7 +380,7 @@ with status_col2:
     if "oficio_2" in st.session_state.dados_oficios:
         nome_info = st.session_state.dados_oficios["oficio_2"].get("nome", "")
         numero_info = st.session_state.dados_oficios["oficio_2"].get("numero_oficio", "")
-        st.info(f"Ofício 2: Nº {formatar_numero_oficio(numero_info)} - {nome_info} ✅")
+        st.info(f"Ofício 2: Nº {formatar_numero_oficio(numero_info, ano_status)} - {nome_info} ✅")
     else:
         st.warning("Ofício 2: Dados não salvos ❌")
         
@@ -395,11 +388,12 @@ with status_col3:
     if "oficio_3" in st.session_state.dados_oficios:
         nome_info = st.session_state.dados_oficios["oficio_3"].get("nome", "")
         numero_info = st.session_state.dados_oficios["oficio_3"].get("numero_oficio", "")
-        st.info(f"Ofício 3: Nº {formatar_numero_oficio(numero_info)} - {nome_info} ✅")
+        st.info(f"Ofício 3: Nº {formatar_numero_oficio(numero_info, ano_status)} - {nome_info} ✅")
     else:
         st.warning("Ofício 3: Dados não salvos ❌")
 
 # Botão para gerar todos os ofícios
+incluir_pdf = st.checkbox("Gerar também em PDF", key="incluir_pdf")
 if st.button("Gerar Todos os Ofícios"):
     if not all(f"oficio_{i}" in st.session_state.dados_oficios for i in range(1, 4)):
         st.warning("Preencha e salve os dados de todos os três ofícios antes de gerar!")
@@ -408,93 +402,155 @@ if st.button("Gerar Todos os Ofícios"):
             if f"oficio_{i}" not in st.session_state.dados_oficios:
                 st.warning(f"Ofício {i} não tem dados salvos!")
     else:
-        st.success("Gerando ofícios...")
-        
         # Obter o número IDEA do ofício 1 (será usado em todos os ofícios)
         idea_numero = st.session_state.dados_oficios["oficio_1"]["idea_numero"]
         
-        # Criar os três documentos
-        arquivos = {
-            f"Ofício {st.session_state.dados_oficios['oficio_1']['numero_oficio']} - Comunicação à Delegacia": criar_oficio_arquivamento(
-                st.session_state.dados_oficios["oficio_1"]["numero_oficio"],
-                st.session_state.dados_oficios["oficio_1"]["data_oficio"],
-                idea_numero
-            ),
-            f"Ofício {st.session_state.dados_oficios['oficio_2']['numero_oficio']} - Notificação à Vítima": criar_oficio_notificacao_vitima(
-                st.session_state.dados_oficios["oficio_2"]["numero_oficio"],
-                st.session_state.dados_oficios["oficio_1"]["data_oficio"],  # Usamos a mesma data do ofício 1
-                idea_numero,
-                st.session_state.dados_oficios["oficio_2"]["nome"],
-                st.session_state.dados_oficios["oficio_2"]["endereco"],
-                st.session_state.dados_oficios["oficio_2"].get("telefone", "")
-            ),
-            f"Ofício {st.session_state.dados_oficios['oficio_3']['numero_oficio']} - Notificação ao Acusado": criar_oficio_notificacao_acusado(
-                st.session_state.dados_oficios["oficio_3"]["numero_oficio"],
-                st.session_state.dados_oficios["oficio_1"]["data_oficio"],  # Usamos a mesma data do ofício 1
-                idea_numero,
-                st.session_state.dados_oficios["oficio_3"]["nome"],
-                st.session_state.dados_oficios["oficio_3"]["endereco"],
-                st.session_state.dados_oficios["oficio_3"].get("telefone", "")
-            )
+        # A data do ofício 1 é a referência única (ano e datas dos arquivos) dos três ofícios
+        data_referencia = st.session_state.dados_oficios["oficio_1"]["data_referencia"]
+        
+        # Montar o caso com os dados dos três ofícios (a data do ofício 1 vale para todos)
+        caso = {
+            "numero_oficio_1": st.session_state.dados_oficios["oficio_1"]["numero_oficio"],
+            "numero_oficio_2": st.session_state.dados_oficios["oficio_2"]["numero_oficio"],
+            "numero_oficio_3": st.session_state.dados_oficios["oficio_3"]["numero_oficio"],
+            "data": st.session_state.dados_oficios["oficio_1"]["data_oficio"],
+            "data_referencia": data_referencia,
+            "idea_numero": idea_numero,
+            "nome_vitima": st.session_state.dados_oficios["oficio_2"]["nome"],
+            "endereco_vitima": st.session_state.dados_oficios["oficio_2"]["endereco"],
+            "telefone_vitima": st.session_state.dados_oficios["oficio_2"].get("telefone", ""),
+            "nome_acusado": st.session_state.dados_oficios["oficio_3"]["nome"],
+            "endereco_acusado": st.session_state.dados_oficios["oficio_3"]["endereco"],
+            "telefone_acusado": st.session_state.dados_oficios["oficio_3"].get("telefone", ""),
         }
         
-        # Criar um ZIP com todos os arquivos
-        zip_buffer = criar_zip_oficios(arquivos)
+        # Registrar a qual caso IDEA cada número foi dado e liberar a reserva da sessão
+        numeros_usados = [caso[f"numero_oficio_{i}"] for i in range(1, 4)]
+        if all(str(numero).strip().isdigit() for numero in numeros_usados):
+            conflitos = registrar_usos(data_referencia.year, usos_do_lote([caso]))
+            for conflito in conflitos:
+                st.warning(
+                    f"O ofício nº {conflito['numero']} já estava registrado para o IDEA "
+                    f"{conflito['idea_numero']} ({conflito['tipo']})."
+                )
+        st.session_state.pop("reserva_numeros", None)
         
-        # Botão para baixar o ZIP
-        st.download_button(
-            label="Baixar Todos os Ofícios (ZIP)",
-            data=zip_buffer,
-            file_name="Oficios.zip",
-            mime="application/zip",
-            key="download-zip"
+        # A geração roda na fila de tarefas; o andamento aparece logo abaixo. Se o caso já foi
+        # gerado nesta sessão (ex.: para corrigir um endereço), só os ofícios alterados são refeitos.
+        descricao = f"IDEA {idea_numero}"
+        anterior = next((tarefa["id"] for tarefa in listar_tarefas(dono_sessao) if tarefa["descricao"] == descricao), None)
+        enviar_tarefa(
+            dono_sessao, descricao, [caso], data_referencia, anterior=anterior,
+            formatos=FORMATOS_LOTE["ambos" if incluir_pdf else "docx"]
         )
+        obter_fila_tarefas().avisar()
+        st.success("Ofícios enviados para geração!")
+
+# Arquivos do ZIP de uma tarefa concluída (que não muda mais), lidos uma única vez por tarefa
+@st.cache_data(max_entries=256, show_spinner=False)
+def arquivos_da_tarefa(id_tarefa, caminho_arquivo):
+    return oficios_do_resultado(caminho_arquivo)
+
+# Função para verificar se alguma das tarefas ainda está na fila ou em execução
+def ha_tarefas_em_andamento(tarefas_sessao):
+    return any(tarefa["estado"] in (PENDENTE, EXECUTANDO) for tarefa in tarefas_sessao)
+
+# Função para mostrar o andamento e os arquivos das gerações desta sessão
+def mostrar_tarefas(tarefas_sessao):
+    if not tarefas_sessao:
+        return
+    
+    st.subheader("Gerações")
+    for tarefa in tarefas_sessao:
+        id_tarefa = tarefa["id"]
+        titulo = f"{tarefa['descricao']} ({tarefa['total']} ofícios, enviado em {tarefa['criada_em'].replace('T', ' ')})"
         
-        # Opção para baixar individualmente também
-        st.subheader("Ou baixe individualmente:")
-        download_col1, download_col2, download_col3 = st.columns(3)
-        
-        keys = list(arquivos.keys())
-        
-        with download_col1:
-            with open(arquivos[keys[0]], "rb") as file:
-                st.download_button(
-                    label=f"Baixar {keys[0]}",
-                    data=file,
-                    file_name=f"{keys[0]}.docx",
-                    mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-                    key="download-1"
-                )
+        if tarefa["estado"] == ERRO:
+            st.error(f"{titulo}: erro na geração - {tarefa['erro']}")
+            continue
         
-        with download_col2:
-            with open(arquivos[keys[1]], "rb") as file:
-                st.download_button(
-                    label=f"Baixar {keys[1]}",
-                    data=file,
-                    file_name=f"{keys[1]}.docx",
-                    mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-                    key="download-2"
-                )
+        if tarefa["estado"] != CONCLUIDA:
+            rotulo = "Aguardando na fila" if tarefa["concluidos"] == 0 else "Gerando"
+            st.progress(
+                tarefa["concluidos"] / tarefa["total"],
+                text=f"{titulo}: {rotulo} - {tarefa['concluidos']} de {tarefa['total']} ofícios"
+            )
+            continue
         
-        with download_col3:
-            with open(arquivos[keys[2]], "rb") as file:
+        st.write(f"✅ {titulo}")
+        download_cols = st.columns(2)
+        with download_cols[0]:
+            st.download_button(
+                label="Baixar Ofícios (ZIP)",
+                data=partial(ler_resultado, tarefa["arquivo"]),
+                file_name="Oficios.zip" if tarefa["total"] == OFICIOS_POR_CASO else "Oficios_Lote.zip",
+                mime="application/zip",
+                on_click="ignore",
+                key=f"download-{id_tarefa}"
+            )
+        if tarefa["arquivo_impressao"]:
+            with download_cols[1]:
                 st.download_button(
-                    label=f"Baixar {keys[2]}",
-                    data=file,
-                    file_name=f"{keys[2]}.docx",
+                    label="Baixar Arquivo Único para Impressão (.docx)",
+                    data=partial(ler_resultado, tarefa["arquivo_impressao"]),
+                    file_name="Oficios_Lote_Impressao.docx",
                     mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-                    key="download-3"
+                    on_click="ignore",
+                    key=f"download-impressao-{id_tarefa}"
                 )
         
-        # Remover arquivos temporários após um tempo razoável para download
-        for caminho in arquivos.values():
-            try:
-                os.remove(caminho)
-            except:
-                pass
+        # Para um único caso, também é possível baixar cada ofício individualmente: uma coluna
+        # por ofício (o nome do arquivo sem extensão), com os seus arquivos em cada formato
+        if tarefa["total"] == OFICIOS_POR_CASO:
+            arquivos_por_oficio = {}
+            for nome_arquivo in arquivos_da_tarefa(id_tarefa, tarefa["arquivo"]):
+                arquivos_por_oficio.setdefault(os.path.splitext(nome_arquivo)[0], []).append(nome_arquivo)
+            individuais = st.columns(len(arquivos_por_oficio))
+            for coluna, (nome_oficio, arquivos) in zip(individuais, arquivos_por_oficio.items()):
+                with coluna:
+                    for nome_arquivo in arquivos:
+                        extensao = os.path.splitext(nome_arquivo)[1]
+                        st.download_button(
+                            label=f"Baixar {nome_oficio}" + (" (PDF)" if extensao == ".pdf" else ""),
+                            data=partial(ler_oficio_do_resultado, tarefa["arquivo"], nome_arquivo),
+                            file_name=nome_arquivo,
+                            mime=TIPOS_MIME[extensao],
+                            on_click="ignore",
+                            key=f"download-{id_tarefa}-{nome_arquivo}"
+                        )
+
+# Acompanhamento atualizado a cada poucos segundos, sem recarregar a página, enquanto houver
+# gerações na fila ou em execução. Quando todas terminam, a página é executada de novo e o
+# acompanhamento passa a ser estático (volta a ser atualizado quando uma nova geração é enviada).
+@st.fragment(run_every=2)
+def acompanhar_tarefas():
+    tarefas_sessao = listar_tarefas(dono_sessao)
+    mostrar_tarefas(tarefas_sessao)
+    if not ha_tarefas_em_andamento(tarefas_sessao):
+        st.rerun()
+
+tarefas_sessao = listar_tarefas(dono_sessao)
+if ha_tarefas_em_andamento(tarefas_sessao):
+    acompanhar_tarefas()
+else:
+    mostrar_tarefas(tarefas_sessao)
+
+# Painel opcional com as métricas de desempenho da geração (deste processo do servidor)
+with st.sidebar:
+    if st.checkbox("Mostrar métricas de desempenho"):
+        etapas_medidas, contadores = resumo()
+        st.subheader("Tempo por etapa")
+        if etapas_medidas:
+            st.dataframe(etapas_medidas, hide_index=True)
+        else:
+            st.caption("Nenhuma geração medida ainda.")
+        st.subheader("Eventos")
+        for evento, quantidade in contadores.items():
+            st.text(f"{evento}: {quantidade}")
 
 # Adicionar um botão para limpar todos os dados
 if st.button("Limpar Todos os Dados"):
     st.session_state.dados_oficios = {}
+    st.session_state.pop("reserva_numeros", None)
     st.success("Todos os dados foram limpos!")
-    st.experimental_rerun()
+    st.rerun()
@@ -0,0 +1,20 @@
+import os
+import sqlite3
+import threading
+
+_bancos_inicializados = set()
+_lock_inicializacao = threading.Lock()
+
+# Função para abrir uma conexão com um banco SQLite local, criando o esquema na primeira vez.
+# O modo WAL deixa as leituras livres enquanto outra sessão está gravando.
+def conectar(caminho, esquema):
+    os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+    conexao = sqlite3.connect(caminho, timeout=30, isolation_level=None)
+    conexao.execute("PRAGMA busy_timeout = 30000")
+    with _lock_inicializacao:
+        chave = (os.path.abspath(caminho), esquema)
+        if chave not in _bancos_inicializados:
+            conexao.execute("PRAGMA journal_mode = WAL")
+            conexao.executescript(esquema)
+            _bancos_inicializados.add(chave)
+    return conexao
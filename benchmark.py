@@ -0,0 +1,200 @@
+# Benchmark da geração de ofícios (caminho quente: criar_oficio_* e montagem do ZIP).
+#
+# Uso:
+#     python benchmark.py                         # cenários padrão: 1, 100 e 10000 casos
+#     python benchmark.py --casos 1 100 --saida resultados.json
+#
+# Cada cenário roda em um subprocesso próprio, para que o pico de memória (RSS) medido
+# seja só dele. O resultado é gravado em JSON para comparar versões.
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import date
+
+CENARIOS_PADRAO = [1, 100, 10000]
+
+# Data de referência fixa, para que todas as execuções gerem exatamente os mesmos documentos
+DATA_REFERENCIA = date(2025, 1, 2)
+
+# Quantidade máxima de casos medidos com tracemalloc (que deixa a execução bem mais lenta)
+MAX_CASOS_ALOCACAO = 200
+
+# Função para criar casos sintéticos, variando os dados para não medir sempre a mesma entrada
+def casos_sinteticos(quantidade):
+    from lote import preparar_casos
+
+    linhas = [
+        {
+            "idea_numero": f"596.9.{489799 + indice}",
+            "nome_vitima": f"Maria da Silva {indice}",
+            "endereco_vitima": f"Rua das Flores, {indice}, Centro",
+            "telefone_vitima": "75 99999-0000" if indice % 2 else "",
+            "nome_acusado": f"João de Souza {indice}",
+            "endereco_acusado": f"Avenida Getúlio Vargas, {indice}",
+            "telefone_acusado": "" if indice % 3 else "75 98888-1111",
+        }
+        for indice in range(quantidade)
+    ]
+    return preparar_casos(linhas, 1, DATA_REFERENCIA)
+
+# Funções que geram cada tipo de ofício a partir de um caso
+def _geradores():
+    from oficios import criar_oficio_arquivamento, criar_oficio_notificacao_vitima, criar_oficio_notificacao_acusado
+
+    return {
+        "arquivamento": lambda caso: criar_oficio_arquivamento(
+            caso["numero_oficio_1"], caso["data"], caso["idea_numero"],
+            data_referencia=caso["data_referencia"],
+        ),
+        "notificacao_vitima": lambda caso: criar_oficio_notificacao_vitima(
+            caso["numero_oficio_2"], caso["data"], caso["idea_numero"],
+            caso["nome_vitima"], caso["endereco_vitima"], caso["telefone_vitima"],
+            data_referencia=caso["data_referencia"],
+        ),
+        "notificacao_acusado": lambda caso: criar_oficio_notificacao_acusado(
+            caso["numero_oficio_3"], caso["data"], caso["idea_numero"],
+            caso["nome_acusado"], caso["endereco_acusado"], caso["telefone_acusado"],
+            data_referencia=caso["data_referencia"],
+        ),
+    }
+
+# Função para calcular um percentil (interpolação linear) de uma lista de tempos
+def percentil(valores, fracao):
+    ordenados = sorted(valores)
+    if len(ordenados) == 1:
+        return ordenados[0]
+    posicao = (len(ordenados) - 1) * fracao
+    inferior = int(posicao)
+    superior = min(inferior + 1, len(ordenados) - 1)
+    return ordenados[inferior] + (ordenados[superior] - ordenados[inferior]) * (posicao - inferior)
+
+# Função para resumir uma lista de latências (em segundos) em milissegundos
+def resumo_latencias(tempos):
+    return {
+        "quantidade": len(tempos),
+        "p50_ms": round(percentil(tempos, 0.50) * 1000, 4),
+        "p99_ms": round(percentil(tempos, 0.99) * 1000, 4),
+        "media_ms": round(statistics.fmean(tempos) * 1000, 4),
+    }
+
+# Função para medir um cenário no processo atual.
+# Os documentos vão direto para o ZIP (gerar_zip_em_partes, base de criar_zip_oficios) à
+# medida que são gerados, então a memória não cresce com o tamanho do lote; o tempo do
+# ZIP é o tempo total menos o tempo gasto gerando os documentos.
+def medir_cenario(quantidade):
+    from oficios import gerar_zip_em_partes
+
+    casos = casos_sinteticos(quantidade)
+    geradores = _geradores()
+
+    # Aquecimento: compila (ou carrega do disco) os modelos antes de medir
+    for gerar in geradores.values():
+        gerar(casos[0])
+
+    latencias = {tipo: [] for tipo in geradores}
+
+    def documentos():
+        for caso in casos:
+            for tipo, gerar in geradores.items():
+                inicio_documento = time.perf_counter()
+                conteudo = gerar(caso)
+                latencias[tipo].append(time.perf_counter() - inicio_documento)
+                yield f"{tipo}-{caso['numero_oficio_1']}", conteudo
+
+    tamanho_zip = 0
+    inicio = time.perf_counter()
+    for parte in gerar_zip_em_partes(documentos(), data_referencia=DATA_REFERENCIA):
+        tamanho_zip += len(parte)
+    tempo_total = time.perf_counter() - inicio
+    tempo_geracao = sum(sum(tempos) for tempos in latencias.values())
+    tempo_zip = tempo_total - tempo_geracao
+
+    # Bytes alocados, medidos em uma amostra separada para não distorcer os tempos
+    amostra = casos[:MAX_CASOS_ALOCACAO]
+    tracemalloc.start()
+    for caso in amostra:
+        for gerar in geradores.values():
+            gerar(caso)
+    _, pico_alocado = tracemalloc.get_traced_memory()
+    alocacoes = sum(estatistica.size for estatistica in tracemalloc.take_snapshot().statistics("filename"))
+    tracemalloc.stop()
+
+    total_documentos = quantidade * len(geradores)
+    return {
+        "casos": quantidade,
+        "documentos": total_documentos,
+        "documentos_por_segundo": round(total_documentos / tempo_geracao, 1),
+        "tempo_geracao_s": round(tempo_geracao, 4),
+        "tempo_total_s": round(tempo_total, 4),
+        "latencia_por_tipo": {tipo: resumo_latencias(tempos) for tipo, tempos in latencias.items()},
+        "zip": {
+            "tempo_s": round(tempo_zip, 4),
+            "megabytes_por_segundo": round(tamanho_zip / 1024 / 1024 / tempo_zip, 1) if tempo_zip else None,
+            "tamanho_bytes": tamanho_zip,
+        },
+        "pico_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "alocacao": {
+            "casos_amostrados": len(amostra),
+            "pico_bytes": pico_alocado,
+            "bytes_retidos": alocacoes,
+        },
+    }
+
+# Função para rodar um cenário em um subprocesso e ler o resultado
+def rodar_em_subprocesso(quantidade):
+    resultado = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--cenario", str(quantidade)],
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(resultado.stdout)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da geração de ofícios")
+    parser.add_argument("--casos", type=int, nargs="+", default=CENARIOS_PADRAO,
+                        help="tamanhos de lote (em casos) a medir")
+    parser.add_argument("--saida", default="benchmark.json", help="arquivo JSON com os resultados")
+    parser.add_argument("--cenario", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # Modo interno: mede um único cenário e escreve o JSON na saída padrão
+    if args.cenario is not None:
+        json.dump(medir_cenario(args.cenario), sys.stdout)
+        return 0
+
+    from oficios import _versao_modelos
+
+    resultados = {
+        "data_execucao": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "versao_modelos": _versao_modelos(),
+        "cenarios": [],
+    }
+    for quantidade in args.casos:
+        cenario = rodar_em_subprocesso(quantidade)
+        resultados["cenarios"].append(cenario)
+        latencias = ", ".join(
+            f"{tipo} p50 {valores['p50_ms']:.3f} ms / p99 {valores['p99_ms']:.3f} ms"
+            for tipo, valores in cenario["latencia_por_tipo"].items()
+        )
+        print(
+            f"{quantidade:>6} casos: {cenario['documentos_por_segundo']:>9.1f} docs/s | "
+            f"RSS {cenario['pico_rss_mb']} MB | {latencias}"
+        )
+
+    with open(args.saida, "w", encoding="utf-8") as f:
+        json.dump(resultados, f, indent=2, ensure_ascii=False)
+    print(f"Resultados gravados em {args.saida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+import os
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from metricas import incrementar
+
+# Limites padrão do cache de ofícios gerados
+MAX_BYTES_MEMORIA = 64 * 1024 * 1024
+MAX_ARQUIVOS_DISCO = 20000
+
+# Extensão dos arquivos do cache em disco. Guardam .docx e PDFs, então a extensão é neutra;
+# os arquivos ".docx" de versões anteriores (que também continham PDFs) são apagados.
+EXTENSAO_ARQUIVOS = ".oficio"
+EXTENSAO_ANTIGA = ".docx"
+
+# Fração de MAX_ARQUIVOS_DISCO gravada por um processo entre duas varreduras do diretório
+INTERVALO_VARREDURA_DISCO = 0.05
+
+# Função para calcular a chave de um ofício a partir do tipo, da versão do modelo e dos valores
+def chave_oficio(tipo, versao_modelo, valores):
+    # Os valores são convertidos para texto exatamente como serão escritos no documento
+    normalizados = {campo: "" if valor is None else str(valor) for campo, valor in valores.items()}
+    conteudo = json.dumps([tipo, versao_modelo, normalizados], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()
+
+# Cache LRU de documentos prontos, em memória e (opcionalmente) em disco.
+# Pode ser compartilhado entre as sessões do Streamlit, por isso é protegido por lock.
+# O diretório pode ser usado por vários processos ao mesmo tempo (o pool de geração, o servidor),
+# então o disco não tem índice próprio: cada processo lê e grava os arquivos diretamente, e a
+# ordem LRU é a data de modificação dos arquivos, atualizada a cada leitura.
+class CacheOficios:
+    def __init__(self, diretorio=None, max_bytes_memoria=MAX_BYTES_MEMORIA, max_arquivos_disco=MAX_ARQUIVOS_DISCO):
+        self.diretorio = diretorio
+        self.max_bytes_memoria = max_bytes_memoria
+        self.max_arquivos_disco = max_arquivos_disco
+        self._memoria = OrderedDict()
+        self._bytes_memoria = 0
+        # Gravações deste processo desde a última varredura do diretório (ver _limitar_disco)
+        self._gravacoes = 0
+        self._lock = threading.Lock()
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+            self._limitar_disco()
+
+    # Função para manter no diretório no máximo max_arquivos_disco documentos, removendo os
+    # usados há mais tempo. A decisão é tomada a partir do próprio diretório, que inclui os
+    # arquivos gravados pelos outros processos.
+    def _limitar_disco(self):
+        self._gravacoes = 0
+        arquivos = []
+        try:
+            for entrada in os.scandir(self.diretorio):
+                if entrada.name.endswith(EXTENSAO_ANTIGA):
+                    try:
+                        os.remove(entrada.path)
+                    except OSError:
+                        pass
+                elif entrada.name.endswith(EXTENSAO_ARQUIVOS):
+                    try:
+                        arquivos.append((entrada.stat().st_mtime, entrada.path))
+                    except OSError:
+                        # Removido por outro processo durante a varredura
+                        pass
+        except OSError:
+            return
+        excedentes = len(arquivos) - self.max_arquivos_disco
+        if excedentes <= 0:
+            return
+        for _, caminho in sorted(arquivos)[:excedentes]:
+            try:
+                os.remove(caminho)
+            except OSError:
+                pass
+
+    def _caminho(self, chave):
+        return os.path.join(self.diretorio, chave + EXTENSAO_ARQUIVOS)
+
+    def _guardar_em_memoria(self, chave, conteudo):
+        if chave in self._memoria:
+            self._memoria.move_to_end(chave)
+            return
+        self._memoria[chave] = conteudo
+        self._bytes_memoria += len(conteudo)
+        while self._bytes_memoria > self.max_bytes_memoria and len(self._memoria) > 1:
+            _, removido = self._memoria.popitem(last=False)
+            self._bytes_memoria -= len(removido)
+
+    def _ler_do_disco(self, chave):
+        try:
+            with open(self._caminho(chave), "rb") as f:
+                conteudo = f.read()
+            # Atualizar a data de modificação mantém a ordem LRU (entre processos e reinícios)
+            os.utime(self._caminho(chave))
+        except OSError:
+            return None
+        return conteudo
+
+    def _gravar_no_disco(self, chave, conteudo):
+        caminho = self._caminho(chave)
+        if os.path.exists(caminho):
+            return
+        temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temporario, "wb") as f:
+                f.write(conteudo)
+            os.replace(temporario, caminho)
+        except OSError:
+            return
+        # O diretório é varrido a cada INTERVALO_VARREDURA_DISCO do limite gravados por este
+        # processo, então ele só passa do limite por essa fração a cada processo que o usa
+        self._gravacoes += 1
+        if self._gravacoes >= max(1, int(self.max_arquivos_disco * INTERVALO_VARREDURA_DISCO)):
+            self._limitar_disco()
+
+    # Função para buscar um documento no cache (None se não estiver guardado)
+    def obter(self, chave):
+        with self._lock:
+            if chave in self._memoria:
+                self._memoria.move_to_end(chave)
+                return self._memoria[chave]
+            if self.diretorio:
+                conteudo = self._ler_do_disco(chave)
+                if conteudo is not None:
+                    self._guardar_em_memoria(chave, conteudo)
+                return conteudo
+        return None
+
+    # Função para guardar um documento pronto no cache
+    def guardar(self, chave, conteudo):
+        with self._lock:
+            self._guardar_em_memoria(chave, conteudo)
+            if self.diretorio:
+                self._gravar_no_disco(chave, conteudo)
+
+    # Função para obter um documento do cache ou gerá-lo (e guardá-lo) se ainda não existir
+    def obter_ou_gerar(self, chave, gerar):
+        conteudo = self.obter(chave)
+        if conteudo is None:
+            incrementar("cache_falhas")
+            conteudo = gerar()
+            self.guardar(chave, conteudo)
+        else:
+            incrementar("cache_acertos")
+        return conteudo
@@ -0,0 +1,184 @@
+# Teste de carga do serviço HTTP de geração de ofícios (servidor.py) em localhost.
+#
+# Uso:
+#     python carga_servidor.py                                  # inicia um servidor próprio e mede por 10 s
+#     python carga_servidor.py --conexoes 32 --duracao 30 --rota lote --casos-lote 20
+#     python carga_servidor.py --url http://127.0.0.1:8765      # mede um servidor já em execução
+#
+# Sem --url, o servidor é iniciado em um subprocesso com OFICIOS_DADOS_DIR apontando para uma
+# pasta temporária, para que a numeração e o histórico de verdade não recebam os ofícios de
+# teste. Com --url, os ofícios gerados entram na numeração e no histórico desse servidor.
+#
+# Cada conexão é mantida aberta (keep-alive) e envia um pedido atrás do outro; o resultado
+# (pedidos por segundo, latências e status HTTP) é mostrado e pode ser gravado em JSON.
+import argparse
+import http.client
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+from benchmark import percentil
+
+PORTA_TESTE = 8799
+
+TIPOS_OFICIO = ("arquivamento", "notificacao_vitima", "notificacao_acusado")
+
+# Tempo máximo (em segundos) esperando o servidor iniciado pelo teste responder
+ESPERA_INICIO = 60
+
+# Função para montar um caso sintético, variando os dados a cada caso
+def _caso(indice):
+    return {
+        "idea_numero": f"596.9.{indice % 1000000:06d}",
+        "nome_vitima": f"Maria da Silva {indice}",
+        "endereco_vitima": f"Rua das Flores, {indice}, Centro",
+        "telefone_vitima": "(75) 99999-0000" if indice % 2 else "",
+        "nome_acusado": f"João de Souza {indice}",
+        "endereco_acusado": f"Avenida Getúlio Vargas, {indice}",
+        "telefone_acusado": "" if indice % 3 else "(75) 98888-1111",
+    }
+
+# Função para montar o caminho e o corpo do pedido de número "indice"
+def corpo_pedido(rota, indice, casos_lote):
+    if rota == "lote":
+        return "/lote", {"casos": [_caso(indice * casos_lote + extra) for extra in range(casos_lote)]}
+
+    caso = _caso(indice)
+    tipo = TIPOS_OFICIO[indice % len(TIPOS_OFICIO)] if rota == "oficios" else rota
+    dados = {"numero_idea": caso["idea_numero"]}
+    if tipo == "notificacao_vitima":
+        dados.update(nome_vitima=caso["nome_vitima"], endereco=caso["endereco_vitima"], telefone=caso["telefone_vitima"])
+    elif tipo == "notificacao_acusado":
+        dados.update(nome_acusado=caso["nome_acusado"], endereco=caso["endereco_acusado"], telefone=caso["telefone_acusado"])
+    return f"/oficios/{tipo}", dados
+
+# Função executada por cada conexão: envia pedidos até o fim do teste
+def _conexao(host, porta, rota, casos_lote, fim, contador, resultados):
+    latencias, status = [], Counter()
+    conexao = http.client.HTTPConnection(host, porta, timeout=60)
+    while time.perf_counter() < fim:
+        caminho, dados = corpo_pedido(rota, next(contador), casos_lote)
+        corpo = json.dumps(dados).encode("utf-8")
+        inicio = time.perf_counter()
+        try:
+            conexao.request("POST", caminho, corpo, {"Content-Type": "application/json"})
+            resposta = conexao.getresponse()
+            resposta.read()
+        except (OSError, http.client.HTTPException) as erro:
+            status[type(erro).__name__] += 1
+            conexao.close()
+            conexao = http.client.HTTPConnection(host, porta, timeout=60)
+            continue
+        latencias.append(time.perf_counter() - inicio)
+        status[resposta.status] += 1
+    conexao.close()
+    resultados.append((latencias, status))
+
+# Função para esperar o servidor responder em /saude
+def _esperar_servidor(host, porta, processo):
+    limite = time.monotonic() + ESPERA_INICIO
+    while time.monotonic() < limite:
+        if processo.poll() is not None:
+            raise RuntimeError(f"o servidor terminou com código {processo.returncode}")
+        try:
+            conexao = http.client.HTTPConnection(host, porta, timeout=1)
+            conexao.request("GET", "/saude")
+            if conexao.getresponse().status == 200:
+                conexao.close()
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("o servidor não respondeu a tempo")
+
+# Função para rodar o teste de carga e devolver o resumo
+def medir_carga(host, porta, rota, conexoes, duracao, casos_lote):
+    contador = iter(range(sys.maxsize))
+    resultados = []
+    fim = time.perf_counter() + duracao
+    inicio = time.perf_counter()
+    threads = [
+        threading.Thread(target=_conexao, args=(host, porta, rota, casos_lote, fim, contador, resultados))
+        for _ in range(conexoes)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    tempo_total = time.perf_counter() - inicio
+
+    latencias = [latencia for latencias_conexao, _ in resultados for latencia in latencias_conexao]
+    status = sum((status_conexao for _, status_conexao in resultados), Counter())
+    sucesso = status.get(200, 0)
+    return {
+        "rota": rota,
+        "conexoes": conexoes,
+        "duracao_s": round(tempo_total, 2),
+        "pedidos": len(latencias),
+        "pedidos_por_segundo": round(len(latencias) / tempo_total, 1),
+        "oficios_por_segundo": round(
+            sucesso * (casos_lote * 3 if rota == "lote" else 1) / tempo_total, 1
+        ),
+        "latencia_ms": {
+            nome: round(percentil(latencias, fracao) * 1000, 2)
+            for nome, fracao in (("p50", 0.50), ("p90", 0.90), ("p99", 0.99), ("maximo", 1.0))
+        } if latencias else {},
+        "status": {str(codigo): quantidade for codigo, quantidade in sorted(status.items(), key=str)},
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga do serviço HTTP de ofícios")
+    parser.add_argument("--url", default=None, help="servidor já em execução (padrão: iniciar um servidor próprio)")
+    parser.add_argument("--rota", default="oficios", choices=("oficios", "lote") + TIPOS_OFICIO,
+                        help="pedidos enviados: os três tipos alternados (oficios), um tipo só ou lotes")
+    parser.add_argument("--conexoes", type=int, default=16, help="conexões simultâneas (padrão: 16)")
+    parser.add_argument("--duracao", type=float, default=10.0, help="duração do teste em segundos (padrão: 10)")
+    parser.add_argument("--casos-lote", type=int, default=10, help="casos por pedido na rota lote (padrão: 10)")
+    parser.add_argument("--processos", type=int, default=None, help="processos do servidor iniciado pelo teste")
+    parser.add_argument("--saida", default=None, help="arquivo JSON com o resultado")
+    args = parser.parse_args()
+
+    processo = None
+    if args.url:
+        endereco = urlsplit(args.url)
+        host, porta = endereco.hostname, endereco.port or 80
+    else:
+        host, porta = "127.0.0.1", PORTA_TESTE
+        comando = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "servidor.py"),
+                   "--host", host, "--porta", str(porta)]
+        if args.processos:
+            comando += ["--processos", str(args.processos)]
+        ambiente = {**os.environ, "OFICIOS_DADOS_DIR": tempfile.mkdtemp(prefix="oficios-carga-")}
+        processo = subprocess.Popen(comando, env=ambiente, stdout=subprocess.DEVNULL)
+
+    try:
+        if processo is not None:
+            _esperar_servidor(host, porta, processo)
+        resultado = medir_carga(host, porta, args.rota, args.conexoes, args.duracao, args.casos_lote)
+    finally:
+        if processo is not None:
+            # Como um Ctrl+C, para o servidor encerrar o pool de processos
+            processo.send_signal(signal.SIGINT)
+            processo.wait()
+
+    latencias = resultado["latencia_ms"]
+    print(
+        f"{resultado['pedidos']} pedidos em {resultado['duracao_s']} s: {resultado['pedidos_por_segundo']} pedidos/s, "
+        f"{resultado['oficios_por_segundo']} ofícios/s | latência p50 {latencias.get('p50')} ms, "
+        f"p99 {latencias.get('p99')} ms | status {resultado['status']}"
+    )
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+        print(f"Resultado gravado em {args.saida}")
+    return 0 if set(resultado["status"]) <= {"200"} else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,385 @@
+# Teste de carga da interface do Streamlit (add.py) com várias sessões simultâneas.
+#
+# Uso:
+#     python carga_streamlit.py                              # inicia o Streamlit e simula 8 sessões
+#     python carga_streamlit.py --sessoes 1 8 32 --rodadas 3 --saida carga.json
+#     python carga_streamlit.py --url http://127.0.0.1:8501 --pid 12345
+#
+# Cada sessão simulada é uma conexão websocket com o servidor, como uma aba de navegador: ela
+# envia os mesmos pedidos de reexecução que o navegador envia (protocolo do próprio Streamlit),
+# preenche e salva os formulários dos três ofícios, clica em "Gerar Todos os Ofícios" e, como o
+# navegador, reexecuta o trecho de acompanhamento das tarefas no intervalo pedido pelo servidor
+# até o botão de download aparecer. Todas as sessões rodam ao mesmo tempo.
+#
+# O resultado mostra, para cada quantidade de sessões, a latência de cada etapa (da ação até o
+# fim da reexecução), o tempo total por sessão, a CPU usada pelo servidor e pelos processos da
+# fila de tarefas e o crescimento da memória (RSS) do servidor.
+#
+# Sem --url, o servidor é iniciado em um subprocesso com OFICIOS_DADOS_DIR apontando para uma
+# pasta temporária, para que a numeração e o histórico de verdade não recebam os ofícios de
+# teste. Com --url, a CPU e a memória só são medidas se o --pid do servidor for informado.
+#
+# O AppTest do Streamlit não serve aqui: cada AppTest troca o runtime global do processo a cada
+# execução, então não é possível rodar várias sessões dele ao mesmo tempo.
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from urllib.parse import urlsplit
+
+from websockets.asyncio.client import connect
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+from benchmark import percentil
+
+DIRETORIO = os.path.dirname(os.path.abspath(__file__))
+ARQUIVO_APP = os.path.join(DIRETORIO, "add.py")
+
+PORTA_TESTE = 8599
+CENARIOS_PADRAO = [8]
+
+# Tempo máximo (em segundos) esperando uma reexecução, a tarefa ou o servidor iniciar
+TEMPO_MAXIMO = 120
+
+# Intervalo (em segundos) entre as amostras de CPU e memória
+INTERVALO_AMOSTRA = 0.25
+
+ETAPAS = ("abrir", "oficio_1", "oficio_2", "oficio_3", "gerar", "acompanhamento", "conclusao")
+
+_TAMANHO_PAGINA = os.sysconf("SC_PAGE_SIZE")
+_TICKS_POR_SEGUNDO = os.sysconf("SC_CLK_TCK")
+
+# Função para ler o tempo de CPU (em segundos), a memória residente (em bytes) e o processo pai
+def _uso_processo(pid):
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            campos = f.read().rsplit(")", 1)[1].split()
+        with open(f"/proc/{pid}/statm") as f:
+            paginas_residentes = int(f.read().split()[1])
+    except (OSError, IndexError):
+        return None
+    # Depois do nome: estado, ppid, ... utime e stime (campos 4, 14 e 15 do /proc/<pid>/stat)
+    cpu = (int(campos[11]) + int(campos[12])) / _TICKS_POR_SEGUNDO
+    return cpu, paginas_residentes * _TAMANHO_PAGINA, int(campos[1])
+
+# Função para listar os processos filhos de um processo (ex.: o pool da fila de tarefas)
+def _filhos(pid):
+    filhos = []
+    for entrada in os.listdir("/proc"):
+        if entrada.isdigit():
+            uso = _uso_processo(int(entrada))
+            if uso is not None and uso[2] == pid:
+                filhos.append(int(entrada))
+    return filhos
+
+# Amostra, em segundo plano, a CPU e a memória do servidor e dos processos filhos dele
+class MonitorRecursos:
+    def __init__(self, pid, intervalo=INTERVALO_AMOSTRA):
+        self.pid = pid
+        self.intervalo = intervalo
+        self.amostras = []
+        self._cpu_filhos = {}
+        self._parar = threading.Event()
+        self._thread = None
+
+    def amostrar(self):
+        uso = _uso_processo(self.pid)
+        if uso is None:
+            return self.amostras[-1] if self.amostras else None
+        rss_filhos = 0
+        for filho in _filhos(self.pid):
+            uso_filho = _uso_processo(filho)
+            if uso_filho is not None:
+                # Guarda o último valor de cada filho, para não perder a CPU dos que terminarem
+                self._cpu_filhos[filho] = uso_filho[0]
+                rss_filhos += uso_filho[1]
+        amostra = {"instante": time.perf_counter(), "cpu_s": uso[0], "rss": uso[1],
+                   "cpu_filhos_s": sum(self._cpu_filhos.values()), "rss_filhos": rss_filhos}
+        self.amostras.append(amostra)
+        return amostra
+
+    def _laco(self):
+        while not self._parar.wait(self.intervalo):
+            self.amostrar()
+
+    def iniciar(self):
+        self.amostrar()
+        self._thread = threading.Thread(target=self._laco, daemon=True)
+        self._thread.start()
+        return self
+
+    def parar(self):
+        self._parar.set()
+        self._thread.join()
+        return self.amostrar()
+
+# Resultado de uma reexecução: widgets desenhados, botões de download e exceções
+class Reexecucao:
+    def __init__(self):
+        self.widgets = {}
+        self.downloads = []
+        self.excecoes = []
+        self.trecho_automatico = None
+
+# Uma sessão do navegador simulada sobre o websocket do Streamlit
+class SessaoSimulada:
+    def __init__(self, url_websocket, dono):
+        self.url_websocket = url_websocket
+        self.dono = dono
+        self.valores = {}
+        self.widgets = {}
+        self.trecho_automatico = None
+        self._conexao = None
+
+    async def abrir(self):
+        self._conexao = await connect(self.url_websocket, subprotocols=["streamlit"], max_size=None)
+        return await self.reexecutar()
+
+    async def fechar(self):
+        await self._conexao.close()
+
+    # Função para pedir uma reexecução (do script todo ou de um trecho) e esperar o fim dela.
+    # Como o navegador, envia o valor atual de todos os widgets e o botão clicado.
+    async def reexecutar(self, clicado=None, trecho=""):
+        mensagem = BackMsg()
+        estado = mensagem.rerun_script
+        estado.query_string = f"sessao={self.dono}"
+        estado.fragment_id = trecho
+        estado.is_auto_rerun = bool(trecho)
+        for id_widget, valor in self.valores.items():
+            widget = estado.widget_states.widgets.add()
+            widget.id = id_widget
+            widget.string_value = valor
+        if clicado is not None:
+            widget = estado.widget_states.widgets.add()
+            widget.id = clicado
+            widget.trigger_value = True
+        await self._conexao.send(mensagem.SerializeToString())
+
+        resultado = Reexecucao()
+        while True:
+            resposta = ForwardMsg()
+            resposta.ParseFromString(await asyncio.wait_for(self._conexao.recv(), TEMPO_MAXIMO))
+            tipo = resposta.WhichOneof("type")
+            if tipo == "script_finished":
+                # Um trecho que pede a reexecução da página (st.rerun) termina antes dela: os
+                # elementos da página executada de novo chegam em seguida, na mesma resposta
+                if resposta.script_finished == ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    continue
+                break
+            if tipo == "auto_rerun":
+                resultado.trecho_automatico = (resposta.auto_rerun.fragment_id, resposta.auto_rerun.interval)
+            elif tipo == "delta" and resposta.delta.WhichOneof("type") == "new_element":
+                elemento = resposta.delta.new_element
+                tipo_elemento = elemento.WhichOneof("type")
+                if tipo_elemento == "exception":
+                    resultado.excecoes.append(elemento.exception.message)
+                elif tipo_elemento == "download_button":
+                    resultado.downloads.append(elemento.download_button.label)
+                elif tipo_elemento in ("text_input", "button"):
+                    widget = getattr(elemento, tipo_elemento)
+                    resultado.widgets[(widget.form_id, widget.label)] = widget.id
+
+        if resultado.excecoes:
+            raise RuntimeError(f"exceção na interface: {resultado.excecoes[0]}")
+        if not trecho:
+            self.widgets = resultado.widgets
+        if resultado.trecho_automatico:
+            self.trecho_automatico = resultado.trecho_automatico
+        return resultado
+
+    # Funções para preencher um campo de texto e obter um botão pelo formulário e rótulo
+    def preencher(self, formulario, rotulo, valor):
+        self.valores[self.widgets[(formulario, rotulo)]] = valor
+
+    def botao(self, formulario, rotulo):
+        return self.widgets[(formulario, rotulo)]
+
+# Uma sessão simulada: preenche os três formulários e gera os ofícios "rodadas" vezes
+async def simular_sessao(url_websocket, indice, rodadas, latencias, prefixo):
+    sessao = SessaoSimulada(url_websocket, f"{prefixo}-{indice}")
+
+    async def medir(etapa, corrotina):
+        inicio = time.perf_counter()
+        resultado = await corrotina
+        latencias[etapa].append(time.perf_counter() - inicio)
+        return resultado
+
+    await medir("abrir", sessao.abrir())
+    try:
+        for rodada in range(rodadas):
+            caso = indice * rodadas + rodada
+            sessao.preencher("dados_oficio_1", "Número IDEA (número do processo)", f"596.9.{caso % 1000000:06d}")
+            await medir("oficio_1", sessao.reexecutar(sessao.botao("dados_oficio_1", "Salvar Dados do Ofício 1")))
+
+            sessao.preencher("dados_oficio_2", "Nome da Vítima", f"Maria da Silva {caso}")
+            sessao.preencher("dados_oficio_2", "Endereço da Vítima", f"Rua das Flores, {caso}, Centro")
+            sessao.preencher("dados_oficio_2", "Telefone da Vítima (opcional)", "(75) 99999-0000")
+            await medir("oficio_2", sessao.reexecutar(sessao.botao("dados_oficio_2", "Salvar Dados do Ofício 2")))
+
+            sessao.preencher("dados_oficio_3", "Nome do Acusado", f"João de Souza {caso}")
+            sessao.preencher("dados_oficio_3", "Endereço do Acusado", f"Avenida Getúlio Vargas, {caso}")
+            await medir("oficio_3", sessao.reexecutar(sessao.botao("dados_oficio_3", "Salvar Dados do Ofício 3")))
+
+            inicio_geracao = time.perf_counter()
+            await medir("gerar", sessao.reexecutar(sessao.botao("", "Gerar Todos os Ofícios")))
+
+            # Como o navegador: reexecuta o acompanhamento das tarefas no intervalo pedido pelo
+            # servidor até aparecerem os downloads desta rodada (um ZIP e três ofícios por tarefa)
+            while True:
+                if time.perf_counter() - inicio_geracao > TEMPO_MAXIMO:
+                    raise TimeoutError("os ofícios não ficaram prontos a tempo")
+                trecho, intervalo = sessao.trecho_automatico
+                await asyncio.sleep(intervalo)
+                resultado = await medir("acompanhamento", sessao.reexecutar(trecho=trecho))
+                if resultado.downloads.count("Baixar Ofícios (ZIP)") > rodada:
+                    break
+            latencias["conclusao"].append(time.perf_counter() - inicio_geracao)
+    finally:
+        await sessao.fechar()
+
+# Função para rodar um cenário com "sessoes" sessões simultâneas
+async def _rodar_sessoes(url_websocket, sessoes, rodadas, latencias, prefixo):
+    async def rodar(indice):
+        inicio = time.perf_counter()
+        await simular_sessao(url_websocket, indice, rodadas, latencias, prefixo)
+        return time.perf_counter() - inicio
+
+    return await asyncio.gather(*(rodar(indice) for indice in range(sessoes)), return_exceptions=True)
+
+# Função para medir um cenário e resumir latências, CPU e memória
+def medir_cenario(url_websocket, sessoes, rodadas, pid=None):
+    latencias = {etapa: [] for etapa in ETAPAS}
+    monitor = MonitorRecursos(pid).iniciar() if pid else None
+    inicio = time.perf_counter()
+    prefixo = f"carga-{int(time.time() * 1000)}"
+    resultados = asyncio.run(_rodar_sessoes(url_websocket, sessoes, rodadas, latencias, prefixo))
+    duracao = time.perf_counter() - inicio
+
+    tempos_sessao = [resultado for resultado in resultados if not isinstance(resultado, BaseException)]
+    erros = [f"sessão {indice}: {resultado!r}" for indice, resultado in enumerate(resultados)
+             if isinstance(resultado, BaseException)]
+    cenario = {
+        "sessoes": sessoes,
+        "rodadas": rodadas,
+        "duracao_s": round(duracao, 2),
+        "erros": erros,
+        "latencia_ms": {
+            etapa: {
+                "p50": round(percentil(tempos, 0.50) * 1000, 1),
+                "p95": round(percentil(tempos, 0.95) * 1000, 1),
+                "maximo": round(max(tempos) * 1000, 1),
+            }
+            for etapa, tempos in latencias.items() if tempos
+        },
+        "sessao_s": {
+            "media": round(statistics.fmean(tempos_sessao), 2),
+            "maximo": round(max(tempos_sessao), 2),
+        } if tempos_sessao else {},
+    }
+
+    if monitor is not None:
+        inicial, final = monitor.amostras[0], monitor.parar()
+        tempo = final["instante"] - inicial["instante"]
+        cpu = final["cpu_s"] - inicial["cpu_s"]
+        cpu_filhos = final["cpu_filhos_s"] - inicial["cpu_filhos_s"]
+        mega = 1024 * 1024
+        cenario["cpu"] = {
+            "servidor_s": round(cpu, 2),
+            "fila_tarefas_s": round(cpu_filhos, 2),
+            # Uso médio em núcleos (1.0 = um núcleo ocupado o tempo todo)
+            "nucleos_em_uso": round((cpu + cpu_filhos) / tempo, 2),
+        }
+        cenario["memoria_mb"] = {
+            "inicial": round(inicial["rss"] / mega, 1),
+            "pico": round(max(amostra["rss"] for amostra in monitor.amostras) / mega, 1),
+            "final": round(final["rss"] / mega, 1),
+            "crescimento": round((final["rss"] - inicial["rss"]) / mega, 1),
+            "crescimento_por_sessao": round((final["rss"] - inicial["rss"]) / mega / sessoes, 2),
+            "fila_tarefas_pico": round(max(amostra["rss_filhos"] for amostra in monitor.amostras) / mega, 1),
+        }
+    return cenario
+
+# Função para iniciar o Streamlit em um subprocesso, com os dados em uma pasta temporária
+def iniciar_servidor(porta):
+    ambiente = {**os.environ, "OFICIOS_DADOS_DIR": tempfile.mkdtemp(prefix="oficios-carga-ui-")}
+    processo = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", ARQUIVO_APP, "--server.headless", "true",
+         "--server.port", str(porta), "--server.fileWatcherType", "none", "--browser.gatherUsageStats", "false"],
+        env=ambiente, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    limite = time.monotonic() + TEMPO_MAXIMO
+    while time.monotonic() < limite:
+        if processo.poll() is not None:
+            raise RuntimeError(f"o Streamlit terminou com código {processo.returncode}")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{porta}/_stcore/health", timeout=1):
+                return processo
+        except OSError:
+            time.sleep(0.2)
+    processo.terminate()
+    raise RuntimeError("o Streamlit não respondeu a tempo")
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga da interface do Streamlit com várias sessões")
+    parser.add_argument("--sessoes", type=int, nargs="+", default=CENARIOS_PADRAO,
+                        help="quantidades de sessões simultâneas a medir (uma por cenário)")
+    parser.add_argument("--rodadas", type=int, default=1,
+                        help="vezes que cada sessão preenche os formulários e gera os ofícios (padrão: 1)")
+    parser.add_argument("--url", default=None, help="servidor já em execução (padrão: iniciar um próprio)")
+    parser.add_argument("--pid", type=int, default=None, help="processo do servidor informado em --url")
+    parser.add_argument("--saida", default=None, help="arquivo JSON com os resultados")
+    args = parser.parse_args()
+
+    processo = None
+    if args.url:
+        endereco = urlsplit(args.url)
+        url_websocket = f"ws://{endereco.netloc}/_stcore/stream"
+        pid = args.pid
+    else:
+        processo = iniciar_servidor(PORTA_TESTE)
+        url_websocket = f"ws://127.0.0.1:{PORTA_TESTE}/_stcore/stream"
+        pid = processo.pid
+
+    resultados = {"data_execucao": time.strftime("%Y-%m-%dT%H:%M:%S"), "cpus": os.cpu_count(), "cenarios": []}
+    try:
+        # Aquecimento: a primeira sessão importa os módulos, inicia a fila de tarefas e carrega os modelos
+        medir_cenario(url_websocket, 1, 1)
+        for sessoes in args.sessoes:
+            cenario = medir_cenario(url_websocket, sessoes, args.rodadas, pid)
+            resultados["cenarios"].append(cenario)
+            latencias = " | ".join(
+                f"{etapa} p50 {valores['p50']:.0f} / p95 {valores['p95']:.0f} ms"
+                for etapa, valores in cenario["latencia_ms"].items()
+            )
+            recursos = ""
+            if "cpu" in cenario:
+                recursos = (f" | CPU {cenario['cpu']['nucleos_em_uso']} núcleos"
+                            f" | RSS {cenario['memoria_mb']['final']} MB (+{cenario['memoria_mb']['crescimento']})")
+            print(
+                f"{sessoes:>4} sessões: sessão média {cenario['sessao_s'].get('media')} s | {latencias}{recursos}"
+                + (f" | {len(cenario['erros'])} erros" if cenario["erros"] else ""),
+                flush=True,
+            )
+    finally:
+        if processo is not None:
+            processo.terminate()
+            processo.wait()
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2, ensure_ascii=False)
+        print(f"Resultados gravados em {args.saida}")
+    return 1 if any(cenario["erros"] for cenario in resultados["cenarios"]) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
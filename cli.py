@@ -0,0 +1,158 @@
+# Linha de comando para gerar ofícios sem a interface do Streamlit.
+#
+# Uso:
+#     python cli.py gerar --csv casos.csv --out pasta/
+#     python cli.py gerar --xlsx casos.xlsx --numero-inicial 4886 --zip Oficios.zip
+#     python cli.py gerar --csv casos.csv --zip Oficios.zip --impressao Oficios_Impressao.docx
+#     python cli.py gerar --csv casos.csv --zip Oficios.zip --validar
+#     python cli.py gerar --csv casos.csv --zip Oficios.zip --formato ambos
+#
+# Sem --numero-inicial, a faixa de números é reservada na numeração compartilhada do ano.
+# Os ofícios gerados são gravados no histórico de ofícios emitidos (exceto com --sem-historico).
+#
+# Com --validar, a planilha passa pela mesma normalização e validação da geração em lote
+# da interface, e nada é gerado se alguma linha tiver problemas.
+#
+# Os módulos pesados (pandas, python-docx, multiprocessing) são importados apenas
+# quando necessários; o streamlit e o matplotlib nunca são carregados por aqui.
+import argparse
+import os
+import sys
+from datetime import date
+
+
+# Função para validar datas no formato AAAA-MM-DD
+def _data_iso(texto):
+    try:
+        return date.fromisoformat(texto)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"data inválida (use AAAA-MM-DD): {texto}")
+
+# Função para validar o número do primeiro ofício
+def _numero_oficio(texto):
+    if not texto.strip().isdigit():
+        raise argparse.ArgumentTypeError(f"o número do ofício deve ser inteiro: {texto}")
+    return texto.strip()
+
+# Função para montar o analisador de argumentos da linha de comando
+def criar_parser():
+    parser = argparse.ArgumentParser(prog="oficios", description="Gerador de Ofícios Automáticos - MPBA")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    gerar = subparsers.add_parser("gerar", help="gera os ofícios de uma planilha de casos")
+    planilha = gerar.add_mutually_exclusive_group(required=True)
+    planilha.add_argument("--csv", help="planilha CSV com um caso por linha")
+    planilha.add_argument("--xlsx", help="planilha XLSX com um caso por linha")
+    saida = gerar.add_mutually_exclusive_group(required=True)
+    saida.add_argument("--out", help="pasta onde os arquivos dos ofícios serão gravados")
+    saida.add_argument("--zip", help="arquivo ZIP onde os ofícios serão gravados")
+    gerar.add_argument("--impressao", default=None,
+                       help="grava também um único .docx com todos os ofícios, cada um em uma nova página")
+    gerar.add_argument("--numero-inicial", type=_numero_oficio, default=None,
+                       help="número do primeiro ofício do lote (padrão: reservar a próxima faixa "
+                            "livre na numeração compartilhada do ano)")
+    gerar.add_argument("--banco", default=None,
+                       help="banco SQLite da numeração (padrão: OFICIOS_DADOS_DIR/oficios.sqlite3)")
+    gerar.add_argument("--data", type=_data_iso, default=None,
+                       help="data dos ofícios no formato AAAA-MM-DD (padrão: hoje); "
+                            "define também o ano dos números e as datas gravadas nos arquivos")
+    gerar.add_argument("--processos", type=int, default=None,
+                       help="quantidade de processos (padrão: automático conforme o tamanho do lote)")
+    gerar.add_argument("--sem-historico", action="store_true",
+                       help="não gravar os ofícios gerados no histórico de ofícios emitidos")
+    gerar.add_argument("--formato", choices=("docx", "pdf", "ambos"), default="docx",
+                       help="formato dos ofícios gerados: .docx, PDF ou os dois (padrão: docx)")
+    gerar.add_argument("--validar", action="store_true",
+                       help="normaliza e valida a planilha antes de gerar (IDEA, telefones, CEPs, nomes, "
+                            "casos repetidos e números já usados), listando todos os problemas")
+    gerar.set_defaults(funcao=comando_gerar)
+
+    return parser
+
+# Função para ler a planilha com validação (usa o pandas). Mostra todos os problemas
+# encontrados e devolve None quando algum deles impede a geração.
+def _ler_planilha_validada(args, data_referencia):
+    from validacao import importar_planilha
+
+    importacao = importar_planilha(
+        args.csv or args.xlsx, ano=data_referencia.year,
+        numero_inicial=args.numero_inicial, caminho_numeracao=args.banco,
+    )
+    for problemas, nivel in ((importacao.avisos, "aviso"), (importacao.erros, "erro")):
+        for linha, coluna, valor, mensagem in problemas.itertuples(index=False):
+            print(f"{nivel}: linha {linha}, {coluna} ({valor!r}): {mensagem}", file=sys.stderr)
+    if len(importacao.erros):
+        print(f"erro: a planilha possui {len(importacao.erros)} problemas; nada foi gerado", file=sys.stderr)
+        return None
+    return importacao.casos
+
+# Função do comando "gerar"
+def comando_gerar(args):
+    from lote import (
+        ler_planilha, preparar_casos, gerar_documentos_lote, gerar_lote, gerar_documento_unico,
+        usos_do_lote, metadados_do_lote, formatos_gerados, FORMATOS_LOTE, OFICIOS_POR_CASO,
+    )
+    from numeracao import reservar_numeros, registrar_usos
+    from historico import registrar_documentos
+    from oficios import arquivo_do_documento, formato_documento
+
+    data_referencia = args.data or date.today()
+    try:
+        if args.validar:
+            linhas = _ler_planilha_validada(args, data_referencia)
+            if linhas is None:
+                return 1
+        else:
+            linhas = ler_planilha(args.csv or args.xlsx)
+    except (OSError, ValueError) as erro:
+        print(f"erro: {erro}", file=sys.stderr)
+        return 1
+
+    if not linhas:
+        print("erro: a planilha não possui casos", file=sys.stderr)
+        return 1
+
+    numero_inicial = args.numero_inicial
+    if numero_inicial is None:
+        numero_inicial = reservar_numeros(len(linhas) * OFICIOS_POR_CASO, data_referencia.year, caminho=args.banco)
+    casos = preparar_casos(linhas, numero_inicial, data_referencia)
+
+    formatos = FORMATOS_LOTE[args.formato]
+    if args.zip:
+        with open(args.zip, "wb") as destino:
+            gerar_lote(casos, destino=destino, max_workers=args.processos, data_referencia=data_referencia,
+                       registrar_historico=not args.sem_historico, formatos=formatos)
+    else:
+        os.makedirs(args.out, exist_ok=True)
+        documentos = gerar_documentos_lote(casos, args.processos, formatos_gerados(formatos, not args.sem_historico))
+        if not args.sem_historico:
+            documentos = registrar_documentos(documentos, metadados_do_lote(casos))
+        for nome_arquivo, conteudo in documentos:
+            if formato_documento(nome_arquivo) not in formatos:
+                continue
+            with open(os.path.join(args.out, arquivo_do_documento(nome_arquivo)), "wb") as f:
+                f.write(conteudo)
+
+    if args.impressao:
+        with open(args.impressao, "wb") as destino:
+            gerar_documento_unico(casos, destino=destino, data_referencia=data_referencia)
+
+    conflitos = registrar_usos(data_referencia.year, usos_do_lote(casos), caminho=args.banco)
+    for conflito in conflitos:
+        print(
+            f"aviso: o ofício nº {conflito['numero']} já estava registrado para o IDEA "
+            f"{conflito['idea_numero']} ({conflito['tipo']})",
+            file=sys.stderr,
+        )
+
+    print(f"{len(casos)} casos gerados (ofícios nº {numero_inicial} a "
+          f"{int(numero_inicial) + len(casos) * OFICIOS_POR_CASO - 1}).")
+    return 0
+
+def main(argv=None):
+    args = criar_parser().parse_args(argv)
+    return args.funcao(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+import io
+from datetime import date, timedelta
+
+import pandas as pd
+from matplotlib.figure import Figure
+
+from historico import producao_por_tipo, producao_por_faixa, TAMANHO_FAIXA_NUMEROS
+from modelos import MODELOS
+
+# As estatísticas são por tipo de ofício e faixa de números, sem divisão por servidor: as
+# sessões da interface são anônimas e nada no histórico identifica quem emitiu cada ofício.
+
+# Semanas mostradas no painel de produção
+SEMANAS_NO_PAINEL = 12
+
+# Resolução (pontos por polegada) dos gráficos gerados em PNG
+DPI_GRAFICOS = 110
+
+# Função para obter o título de um tipo de ofício (o próprio tipo, se ele saiu do registro)
+def _titulo_tipo(tipo):
+    definicao = MODELOS.get(tipo)
+    return definicao.titulo if definicao else tipo
+
+# Função para montar a tabela de ofícios por semana (linhas) e tipo (colunas) a partir dos
+# totais diários. A semana é indicada pela data da sua segunda-feira.
+def producao_semanal(semanas=SEMANAS_NO_PAINEL, caminho=None):
+    hoje = date.today()
+    inicio = hoje - timedelta(days=hoje.weekday(), weeks=semanas - 1)
+    df = pd.DataFrame(producao_por_tipo(inicio, caminho), columns=["dia", "tipo", "quantidade"])
+    segundas = pd.date_range(inicio, hoje, freq="W-MON")
+    if df.empty:
+        return pd.DataFrame(index=segundas.date)
+
+    dias = pd.to_datetime(df["dia"])
+    df["semana"] = (dias - pd.to_timedelta(dias.dt.weekday, unit="D")).dt.date
+    df["tipo"] = df["tipo"].map(_titulo_tipo)
+    tabela = df.pivot_table(index="semana", columns="tipo", values="quantidade", aggfunc="sum", fill_value=0)
+    tabela = tabela.reindex(segundas.date, fill_value=0)
+    tabela.columns.name = None
+    return tabela
+
+# Função para montar a tabela de ofícios por faixa de números (ex.: "101-200/2026")
+# nas últimas "semanas"
+def producao_por_faixas(semanas=SEMANAS_NO_PAINEL, caminho=None):
+    hoje = date.today()
+    inicio = hoje - timedelta(days=hoje.weekday(), weeks=semanas - 1)
+    df = pd.DataFrame(producao_por_faixa(inicio, caminho), columns=["dia", "ano", "faixa", "quantidade"])
+    if df.empty:
+        return pd.Series(dtype="int64")
+    totais = df.groupby(["ano", "faixa"])["quantidade"].sum()
+    totais.index = [
+        f"{faixa}-{faixa + TAMANHO_FAIXA_NUMEROS - 1}/{ano}" for ano, faixa in totais.index
+    ]
+    return totais
+
+# Função para converter uma figura do matplotlib em PNG
+def _png(figura):
+    buffer = io.BytesIO()
+    figura.savefig(buffer, format="png", dpi=DPI_GRAFICOS, bbox_inches="tight")
+    return buffer.getvalue()
+
+# Função para desenhar o gráfico de barras empilhadas dos ofícios por semana e tipo (PNG)
+def grafico_semanal(tabela):
+    # Figure diretamente (sem pyplot): não há estado global, então várias sessões podem desenhar juntas
+    figura = Figure(figsize=(9, 3.6))
+    eixo = figura.subplots()
+    rotulos = [semana.strftime("%d/%m") for semana in tabela.index]
+    base = [0] * len(tabela)
+    for coluna in tabela.columns:
+        eixo.bar(rotulos, tabela[coluna], bottom=base, label=coluna)
+        base = [anterior + valor for anterior, valor in zip(base, tabela[coluna])]
+    eixo.set_ylabel("Ofícios")
+    eixo.set_xlabel("Semana (segunda-feira)")
+    eixo.tick_params(axis="x", labelrotation=45)
+    if len(tabela.columns):
+        eixo.legend(loc="upper left", fontsize="small")
+    return _png(figura)
+
+# Função para desenhar o gráfico de barras dos ofícios por faixa de números (PNG)
+def grafico_faixas(totais):
+    figura = Figure(figsize=(9, 3.0))
+    eixo = figura.subplots()
+    eixo.bar(list(totais.index), list(totais.values), color="tab:gray")
+    eixo.set_ylabel("Ofícios")
+    eixo.set_xlabel("Faixa de números")
+    eixo.tick_params(axis="x", labelrotation=45)
+    return _png(figura)
+
+# Função para montar o painel de produção: tabelas e gráficos (PNG) calculados só com os
+# totais pré-somados do histórico
+def painel_producao(semanas=SEMANAS_NO_PAINEL, caminho=None):
+    semanal = producao_semanal(semanas, caminho)
+    faixas = producao_por_faixas(semanas, caminho)
+    return {
+        "semanal": semanal,
+        "faixas": faixas,
+        "grafico_semanal": grafico_semanal(semanal),
+        "grafico_faixas": grafico_faixas(faixas) if len(faixas) else None,
+    }
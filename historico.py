@@ -0,0 +1,278 @@
+import os
+import re
+import hashlib
+from collections import Counter
+from datetime import datetime
+
+import banco
+from oficios import DIRETORIO_DADOS, formato_documento
+
+# Banco SQLite com o histórico dos ofícios emitidos e o conteúdo dos arquivos
+BANCO_PADRAO = os.path.join(DIRETORIO_DADOS, "historico.sqlite3")
+
+# Quantidade de ofícios gravados por transação ao registrar lotes
+TAMANHO_BLOCO_REGISTRO = 500
+
+# Tamanho das faixas de números de ofício nas estatísticas de produção (1-100, 101-200...)
+TAMANHO_FAIXA_NUMEROS = 100
+
+# O conteúdo dos .docx fica em uma tabela separada, indexada pelo hash, e é gravado uma
+# única vez mesmo que o mesmo documento seja emitido de novo. A busca por nome usa um
+# índice FTS5 sem acentos, mantido por gatilho a cada ofício registrado.
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS conteudos (
+    hash TEXT PRIMARY KEY,
+    tamanho INTEGER NOT NULL,
+    dados BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS oficios_emitidos (
+    id INTEGER PRIMARY KEY,
+    tipo TEXT NOT NULL,
+    idea_numero TEXT NOT NULL,
+    numero_oficio TEXT NOT NULL,
+    ano INTEGER NOT NULL,
+    destinatario TEXT NOT NULL,
+    data_referencia TEXT NOT NULL,
+    nome_arquivo TEXT NOT NULL,
+    hash TEXT NOT NULL REFERENCES conteudos (hash),
+    emitido_em TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_oficios_emitidos_idea ON oficios_emitidos (idea_numero);
+CREATE INDEX IF NOT EXISTS idx_oficios_emitidos_numero ON oficios_emitidos (numero_oficio, ano);
+CREATE INDEX IF NOT EXISTS idx_oficios_emitidos_data ON oficios_emitidos (data_referencia);
+CREATE VIRTUAL TABLE IF NOT EXISTS oficios_busca USING fts5 (
+    destinatario, content='oficios_emitidos', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS oficios_emitidos_busca AFTER INSERT ON oficios_emitidos BEGIN
+    INSERT INTO oficios_busca (rowid, destinatario) VALUES (new.id, new.destinatario);
+END;
+"""
+
+# Arquivos já registrados por cada tarefa da fila (ver tarefas.py). Uma tarefa interrompida
+# é gerada de novo desde o início, e os ofícios que ela já tinha registrado não são gravados
+# (nem somados à produção) uma segunda vez.
+ESQUEMA += """
+CREATE TABLE IF NOT EXISTS oficios_por_tarefa (
+    tarefa TEXT NOT NULL,
+    nome_arquivo TEXT NOT NULL,
+    PRIMARY KEY (tarefa, nome_arquivo)
+) WITHOUT ROWID;
+"""
+
+# Totais de produção (ofícios emitidos por dia e tipo, e por dia e faixa de números),
+# atualizados na mesma transação que grava os ofícios, para as estatísticas não precisarem
+# percorrer o histórico. Um histórico anterior a essas tabelas é somado na primeira abertura.
+ESQUEMA += f"""
+CREATE TABLE IF NOT EXISTS producao_por_tipo (
+    dia TEXT NOT NULL,
+    tipo TEXT NOT NULL,
+    quantidade INTEGER NOT NULL,
+    PRIMARY KEY (dia, tipo)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS producao_por_faixa (
+    dia TEXT NOT NULL,
+    ano INTEGER NOT NULL,
+    faixa INTEGER NOT NULL,
+    quantidade INTEGER NOT NULL,
+    PRIMARY KEY (dia, ano, faixa)
+) WITHOUT ROWID;
+BEGIN IMMEDIATE;
+INSERT INTO producao_por_tipo (dia, tipo, quantidade)
+    SELECT substr(emitido_em, 1, 10), tipo, COUNT(*) FROM oficios_emitidos
+    WHERE NOT EXISTS (SELECT 1 FROM producao_por_tipo) GROUP BY 1, 2;
+INSERT INTO producao_por_faixa (dia, ano, faixa, quantidade)
+    SELECT substr(emitido_em, 1, 10), ano,
+           (CAST(numero_oficio AS INTEGER) - 1) / {TAMANHO_FAIXA_NUMEROS} * {TAMANHO_FAIXA_NUMEROS} + 1, COUNT(*)
+    FROM oficios_emitidos
+    WHERE NOT EXISTS (SELECT 1 FROM producao_por_faixa) AND numero_oficio NOT GLOB '*[^0-9]*'
+      AND numero_oficio != ''
+    GROUP BY 1, 2, 3;
+COMMIT;
+"""
+
+COLUNAS_RESULTADO = (
+    "id", "tipo", "idea_numero", "numero_oficio", "ano", "destinatario",
+    "data_referencia", "nome_arquivo", "hash", "emitido_em",
+)
+
+# Função para abrir uma conexão com o banco do histórico
+def conectar(caminho=None):
+    return banco.conectar(caminho or BANCO_PADRAO, ESQUEMA)
+
+# Função para calcular o hash do conteúdo de um documento
+def hash_conteudo(conteudo):
+    return hashlib.sha256(conteudo).hexdigest()
+
+# Função para gravar um bloco de ofícios em uma única transação
+def _gravar_bloco(conexao, registros):
+    emitido_em = datetime.now().isoformat(timespec="seconds")
+    conexao.execute("BEGIN IMMEDIATE")
+    try:
+        linhas = []
+        for registro in registros:
+            if registro.get("tarefa") is not None and conexao.execute(
+                "INSERT INTO oficios_por_tarefa (tarefa, nome_arquivo) VALUES (?, ?) ON CONFLICT DO NOTHING",
+                (registro["tarefa"], registro["nome_arquivo"]),
+            ).rowcount == 0:
+                continue
+            hash_documento = hash_conteudo(registro["conteudo"])
+            conexao.execute(
+                "INSERT INTO conteudos (hash, tamanho, dados) VALUES (?, ?, ?) ON CONFLICT (hash) DO NOTHING",
+                (hash_documento, len(registro["conteudo"]), registro["conteudo"]),
+            )
+            linhas.append((
+                registro["tipo"], str(registro["idea_numero"]), str(registro["numero_oficio"]),
+                int(registro["ano"]), registro["destinatario"], registro["data_referencia"].isoformat(),
+                registro["nome_arquivo"], hash_documento, emitido_em,
+            ))
+        conexao.executemany(
+            "INSERT INTO oficios_emitidos (tipo, idea_numero, numero_oficio, ano, destinatario, "
+            "data_referencia, nome_arquivo, hash, emitido_em) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            linhas,
+        )
+        _somar_producao(conexao, linhas)
+        conexao.execute("COMMIT")
+    except BaseException:
+        conexao.execute("ROLLBACK")
+        raise
+
+# Função para somar um bloco de ofícios gravados aos totais de produção (ver ESQUEMA)
+def _somar_producao(conexao, linhas):
+    por_tipo = Counter()
+    por_faixa = Counter()
+    for tipo, _, numero_oficio, ano, *_, emitido_em in linhas:
+        dia = emitido_em[:10]
+        por_tipo[dia, tipo] += 1
+        if numero_oficio.isdigit():
+            faixa = (int(numero_oficio) - 1) // TAMANHO_FAIXA_NUMEROS * TAMANHO_FAIXA_NUMEROS + 1
+            por_faixa[dia, ano, faixa] += 1
+    conexao.executemany(
+        "INSERT INTO producao_por_tipo (dia, tipo, quantidade) VALUES (?, ?, ?) "
+        "ON CONFLICT (dia, tipo) DO UPDATE SET quantidade = quantidade + excluded.quantidade",
+        [(*chave, quantidade) for chave, quantidade in por_tipo.items()],
+    )
+    conexao.executemany(
+        "INSERT INTO producao_por_faixa (dia, ano, faixa, quantidade) VALUES (?, ?, ?, ?) "
+        "ON CONFLICT (dia, ano, faixa) DO UPDATE SET quantidade = quantidade + excluded.quantidade",
+        [(*chave, quantidade) for chave, quantidade in por_faixa.items()],
+    )
+
+# Função para registrar ofícios emitidos. Cada registro é um dicionário com tipo,
+# idea_numero, numero_oficio, ano, destinatario, data_referencia (date), nome_arquivo e conteudo.
+# Registros com "tarefa" (o identificador da tarefa da fila que os gerou) são gravados uma
+# única vez por tarefa e nome de arquivo.
+def registrar_oficios(registros, caminho=None):
+    conexao = conectar(caminho)
+    try:
+        registros = list(registros)
+        for inicio in range(0, len(registros), TAMANHO_BLOCO_REGISTRO):
+            _gravar_bloco(conexao, registros[inicio:inicio + TAMANHO_BLOCO_REGISTRO])
+    finally:
+        conexao.close()
+
+# Função que repassa os documentos (nome, conteudo) de um lote enquanto os registra no
+# histórico em blocos, sem guardar o lote inteiro na memória. "metadados" traz, na mesma
+# ordem dos documentos, os demais campos de cada registro. Só os .docx são registrados; os
+# documentos em outros formatos (ver oficios.nome_documento) apenas passam adiante.
+def registrar_documentos(documentos, metadados, caminho=None):
+    conexao = conectar(caminho)
+    try:
+        bloco = []
+        metadados = iter(metadados)
+        for nome_arquivo, conteudo in documentos:
+            if formato_documento(nome_arquivo) != "docx":
+                yield nome_arquivo, conteudo
+                continue
+            dados = next(metadados)
+            bloco.append({**dados, "nome_arquivo": nome_arquivo, "conteudo": conteudo})
+            if len(bloco) >= TAMANHO_BLOCO_REGISTRO:
+                _gravar_bloco(conexao, bloco)
+                bloco = []
+            yield nome_arquivo, conteudo
+        if bloco:
+            _gravar_bloco(conexao, bloco)
+    finally:
+        conexao.close()
+
+# Função para montar a consulta FTS5 (prefixo de cada palavra) a partir do texto digitado
+def _consulta_fts(termo):
+    palavras = re.findall(r"\w+", termo)
+    return " ".join(f'"{palavra}"*' for palavra in palavras)
+
+# Função para buscar ofícios emitidos pelo número IDEA (prefixo), número do ofício,
+# nome do destinatário (palavras ou inícios de palavras, sem acentos) e/ou data.
+# Devolve no máximo "limite" resultados, dos mais recentes aos mais antigos.
+def buscar_oficios(termo="", data_referencia=None, limite=50, caminho=None):
+    termo = termo.strip()
+    filtros = []
+    parametros = []
+    if termo:
+        subconsultas = [
+            "SELECT id FROM oficios_emitidos WHERE idea_numero >= ? AND idea_numero < ?",
+            "SELECT id FROM oficios_emitidos WHERE numero_oficio = ?",
+        ]
+        parametros += [termo, termo + "\uffff", termo]
+        consulta_fts = _consulta_fts(termo)
+        if consulta_fts:
+            subconsultas.append("SELECT rowid FROM oficios_busca WHERE oficios_busca MATCH ?")
+            parametros.append(consulta_fts)
+        filtros.append(f"id IN ({' UNION '.join(subconsultas)})")
+    if data_referencia is not None:
+        filtros.append("data_referencia = ?")
+        parametros.append(data_referencia.isoformat())
+
+    sql = f"SELECT {', '.join(COLUNAS_RESULTADO)} FROM oficios_emitidos"
+    if filtros:
+        sql += " WHERE " + " AND ".join(filtros)
+    sql += " ORDER BY id DESC LIMIT ?"
+    parametros.append(limite)
+
+    conexao = conectar(caminho)
+    try:
+        linhas = conexao.execute(sql, parametros).fetchall()
+    finally:
+        conexao.close()
+    return [dict(zip(COLUNAS_RESULTADO, linha)) for linha in linhas]
+
+# Função para obter os bytes de um documento guardado (None se o hash não existir)
+def obter_conteudo(hash_documento, caminho=None):
+    conexao = conectar(caminho)
+    try:
+        linha = conexao.execute("SELECT dados FROM conteudos WHERE hash = ?", (hash_documento,)).fetchone()
+    finally:
+        conexao.close()
+    return linha[0] if linha else None
+
+# Função para obter a versão dos dados de produção: muda a cada ofício registrado, então
+# serve de chave para guardar gráficos e tabelas até chegarem ofícios novos
+def versao_producao(caminho=None):
+    conexao = conectar(caminho)
+    try:
+        return conexao.execute("SELECT COALESCE(MAX(id), 0) FROM oficios_emitidos").fetchone()[0]
+    finally:
+        conexao.close()
+
+# Função para obter os totais de produção por dia e tipo, como (dia, tipo, quantidade),
+# opcionalmente a partir de um dia (date)
+def producao_por_tipo(desde=None, caminho=None):
+    conexao = conectar(caminho)
+    try:
+        return conexao.execute(
+            "SELECT dia, tipo, quantidade FROM producao_por_tipo WHERE dia >= ? ORDER BY dia, tipo",
+            (desde.isoformat() if desde else "",),
+        ).fetchall()
+    finally:
+        conexao.close()
+
+# Função para obter os totais de produção por dia e faixa de números, como
+# (dia, ano, faixa, quantidade), opcionalmente a partir de um dia (date)
+def producao_por_faixa(desde=None, caminho=None):
+    conexao = conectar(caminho)
+    try:
+        return conexao.execute(
+            "SELECT dia, ano, faixa, quantidade FROM producao_por_faixa WHERE dia >= ? ORDER BY dia, ano, faixa",
+            (desde.isoformat() if desde else "",),
+        ).fetchall()
+    finally:
+        conexao.close()
@@ -0,0 +1,269 @@
+import os
+import io
+import csv
+import zipfile
+import tempfile
+from functools import partial
+
+from modelos import destinatario_oficio
+from oficios import (
+    renderizar_oficio_formato,
+    nome_documento,
+    formato_documento,
+    escrever_zip_oficios,
+    escrever_documento_unico_oficios,
+    formatar_data_ptbr,
+    nome_arquivo_oficio,
+)
+
+# Colunas esperadas na planilha (uma linha por caso)
+COLUNAS_OBRIGATORIAS = [
+    "idea_numero",
+    "nome_vitima",
+    "endereco_vitima",
+    "nome_acusado",
+    "endereco_acusado",
+]
+COLUNAS_OPCIONAIS = ["telefone_vitima", "telefone_acusado"]
+
+# Cada caso consome três números de ofício (delegacia, vítima e acusado)
+OFICIOS_POR_CASO = 3
+
+# Quantidade de casos enviada ao pool por processo em cada janela de geração
+CASOS_POR_JANELA_E_PROCESSO = 64
+
+# Abaixo deste número de casos o lote é gerado no próprio processo (iniciar o pool custa mais)
+LIMITE_CASOS_SEM_POOL = 32
+
+# Tamanho a partir do qual o ZIP do lote sai da memória e passa a ser gravado em disco
+LIMITE_ZIP_EM_MEMORIA = 32 * 1024 * 1024
+
+# Opções de formato dos arquivos do lote e os formatos gerados em cada uma
+FORMATOS_LOTE = {"docx": ("docx",), "pdf": ("pdf",), "ambos": ("docx", "pdf")}
+
+# Delimitadores aceitos nos CSV (o Excel em português salva CSV separado por ";")
+DELIMITADORES_CSV = ",;"
+
+# Função para descobrir o delimitador de um CSV pelo cabeçalho (vírgula quando não der para saber).
+# Arquivos abertos voltam à posição em que estavam.
+def delimitador_csv(arquivo):
+    if isinstance(arquivo, str):
+        with open(arquivo, "rb") as f:
+            cabecalho = f.readline()
+    else:
+        posicao = arquivo.tell()
+        cabecalho = arquivo.readline()
+        arquivo.seek(posicao)
+    try:
+        dialeto = csv.Sniffer().sniff(cabecalho.decode("utf-8-sig", errors="replace"), delimiters=DELIMITADORES_CSV)
+    except csv.Error:
+        return ","
+    return dialeto.delimiter
+
+# Função para ler o cabeçalho e as linhas de um CSV sem depender do pandas
+def _ler_linhas_csv(arquivo):
+    delimitador = delimitador_csv(arquivo)
+    if isinstance(arquivo, str):
+        with open(arquivo, newline="", encoding="utf-8-sig") as f:
+            leitor = csv.DictReader(f, delimiter=delimitador)
+            return leitor.fieldnames or [], list(leitor)
+
+    texto = io.TextIOWrapper(arquivo, encoding="utf-8-sig", newline="")
+    try:
+        leitor = csv.DictReader(texto, delimiter=delimitador)
+        return leitor.fieldnames or [], list(leitor)
+    finally:
+        texto.detach()
+
+# Função para ler uma planilha XLSX como DataFrame de textos (o pandas só é importado aqui).
+# Arquivos corrompidos ou que não são XLSX (ex.: renomeados) viram ValueError, como os
+# demais problemas da planilha.
+def ler_xlsx_df(arquivo):
+    import pandas as pd
+    from openpyxl.utils.exceptions import InvalidFileException
+
+    try:
+        return pd.read_excel(arquivo, dtype=str, engine="openpyxl").fillna("")
+    except (zipfile.BadZipFile, InvalidFileException, KeyError) as erro:
+        raise ValueError(f"planilha inválida: {erro}") from erro
+
+# Função para ler o cabeçalho e as linhas de uma planilha XLSX
+def _ler_linhas_xlsx(arquivo):
+    df = ler_xlsx_df(arquivo)
+    return list(df.columns), df.to_dict("records")
+
+# Função para ler a planilha de casos (CSV ou XLSX) como uma lista de linhas
+def ler_planilha(arquivo, nome_arquivo=None):
+    if nome_arquivo is None:
+        nome_arquivo = arquivo if isinstance(arquivo, str) else getattr(arquivo, "name", "")
+    if str(nome_arquivo).lower().endswith(".csv"):
+        cabecalho, linhas = _ler_linhas_csv(arquivo)
+    else:
+        cabecalho, linhas = _ler_linhas_xlsx(arquivo)
+
+    cabecalho = {str(coluna).strip().lower() for coluna in cabecalho}
+    faltando = [coluna for coluna in COLUNAS_OBRIGATORIAS if coluna not in cabecalho]
+    if faltando:
+        raise ValueError(f"Colunas obrigatórias ausentes na planilha: {', '.join(faltando)}")
+
+    casos = []
+    for linha in linhas:
+        linha = {str(coluna).strip().lower(): valor for coluna, valor in linha.items()}
+        caso = {
+            coluna: "" if linha.get(coluna) is None else str(linha[coluna]).strip()
+            for coluna in COLUNAS_OBRIGATORIAS + COLUNAS_OPCIONAIS
+        }
+        # Ignorar linhas totalmente vazias (comuns no final de planilhas)
+        if any(caso.values()):
+            casos.append(caso)
+    return casos
+
+# Função para montar a lista de casos com a numeração sequencial do lote
+def preparar_casos(linhas, numero_inicial, data_referencia):
+    data = formatar_data_ptbr(data_referencia)
+    casos = []
+    for indice, linha in enumerate(linhas):
+        numero_base = int(numero_inicial) + indice * OFICIOS_POR_CASO
+        casos.append({
+            "numero_oficio_1": str(numero_base),
+            "numero_oficio_2": str(numero_base + 1),
+            "numero_oficio_3": str(numero_base + 2),
+            "data": data,
+            "data_referencia": data_referencia,
+            **linha,
+        })
+    return casos
+
+# Função para descrever um ofício de um caso: tipo, número, nome do arquivo, destinatário
+# (ver modelos.destinatario_oficio) e os valores que preenchem o modelo
+def _oficio_do_caso(tipo, valores):
+    return {
+        "tipo": tipo,
+        "numero_oficio": valores["numero_oficio"],
+        "nome_arquivo": nome_arquivo_oficio(tipo, valores["numero_oficio"]),
+        "destinatario": destinatario_oficio(tipo, valores),
+        "valores": valores,
+    }
+
+# Função para descrever os três ofícios de um caso, na ordem em que são gerados. Os valores
+# de cada um (com a data de referência) são tudo de que ele depende: o ofício 1 só usa número,
+# data e IDEA; os ofícios 2 e 3 usam também os dados do próprio destinatário, então corrigir a
+# vítima não muda o do acusado.
+def oficios_do_caso(caso):
+    comuns = {"data": caso["data"], "numero_idea": caso["idea_numero"]}
+    return [
+        _oficio_do_caso("arquivamento", {"numero_oficio": caso["numero_oficio_1"], **comuns}),
+        _oficio_do_caso("notificacao_vitima", {
+            "numero_oficio": caso["numero_oficio_2"], **comuns, "nome_vitima": caso["nome_vitima"],
+            "endereco": caso["endereco_vitima"], "telefone": caso["telefone_vitima"],
+        }),
+        _oficio_do_caso("notificacao_acusado", {
+            "numero_oficio": caso["numero_oficio_3"], **comuns, "nome_acusado": caso["nome_acusado"],
+            "endereco": caso["endereco_acusado"], "telefone": caso["telefone_acusado"],
+        }),
+    ]
+
+# Função para listar os números de ofício usados pelo lote, como (numero, idea_numero, tipo)
+def usos_do_lote(casos):
+    return [
+        (oficio["numero_oficio"], caso["idea_numero"], oficio["tipo"])
+        for caso in casos
+        for oficio in oficios_do_caso(caso)
+    ]
+
+# Função para obter, na ordem dos documentos gerados, os dados de cada ofício para o histórico
+def metadados_do_lote(casos):
+    for caso in casos:
+        for oficio in oficios_do_caso(caso):
+            yield {
+                "tipo": oficio["tipo"],
+                "idea_numero": caso["idea_numero"],
+                "numero_oficio": oficio["numero_oficio"],
+                "ano": caso["data_referencia"].year,
+                "destinatario": oficio["destinatario"],
+                "data_referencia": caso["data_referencia"],
+            }
+
+# Função executada em cada processo do pool: gera os três ofícios de um caso, cada um em
+# todos os formatos pedidos (ver oficios.nome_documento)
+def gerar_caso(caso, formatos=FORMATOS_LOTE["docx"]):
+    return [
+        gerar_oficio(oficio, caso["data_referencia"], formato)
+        for oficio in oficios_do_caso(caso)
+        for formato in formatos
+    ]
+
+# Função executada em cada processo do pool: gera um único ofício de um caso (ver oficios_do_caso)
+def gerar_oficio(oficio, data_referencia, formato="docx"):
+    return (
+        nome_documento(oficio["nome_arquivo"], formato),
+        renderizar_oficio_formato(oficio["tipo"], formato, data_referencia, **oficio["valores"]),
+    )
+
+# Função para obter os formatos que precisam ser gerados: o histórico guarda o .docx de cada
+# ofício, então ele é gerado mesmo quando o lote leva só os PDFs
+def formatos_gerados(formatos, registrar_historico):
+    return formatos if "docx" in formatos or not registrar_historico else ("docx",) + tuple(formatos)
+
+# Função para gerar os ofícios do lote em paralelo, devolvendo-os na ordem dos casos.
+# Os casos são enviados ao pool em janelas para que os documentos prontos e ainda não
+# consumidos não se acumulem na memória em lotes muito grandes.
+def gerar_documentos_lote(casos, max_workers=None, formatos=FORMATOS_LOTE["docx"]):
+    if max_workers is None:
+        max_workers = 1 if len(casos) < LIMITE_CASOS_SEM_POOL else (os.cpu_count() or 1)
+    if max_workers == 1:
+        for caso in casos:
+            yield from gerar_caso(caso, formatos)
+        return
+
+    from processos import criar_pool_processos
+    from metricas import executar_medindo, resultados_medidos
+
+    tamanho_janela = max_workers * CASOS_POR_JANELA_E_PROCESSO
+    # Cada janela é dividida em blocos para reduzir a troca de mensagens entre processos
+    chunksize = max(1, min(len(casos), tamanho_janela) // (max_workers * 4))
+
+    with criar_pool_processos(max_workers) as executor:
+        for inicio in range(0, len(casos), tamanho_janela):
+            janela = casos[inicio:inicio + tamanho_janela]
+            # As métricas de cada processo voltam com os documentos (ver metricas.executar_medindo)
+            chamadas = executor.map(
+                partial(executar_medindo, gerar_caso, formatos=formatos), janela, chunksize=chunksize
+            )
+            for documentos in resultados_medidos(chamadas):
+                yield from documentos
+
+# Função para gerar todos os ofícios do lote em paralelo e gravá-los em um único ZIP.
+# Sem destino, o ZIP fica em memória até LIMITE_ZIP_EM_MEMORIA e depois passa para o disco.
+# Com registrar_historico, cada ofício também é gravado no histórico de ofícios emitidos.
+# "formatos" são os formatos dos arquivos no ZIP (ver FORMATOS_LOTE).
+def gerar_lote(casos, destino=None, max_workers=None, data_referencia=None, registrar_historico=False,
+               formatos=FORMATOS_LOTE["docx"]):
+    if destino is None:
+        destino = tempfile.SpooledTemporaryFile(max_size=LIMITE_ZIP_EM_MEMORIA)
+    gerados = formatos_gerados(formatos, registrar_historico)
+    documentos = gerar_documentos_lote(casos, max_workers, gerados)
+    if registrar_historico:
+        from historico import registrar_documentos
+        documentos = registrar_documentos(documentos, metadados_do_lote(casos))
+    if gerados != formatos:
+        documentos = (documento for documento in documentos if formato_documento(documento[0]) in formatos)
+    escrever_zip_oficios(documentos, destino, data_referencia=data_referencia)
+    destino.seek(0)
+    return destino
+
+# Função para gerar um único .docx com todos os ofícios do lote, um por seção, para impressão.
+# Cada ofício entra apenas com o XML do seu corpo, preenchido direto do modelo compilado, e o
+# arquivo é gravado à medida que os ofícios são gerados, então tempo e memória crescem de forma
+# linear com o lote. Sem destino, o arquivo fica em memória até LIMITE_ZIP_EM_MEMORIA.
+def gerar_documento_unico(casos, destino=None, data_referencia=None):
+    if destino is None:
+        destino = tempfile.SpooledTemporaryFile(max_size=LIMITE_ZIP_EM_MEMORIA)
+    oficios = (
+        (oficio["tipo"], caso["data_referencia"], oficio["valores"])
+        for caso in casos
+        for oficio in oficios_do_caso(caso)
+    )
+    escrever_documento_unico_oficios(oficios, destino, data_referencia=data_referencia)
+    destino.seek(0)
+    return destino
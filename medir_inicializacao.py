@@ -0,0 +1,88 @@
+# Mede o tempo de inicialização da linha de comando (cli.py) gerando um único caso,
+# como nas execuções feitas a partir de scripts, e confere o orçamento de tempo.
+#
+# Uso:
+#     python medir_inicializacao.py [--execucoes 20] [--orcamento-ms 200]
+#
+# Termina com código 1 se a mediana passar do orçamento ou se a linha de comando
+# carregar algum módulo que só a interface precisa (streamlit, pandas, matplotlib).
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Orçamento de tempo para gerar um caso pela linha de comando (mediana, cache de modelos aquecido)
+ORCAMENTO_MS = 200
+
+# Módulos que a linha de comando não deve carregar ao gerar a partir de um CSV
+MODULOS_PROIBIDOS = ("streamlit", "pandas", "matplotlib")
+
+DIRETORIO = os.path.dirname(os.path.abspath(__file__))
+
+CSV_EXEMPLO = (
+    "idea_numero,nome_vitima,endereco_vitima,telefone_vitima,nome_acusado,endereco_acusado,telefone_acusado\n"
+    "596.9.489799,Maria da Silva,\"Rua A, 10\",75 99999-0000,João Souza,\"Rua B, 20\",\n"
+)
+
+# Função para conferir quais módulos proibidos são carregados pela linha de comando
+def _modulos_carregados(argumentos):
+    codigo = (
+        "import sys, cli; cli.main(sys.argv[1:]); "
+        f"print('MODULOS:' + ','.join(m for m in {MODULOS_PROIBIDOS!r} if m in sys.modules))"
+    )
+    resultado = subprocess.run(
+        [sys.executable, "-c", codigo, *argumentos],
+        cwd=DIRETORIO, capture_output=True, text=True, check=True,
+    )
+    carregados = resultado.stdout.rsplit("MODULOS:", 1)[1].strip()
+    return [modulo for modulo in carregados.split(",") if modulo]
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede o tempo de inicialização da linha de comando")
+    parser.add_argument("--execucoes", type=int, default=20)
+    parser.add_argument("--orcamento-ms", type=float, default=ORCAMENTO_MS)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temporario:
+        caminho_csv = os.path.join(temporario, "casos.csv")
+        with open(caminho_csv, "w", encoding="utf-8") as f:
+            f.write(CSV_EXEMPLO)
+        argumentos = [
+            "gerar", "--csv", caminho_csv, "--numero-inicial", "1",
+            "--out", os.path.join(temporario, "saida"),
+        ]
+        comando = [sys.executable, os.path.join(DIRETORIO, "cli.py"), *argumentos]
+        # A numeração de teste fica no diretório temporário, longe do banco real
+        os.environ["OFICIOS_DADOS_DIR"] = os.path.join(temporario, "dados")
+
+        # A primeira execução compila os modelos e aquece o cache em disco
+        subprocess.run(comando, check=True, capture_output=True)
+
+        tempos = []
+        for _ in range(args.execucoes):
+            inicio = time.perf_counter()
+            subprocess.run(comando, check=True, capture_output=True)
+            tempos.append((time.perf_counter() - inicio) * 1000)
+
+        carregados = _modulos_carregados(argumentos)
+
+    mediana = statistics.median(tempos)
+    print(f"execuções: {len(tempos)}")
+    print(f"mediana: {mediana:.1f} ms | mínimo: {min(tempos):.1f} ms | máximo: {max(tempos):.1f} ms")
+    print(f"orçamento: {args.orcamento_ms:.0f} ms")
+
+    ok = True
+    if mediana > args.orcamento_ms:
+        print("ERRO: tempo de inicialização acima do orçamento", file=sys.stderr)
+        ok = False
+    if carregados:
+        print(f"ERRO: módulos carregados sem necessidade: {', '.join(carregados)}", file=sys.stderr)
+        ok = False
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
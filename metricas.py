@@ -0,0 +1,155 @@
+import os
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+
+# Arquivo (formato texto do Prometheus) lido pelo textfile collector do node exporter
+ARQUIVO_PROMETHEUS = os.environ.get("OFICIOS_METRICAS_ARQUIVO")
+
+# Limites (em segundos) dos buckets dos histogramas de duração
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+_histogramas = {}
+_contadores = {}
+
+# Função para registrar a duração (em segundos) de uma etapa da geração
+def observar(etapa, duracao):
+    with _lock:
+        histograma = _histogramas.get(etapa)
+        if histograma is None:
+            histograma = {"buckets": [0] * len(BUCKETS), "soma": 0.0, "contagem": 0, "maximo": 0.0}
+            _histogramas[etapa] = histograma
+        indice = bisect_left(BUCKETS, duracao)
+        if indice < len(BUCKETS):
+            histograma["buckets"][indice] += 1
+        histograma["soma"] += duracao
+        histograma["contagem"] += 1
+        histograma["maximo"] = max(histograma["maximo"], duracao)
+
+# Função para incrementar um contador de eventos
+def incrementar(evento, quantidade=1):
+    with _lock:
+        _contadores[evento] = _contadores.get(evento, 0) + quantidade
+
+# Gerenciador de contexto para medir a duração de um trecho de código
+@contextmanager
+def medir(etapa):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        observar(etapa, time.perf_counter() - inicio)
+
+# Decorador para medir a duração de cada chamada de uma função
+def medir_funcao(etapa):
+    def decorador(funcao):
+        @wraps(funcao)
+        def envolvida(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return funcao(*args, **kwargs)
+            finally:
+                observar(etapa, time.perf_counter() - inicio)
+        return envolvida
+    return decorador
+
+# Função para obter um resumo das etapas medidas (usado no painel da interface)
+def resumo():
+    with _lock:
+        etapas = [
+            {
+                "etapa": etapa,
+                "chamadas": histograma["contagem"],
+                "total_ms": round(histograma["soma"] * 1000, 2),
+                "media_ms": round(histograma["soma"] * 1000 / histograma["contagem"], 3),
+                "maximo_ms": round(histograma["maximo"] * 1000, 3),
+            }
+            for etapa, histograma in sorted(_histogramas.items())
+        ]
+        contadores = dict(sorted(_contadores.items()))
+    return etapas, contadores
+
+# Função para zerar todas as métricas
+def zerar():
+    with _lock:
+        _histogramas.clear()
+        _contadores.clear()
+
+# Função para retirar as métricas acumuladas neste processo (que voltam a zero), para
+# somá-las às de outro processo com incorporar
+def coletar():
+    with _lock:
+        metricas = {"histogramas": dict(_histogramas), "contadores": dict(_contadores)}
+        _histogramas.clear()
+        _contadores.clear()
+    return metricas
+
+# Função para somar às métricas deste processo as coletadas em outro (ver coletar)
+def incorporar(metricas):
+    with _lock:
+        for etapa, recebido in metricas["histogramas"].items():
+            histograma = _histogramas.get(etapa)
+            if histograma is None:
+                _histogramas[etapa] = recebido
+                continue
+            histograma["buckets"] = [atual + novo for atual, novo in zip(histograma["buckets"], recebido["buckets"])]
+            histograma["soma"] += recebido["soma"]
+            histograma["contagem"] += recebido["contagem"]
+            histograma["maximo"] = max(histograma["maximo"], recebido["maximo"])
+        for evento, quantidade in metricas["contadores"].items():
+            _contadores[evento] = _contadores.get(evento, 0) + quantidade
+
+# Função executada nos processos de um pool: chama a função e devolve o resultado junto com
+# as métricas que ela acumulou no processo. Quem envia a chamada soma essas métricas às
+# suas (com incorporar), então o resumo e o Prometheus incluem o trabalho feito no pool.
+def executar_medindo(funcao, *args, **kwargs):
+    resultado = funcao(*args, **kwargs)
+    return resultado, coletar()
+
+# Função para obter os resultados de chamadas feitas com executar_medindo, somando as
+# métricas de cada uma às deste processo
+def resultados_medidos(chamadas):
+    for resultado, metricas in chamadas:
+        incorporar(metricas)
+        yield resultado
+
+# Função para formatar números no padrão do Prometheus
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+# Função para gerar as métricas no formato texto do Prometheus
+def texto_prometheus():
+    with _lock:
+        linhas = [
+            "# HELP oficios_etapa_duracao_segundos Duração das etapas de geração dos ofícios.",
+            "# TYPE oficios_etapa_duracao_segundos histogram",
+        ]
+        for etapa, histograma in sorted(_histogramas.items()):
+            acumulado = 0
+            for limite, quantidade in zip(BUCKETS, histograma["buckets"]):
+                acumulado += quantidade
+                linhas.append(f'oficios_etapa_duracao_segundos_bucket{{etapa="{etapa}",le="{limite}"}} {acumulado}')
+            linhas.append(f'oficios_etapa_duracao_segundos_bucket{{etapa="{etapa}",le="+Inf"}} {histograma["contagem"]}')
+            linhas.append(f'oficios_etapa_duracao_segundos_sum{{etapa="{etapa}"}} {_numero(histograma["soma"])}')
+            linhas.append(f'oficios_etapa_duracao_segundos_count{{etapa="{etapa}"}} {histograma["contagem"]}')
+
+        linhas.append("# HELP oficios_eventos_total Eventos da geração dos ofícios.")
+        linhas.append("# TYPE oficios_eventos_total counter")
+        for evento, quantidade in sorted(_contadores.items()):
+            linhas.append(f'oficios_eventos_total{{evento="{evento}"}} {quantidade}')
+    return "\n".join(linhas) + "\n"
+
+# Função para gravar as métricas no arquivo do Prometheus (troca atômica, para o
+# node exporter nunca ler um arquivo pela metade). Sem caminho configurado, não faz nada.
+def exportar_prometheus(caminho=None):
+    caminho = caminho or ARQUIVO_PROMETHEUS
+    if not caminho:
+        return None
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        f.write(texto_prometheus())
+    os.replace(temporario, caminho)
+    return caminho
@@ -0,0 +1,102 @@
+import os
+import json
+from collections import namedtuple
+from types import MappingProxyType
+from string import Formatter
+
+# Registro com a definição de cada tipo de ofício (texto, formatação e campos variáveis)
+ARQUIVO_MODELOS = os.environ.get("OFICIOS_MODELOS_ARQUIVO") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "modelos_oficios.json"
+)
+
+# Alinhamentos aceitos no registro
+ALINHAMENTOS = ("esquerda", "direita", "centro", "justificado")
+
+# Campo preenchido automaticamente com o ano da data de referência
+CAMPO_ANO = "ano"
+
+# Operação de montagem: um parágrafo com uma única formatação. Com "condicao", o
+# parágrafo só é incluído quando o campo indicado está preenchido.
+Paragrafo = namedtuple("Paragrafo", "texto negrito italico alinhamento antes depois condicao")
+
+# Definição compilada de um tipo de ofício. "destinatario" é o texto (com campos, como os
+# parágrafos) que identifica o destinatário no histórico de ofícios emitidos.
+DefinicaoOficio = namedtuple("DefinicaoOficio", "tipo titulo destinatario campos opcionais paragrafos")
+
+# Função para listar os campos usados em um texto do registro
+def _campos_do_texto(texto):
+    return {campo for _, campo, _, _ in Formatter().parse(texto) if campo is not None}
+
+# Função para compilar um parágrafo do registro em uma operação de montagem
+def _compilar_paragrafo(tipo, item, campos):
+    desconhecidas = set(item) - {"texto", "negrito", "italico", "alinhamento", "antes", "depois", "se"}
+    if desconhecidas:
+        raise ValueError(f"Ofício '{tipo}': chaves desconhecidas no parágrafo: {', '.join(sorted(desconhecidas))}")
+
+    texto = item.get("texto", "")
+    faltando = _campos_do_texto(texto) - set(campos) - {CAMPO_ANO}
+    if faltando:
+        raise ValueError(f"Ofício '{tipo}': campos não declarados no texto: {', '.join(sorted(faltando))}")
+
+    alinhamento = item.get("alinhamento", "esquerda")
+    if alinhamento not in ALINHAMENTOS:
+        raise ValueError(f"Ofício '{tipo}': alinhamento inválido: {alinhamento}")
+
+    condicao = item.get("se")
+    if condicao is not None and condicao not in campos:
+        raise ValueError(f"Ofício '{tipo}': condição com campo não declarado: {condicao}")
+
+    return Paragrafo(
+        texto, bool(item.get("negrito", False)), bool(item.get("italico", False)), alinhamento,
+        item.get("antes", 0), item.get("depois", 0), condicao,
+    )
+
+# Função para compilar a definição de um tipo de ofício, expandindo os blocos compartilhados
+def _compilar_oficio(tipo, definicao, blocos):
+    campos = tuple(definicao["campos"])
+    opcionais = tuple(definicao.get("opcionais", ()))
+    if not set(opcionais) <= set(campos):
+        raise ValueError(f"Ofício '{tipo}': campos opcionais não declarados em 'campos'")
+
+    destinatario = definicao.get("destinatario")
+    if not isinstance(destinatario, str) or not destinatario.strip():
+        raise ValueError(f"Ofício '{tipo}': informe o destinatário (texto ou campo, ex.: \"{{nome}}\")")
+    faltando = _campos_do_texto(destinatario) - set(campos)
+    if faltando:
+        raise ValueError(f"Ofício '{tipo}': campos não declarados no destinatário: {', '.join(sorted(faltando))}")
+
+    paragrafos = []
+    for item in definicao["paragrafos"]:
+        if "bloco" in item:
+            if item["bloco"] not in blocos:
+                raise ValueError(f"Ofício '{tipo}': bloco desconhecido: {item['bloco']}")
+            paragrafos.extend(_compilar_paragrafo(tipo, bloco, campos) for bloco in blocos[item["bloco"]])
+        else:
+            paragrafos.append(_compilar_paragrafo(tipo, item, campos))
+
+    return DefinicaoOficio(
+        tipo, definicao.get("titulo", tipo), destinatario, campos + (CAMPO_ANO,), opcionais, tuple(paragrafos)
+    )
+
+# Função para ler e compilar o registro de modelos (uma única vez, na importação)
+def carregar_modelos(caminho=ARQUIVO_MODELOS):
+    with open(caminho, encoding="utf-8") as f:
+        registro = json.load(f)
+    blocos = registro.get("blocos", {})
+    return {
+        tipo: _compilar_oficio(tipo, definicao, blocos)
+        for tipo, definicao in registro["oficios"].items()
+    }
+
+MODELOS = MappingProxyType(carregar_modelos())
+
+# Função para obter a definição compilada de um tipo de ofício
+def obter_definicao(tipo):
+    try:
+        return MODELOS[tipo]
+    except KeyError:
+        raise ValueError(f"Tipo de ofício desconhecido: {tipo}") from None
+
+# Função para obter o destinatário de um ofício a partir dos valores dos seus campos
+def destinatario_oficio(tipo, valores):
+    return obter_definicao(tipo).destinatario.format_map(valores)
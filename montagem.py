@@ -0,0 +1,82 @@
+from datetime import datetime
+
+from docx import Document
+from docx.shared import Pt, Cm
+from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
+
+from modelos import obter_definicao
+from metricas import medir_funcao
+
+# Data provisória das propriedades (criação/modificação) do documento montado. Ao gravar o
+# pacote, ela é trocada pela data de referência do ofício (ver motor_ooxml.reempacotar e
+# motor_ooxml.renderizar_modelo).
+DATA_PROPRIEDADES = datetime(1980, 1, 1)
+
+# Função para formatar o documento
+@medir_funcao("formatar_documento")
+def formatar_documento(doc):
+    # Estilo para todo o documento
+    style = doc.styles['Normal']
+    font = style.font
+    font.name = 'Arial'
+    font.size = Pt(12)
+    
+    # Fixar as propriedades do documento para que a mesma entrada gere sempre o mesmo arquivo
+    # (as datas são depois substituídas pela data de referência)
+    propriedades = doc.core_properties
+    propriedades.created = DATA_PROPRIEDADES
+    propriedades.modified = DATA_PROPRIEDADES
+    propriedades.revision = 1
+    
+    # Configurar margens (em cm)
+    sections = doc.sections
+    for section in sections:
+        section.top_margin = Cm(2.5)
+        section.bottom_margin = Cm(2.5)
+        section.left_margin = Cm(3)
+        section.right_margin = Cm(2)
+    
+    return doc
+
+# Função para adicionar parágrafo com espaçamento controlado
+def adicionar_paragrafo(doc, texto, bold=False, italic=False, alignment=WD_PARAGRAPH_ALIGNMENT.LEFT, espacamento_antes=0, espacamento_depois=0):
+    paragraph = doc.add_paragraph()
+    paragraph.alignment = alignment
+    run = paragraph.add_run(texto)
+    run.bold = bold
+    run.italic = italic
+    
+    # Ajustar espaçamento se fornecido
+    if espacamento_antes > 0 or espacamento_depois > 0:
+        paragraph_format = paragraph.paragraph_format
+        paragraph_format.space_before = Pt(espacamento_antes)
+        paragraph_format.space_after = Pt(espacamento_depois)
+        
+    return paragraph
+
+# Alinhamento do python-docx correspondente a cada alinhamento do registro de modelos
+ALINHAMENTOS_DOCX = {
+    "esquerda": WD_PARAGRAPH_ALIGNMENT.LEFT,
+    "direita": WD_PARAGRAPH_ALIGNMENT.RIGHT,
+    "centro": WD_PARAGRAPH_ALIGNMENT.CENTER,
+    "justificado": WD_PARAGRAPH_ALIGNMENT.JUSTIFY,
+}
+
+# Função para montar (com python-docx) um ofício, repetindo as operações da sua definição
+@medir_funcao("montagem_docx")
+def montar_oficio(tipo, **valores):
+    definicao = obter_definicao(tipo)
+    doc = Document()
+    doc = formatar_documento(doc)
+    
+    for paragrafo in definicao.paragrafos:
+        if paragrafo.condicao and not valores.get(paragrafo.condicao):
+            continue
+        adicionar_paragrafo(
+            doc, paragrafo.texto.format_map(valores),
+            bold=paragrafo.negrito, italic=paragrafo.italico,
+            alignment=ALINHAMENTOS_DOCX[paragrafo.alinhamento],
+            espacamento_antes=paragrafo.antes, espacamento_depois=paragrafo.depois
+        )
+    
+    return doc
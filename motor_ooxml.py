@@ -0,0 +1,184 @@
+import io
+import re
+import struct
+import zipfile
+import zlib
+from functools import lru_cache
+from xml.sax.saxutils import escape
+
+# Parte do pacote .docx que recebe os valores de cada ofício
+PARTE_DOCUMENTO = "word/document.xml"
+
+# Parte do pacote .docx com as propriedades do documento (datas de criação e modificação)
+PARTE_PROPRIEDADES = "docProps/core.xml"
+
+# Datas de criação e modificação dentro das propriedades do documento
+_DATAS_PROPRIEDADES = re.compile(rb"(<dcterms:(?:created|modified)\b[^>]*>)[^<]*(</dcterms:)")
+
+# Marcadores usados no lugar dos campos variáveis durante a compilação
+def _sentinela(campo):
+    return f"@@{campo}@@"
+
+# Função para comprimir uma parte do pacote no formato "deflate" puro usado pelo ZIP
+def _comprimir(dados):
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    return compressor.compress(dados) + compressor.flush()
+
+# Função para pré-processar uma parte fixa (compressão e CRC calculados uma única vez)
+def _preparar_parte(nome, dados):
+    return {
+        "nome": nome.encode("utf-8"),
+        "crc": zlib.crc32(dados),
+        "tamanho": len(dados),
+        "comprimido": _comprimir(dados),
+    }
+
+# Função para compilar um modelo de ofício a partir da função que o monta com python-docx
+def compilar_modelo(montar, campos):
+    documento = montar(**{campo: _sentinela(campo) for campo in campos})
+    buffer = io.BytesIO()
+    documento.save(buffer)
+
+    partes = []
+    with zipfile.ZipFile(buffer) as pacote:
+        for nome in pacote.namelist():
+            dados = pacote.read(nome)
+            if nome == PARTE_DOCUMENTO:
+                xml_documento = dados.decode("utf-8")
+                partes.append(PARTE_DOCUMENTO)
+            elif nome == PARTE_PROPRIEDADES:
+                # As datas das propriedades vêm da data de referência de cada ofício
+                propriedades = dados
+                partes.append(PARTE_PROPRIEDADES)
+            else:
+                partes.append(_preparar_parte(nome, dados))
+
+    # Separar o XML em trechos fixos intercalados com os nomes dos campos
+    padrao = "|".join(re.escape(_sentinela(campo)) for campo in campos)
+    pedacos = re.split(f"({padrao})", xml_documento)
+    trechos = [pedaco.encode("utf-8") for pedaco in pedacos[0::2]]
+    slots = [pedaco[2:-2] for pedaco in pedacos[1::2]]
+
+    return {"partes": partes, "propriedades": propriedades, "trechos": trechos, "slots": slots}
+
+# Função para gerar o XML do documento preenchendo os campos do modelo compilado
+def preencher_documento(modelo, valores):
+    trechos = modelo["trechos"]
+    saida = [trechos[0]]
+    for slot, trecho in zip(modelo["slots"], trechos[1:]):
+        saida.append(escape(str(valores[slot])).encode("utf-8"))
+        saida.append(trecho)
+    return b"".join(saida)
+
+# Data e hora usadas nas entradas ZIP quando não há data de referência (mínimo do formato ZIP)
+DATA_HORA_PADRAO = (1980, 1, 1, 0, 0, 0)
+
+# Função para obter a data e hora (fixa) das entradas ZIP a partir da data de referência
+def data_hora_zip(data_referencia=None):
+    if data_referencia is None:
+        return DATA_HORA_PADRAO
+    return (data_referencia.year, data_referencia.month, data_referencia.day, 0, 0, 0)
+
+# Função para gravar a data e hora do pacote nas datas de criação e modificação das
+# propriedades do documento
+def _datar_propriedades(dados, data_hora):
+    carimbo = ("%04d-%02d-%02dT%02d:%02d:%02dZ" % data_hora).encode("ascii")
+    return _DATAS_PROPRIEDADES.sub(lambda encontrado: encontrado[1] + carimbo + encontrado[2], dados)
+
+# Função para preparar a parte de propriedades de um modelo com a data e hora do pacote
+# (as mesmas datas se repetem por todo um lote, então a parte pronta é reaproveitada)
+@lru_cache(maxsize=64)
+def _parte_propriedades(dados, data_hora):
+    return _preparar_parte(PARTE_PROPRIEDADES, _datar_propriedades(dados, data_hora))
+
+# Função para converter data e hora para o formato usado pelos cabeçalhos ZIP
+def _data_hora_dos(data_hora):
+    ano, mes, dia, hora, minuto, segundo = data_hora
+    data_dos = ((ano - 1980) << 9) | (mes << 5) | dia
+    hora_dos = (hora << 11) | (minuto << 5) | (segundo // 2)
+    return data_dos, hora_dos
+
+# Função para escrever o pacote .docx a partir das partes já comprimidas
+def _escrever_pacote(partes, data_hora):
+    data_dos, hora_dos = _data_hora_dos(data_hora)
+
+    saida = io.BytesIO()
+    diretorio = []
+    for parte in partes:
+        deslocamento = saida.tell()
+        campos_comuns = struct.pack(
+            "<HHHHHIIIH",
+            20, 0, zipfile.ZIP_DEFLATED, hora_dos, data_dos,
+            parte["crc"], len(parte["comprimido"]), parte["tamanho"], len(parte["nome"]),
+        )
+        saida.write(b"PK\x03\x04" + campos_comuns + b"\x00\x00" + parte["nome"])
+        saida.write(parte["comprimido"])
+        diretorio.append(
+            b"PK\x01\x02" + struct.pack("<H", 20) + campos_comuns
+            + struct.pack("<HHHHII", 0, 0, 0, 0, 0, deslocamento) + parte["nome"]
+        )
+
+    inicio_diretorio = saida.tell()
+    for entrada in diretorio:
+        saida.write(entrada)
+    tamanho_diretorio = saida.tell() - inicio_diretorio
+    saida.write(b"PK\x05\x06" + struct.pack(
+        "<HHHHIIH", 0, 0, len(diretorio), len(diretorio), tamanho_diretorio, inicio_diretorio, 0
+    ))
+    return saida.getvalue()
+
+# Função para renderizar um modelo compilado e devolver os bytes do .docx
+def renderizar_modelo(modelo, valores, data_hora=DATA_HORA_PADRAO):
+    variaveis = {
+        PARTE_DOCUMENTO: _preparar_parte(PARTE_DOCUMENTO, preencher_documento(modelo, valores)),
+        PARTE_PROPRIEDADES: _parte_propriedades(modelo["propriedades"], data_hora),
+    }
+    return _escrever_pacote([variaveis[parte] if isinstance(parte, str) else parte for parte in modelo["partes"]], data_hora)
+
+# Função para regravar um .docx qualquer com as mesmas datas fixas dos modelos compilados
+def reempacotar(conteudo, data_hora=DATA_HORA_PADRAO):
+    with zipfile.ZipFile(io.BytesIO(conteudo)) as pacote:
+        partes = [
+            _preparar_parte(nome, _datar_propriedades(pacote.read(nome), data_hora)
+                            if nome == PARTE_PROPRIEDADES else pacote.read(nome))
+            for nome in pacote.namelist()
+        ]
+    return _escrever_pacote(partes, data_hora)
+
+# Função para separar o XML de um documento em abertura (até <w:body>), conteúdo do corpo,
+# propriedades da seção final (<w:sectPr>) e fechamento
+def dividir_documento(xml):
+    inicio_corpo = xml.index(b"<w:body>") + len(b"<w:body>")
+    inicio_secao = xml.rindex(b"<w:sectPr")
+    fim_corpo = xml.rindex(b"</w:body>")
+    return xml[:inicio_corpo], xml[inicio_corpo:inicio_secao], xml[inicio_secao:fim_corpo], xml[fim_corpo:]
+
+# Função para escrever um único .docx com vários documentos, cada um na sua própria seção
+# (e, portanto, começando em uma nova página). As partes fixas (estilos, configurações,
+# tema...) vêm do pacote base e são gravadas uma única vez; o XML do documento é
+# comprimido à medida que cada corpo chega, então a memória não cresce com a quantidade.
+def escrever_documento_unico(pacote_base, documentos_xml, destino, data_hora=DATA_HORA_PADRAO):
+    with zipfile.ZipFile(io.BytesIO(pacote_base)) as base, zipfile.ZipFile(destino, "w") as pacote:
+        for nome in base.namelist():
+            info = zipfile.ZipInfo(nome, date_time=data_hora)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.create_system = 3
+            if nome != PARTE_DOCUMENTO:
+                pacote.writestr(info, base.read(nome))
+                continue
+
+            with pacote.open(info, "w") as saida:
+                secao_anterior = fechamento = None
+                for xml in documentos_xml:
+                    abertura, corpo, secao, fechamento = dividir_documento(xml)
+                    if secao_anterior is None:
+                        saida.write(abertura)
+                    else:
+                        # Um parágrafo vazio com as propriedades da seção encerra o documento anterior
+                        saida.write(b"<w:p><w:pPr>" + secao_anterior + b"</w:pPr></w:p>")
+                    saida.write(corpo)
+                    secao_anterior = secao
+                if secao_anterior is None:
+                    raise ValueError("Nenhum documento para juntar.")
+                saida.write(secao_anterior + fechamento)
+    return destino
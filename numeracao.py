@@ -0,0 +1,143 @@
+import os
+from datetime import datetime
+
+import banco
+from oficios import DIRETORIO_DADOS
+
+# Banco SQLite onde ficam a sequência de números por ano e o registro de cada número usado
+BANCO_PADRAO = os.path.join(DIRETORIO_DADOS, "oficios.sqlite3")
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS sequencia_oficios (
+    ano INTEGER PRIMARY KEY,
+    proximo INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS numeros_oficios (
+    ano INTEGER NOT NULL,
+    numero INTEGER NOT NULL,
+    idea_numero TEXT NOT NULL,
+    tipo TEXT NOT NULL,
+    registrado_em TEXT NOT NULL,
+    PRIMARY KEY (ano, numero)
+);
+CREATE INDEX IF NOT EXISTS idx_numeros_oficios_idea ON numeros_oficios (idea_numero);
+"""
+
+# Função para abrir uma conexão com o banco da numeração
+def conectar(caminho=None):
+    return banco.conectar(caminho or BANCO_PADRAO, ESQUEMA)
+
+# Função para reservar atomicamente uma faixa contínua de números de ofício no ano.
+# A transação só avança o contador do ano, então dura o mesmo para 3 ou 30.000 números
+# e sessões ou lotes simultâneos nunca recebem números repetidos.
+# Devolve o primeiro número da faixa [inicio, inicio + quantidade).
+def reservar_numeros(quantidade, ano, numero_sugerido=None, caminho=None):
+    if quantidade < 1:
+        raise ValueError("A quantidade de números reservados deve ser positiva.")
+
+    conexao = conectar(caminho)
+    try:
+        conexao.execute("BEGIN IMMEDIATE")
+        linha = conexao.execute("SELECT proximo FROM sequencia_oficios WHERE ano = ?", (ano,)).fetchone()
+        if linha is None:
+            # Primeiro uso no ano: a sequência começa no número sugerido (ou em 1)
+            inicio = int(numero_sugerido or 1)
+            conexao.execute(
+                "INSERT INTO sequencia_oficios (ano, proximo) VALUES (?, ?)", (ano, inicio + quantidade)
+            )
+        else:
+            inicio = linha[0]
+            conexao.execute(
+                "UPDATE sequencia_oficios SET proximo = ? WHERE ano = ?", (inicio + quantidade, ano)
+            )
+        conexao.execute("COMMIT")
+    except BaseException:
+        conexao.execute("ROLLBACK")
+        raise
+    finally:
+        conexao.close()
+    return inicio
+
+# Função para consultar o próximo número livre do ano (None se o ano ainda não foi usado)
+def proximo_numero(ano, caminho=None):
+    conexao = conectar(caminho)
+    try:
+        linha = conexao.execute("SELECT proximo FROM sequencia_oficios WHERE ano = ?", (ano,)).fetchone()
+    finally:
+        conexao.close()
+    return linha[0] if linha else None
+
+# Função para registrar a qual caso IDEA (e tipo de ofício) cada número foi dado.
+# "usos" é uma lista de tuplas (numero, idea_numero, tipo). Números digitados à mão
+# também avançam a sequência, para que a reserva automática nunca os repita.
+# Devolve os usos em conflito: números que já estavam registrados para outro caso ou tipo.
+def registrar_usos(ano, usos, caminho=None):
+    usos = [(int(numero), str(idea), tipo) for numero, idea, tipo in usos]
+    if not usos:
+        return []
+
+    registrado_em = datetime.now().isoformat(timespec="seconds")
+    conexao = conectar(caminho)
+    try:
+        conexao.execute("BEGIN IMMEDIATE")
+        conexao.executemany(
+            "INSERT INTO numeros_oficios (ano, numero, idea_numero, tipo, registrado_em) "
+            "VALUES (?, ?, ?, ?, ?) ON CONFLICT (ano, numero) DO NOTHING",
+            [(ano, numero, idea, tipo, registrado_em) for numero, idea, tipo in usos],
+        )
+        maior_numero = max(numero for numero, _, _ in usos)
+        conexao.execute(
+            "INSERT INTO sequencia_oficios (ano, proximo) VALUES (?, ?) "
+            "ON CONFLICT (ano) DO UPDATE SET proximo = MAX(proximo, excluded.proximo)",
+            (ano, maior_numero + 1),
+        )
+        conflitos = []
+        for numero, idea, tipo in usos:
+            registrado = conexao.execute(
+                "SELECT idea_numero, tipo FROM numeros_oficios WHERE ano = ? AND numero = ?", (ano, numero)
+            ).fetchone()
+            if registrado != (idea, tipo):
+                conflitos.append({"numero": numero, "idea_numero": registrado[0], "tipo": registrado[1]})
+        conexao.execute("COMMIT")
+    except BaseException:
+        conexao.execute("ROLLBACK")
+        raise
+    finally:
+        conexao.close()
+    return conflitos
+
+# Função para listar os números já dados a um caso IDEA
+def numeros_do_caso(idea_numero, caminho=None):
+    conexao = conectar(caminho)
+    try:
+        linhas = conexao.execute(
+            "SELECT ano, numero, tipo, registrado_em FROM numeros_oficios "
+            "WHERE idea_numero = ? ORDER BY ano, numero",
+            (str(idea_numero),),
+        ).fetchall()
+    finally:
+        conexao.close()
+    return [
+        {"ano": ano, "numero": numero, "tipo": tipo, "registrado_em": registrado_em}
+        for ano, numero, tipo, registrado_em in linhas
+    ]
+
+# Função para listar os números do ano, entre "inicio" e "fim", já dados a algum caso
+def usos_registrados(ano, inicio, fim, caminho=None):
+    conexao = conectar(caminho)
+    try:
+        return conexao.execute(
+            "SELECT numero, idea_numero, tipo FROM numeros_oficios "
+            "WHERE ano = ? AND numero BETWEEN ? AND ? ORDER BY numero",
+            (ano, int(inicio), int(fim)),
+        ).fetchall()
+    finally:
+        conexao.close()
+
+# Função para obter o conjunto de casos IDEA que já receberam algum número
+def ideas_registradas(caminho=None):
+    conexao = conectar(caminho)
+    try:
+        return {idea for (idea,) in conexao.execute("SELECT DISTINCT idea_numero FROM numeros_oficios")}
+    finally:
+        conexao.close()
@@ -0,0 +1,413 @@
+import zipfile
+import io
+import os
+import hashlib
+import pickle
+import importlib.util
+from datetime import date, datetime
+import locale
+from functools import partial, lru_cache
+from itertools import combinations
+
+from motor_ooxml import (
+    compilar_modelo,
+    renderizar_modelo,
+    preencher_documento,
+    reempacotar,
+    data_hora_zip,
+    escrever_documento_unico,
+    PARTE_DOCUMENTO,
+)
+from cache_oficios import chave_oficio
+from modelos import MODELOS, ARQUIVO_MODELOS, obter_definicao
+from metricas import medir, incrementar
+
+# Configurar localização para português do Brasil
+try:
+    locale.setlocale(locale.LC_TIME, 'pt_BR.UTF-8')
+except:
+    try:
+        locale.setlocale(locale.LC_TIME, 'Portuguese_Brazil.1252')
+    except:
+        pass  # Fallback para a localização padrão se pt_BR não estiver disponível
+
+# Função para formatar o número do ofício com o ano atual
+def formatar_numero_oficio(numero, ano=None):
+    ano_atual = ano or datetime.now().year
+    return f"{numero}/{ano_atual}"
+
+# Função para obter data formatada em português do Brasil
+def formatar_data_ptbr(data):
+    try:
+        # Tentativa de formatar com locale
+        return data.strftime("%d de %B de %Y").lower()
+    except:
+        # Fallback para manual mapping se o locale não funcionar
+        meses = {
+            1: "janeiro", 2: "fevereiro", 3: "março", 4: "abril",
+            5: "maio", 6: "junho", 7: "julho", 8: "agosto",
+            9: "setembro", 10: "outubro", 11: "novembro", 12: "dezembro"
+        }
+        return f"{data.day} de {meses[data.month]} de {data.year}"
+
+# Campos variáveis de cada tipo de ofício (preenchidos no modelo compilado)
+CAMPOS_MODELO = {tipo: definicao.campos for tipo, definicao in MODELOS.items()}
+
+# Função para montar o nome do arquivo (sem extensão) de um ofício, a partir do título do seu tipo
+def nome_arquivo_oficio(tipo, numero_oficio):
+    return f"Ofício {numero_oficio} - {obter_definicao(tipo).titulo}"
+
+# Diretório onde os modelos compilados são guardados entre execuções
+DIRETORIO_CACHE = os.environ.get("OFICIOS_CACHE_DIR") or os.path.join(
+    os.path.expanduser("~"), ".cache", "oficios-arquivamento"
+)
+
+# Diretório dos dados persistentes (numeração e histórico dos ofícios)
+DIRETORIO_DADOS = os.environ.get("OFICIOS_DADOS_DIR") or os.path.join(
+    os.path.expanduser("~"), ".local", "share", "oficios-arquivamento"
+)
+
+# Função para obter a função que monta (com python-docx) um tipo de ofício.
+# O python-docx só é importado quando um modelo precisa ser compilado.
+def _montador(tipo):
+    from montagem import montar_oficio
+    return partial(montar_oficio, tipo)
+
+# Função para calcular a versão dos modelos a partir do registro e do código que os monta
+# (inclui o __init__ do python-docx, que muda a cada versão instalada)
+@lru_cache(maxsize=None)
+def _versao_modelos():
+    diretorio = os.path.dirname(os.path.abspath(__file__))
+    arquivos = [ARQUIVO_MODELOS] + [
+        os.path.join(diretorio, modulo)
+        for modulo in ("oficios.py", "modelos.py", "montagem.py", "motor_ooxml.py", "pdf.py")
+    ]
+    especificacao_docx = importlib.util.find_spec("docx")
+    if especificacao_docx is not None and especificacao_docx.origin:
+        arquivos.append(especificacao_docx.origin)
+
+    resumo = hashlib.sha256()
+    for caminho in arquivos:
+        with open(caminho, "rb") as f:
+            resumo.update(f.read())
+    return resumo.hexdigest()[:16]
+
+# Função para calcular a versão das fontes dos PDFs: os arquivos escolhidos para cada estilo
+# (caminho, tamanho e data de modificação) e a versão do fontTools que os reduz e mede.
+# Entra só na assinatura dos PDFs, então gerar .docx não precisa procurar as fontes.
+@lru_cache(maxsize=None)
+def _versao_fontes_pdf():
+    import fontTools
+    from pdf import _arquivos_fontes
+
+    partes = [fontTools.version]
+    for estilo, caminho in sorted(_arquivos_fontes().items()):
+        informacoes = os.stat(caminho)
+        partes.append(f"{estilo}:{caminho}:{informacoes.st_size}:{informacoes.st_mtime_ns}")
+    return hashlib.sha256("\n".join(partes).encode("utf-8")).hexdigest()[:16]
+
+# Função para ler um modelo compilado do cache em disco (None se não existir)
+def _ler_modelo_em_disco(caminho):
+    try:
+        with open(caminho, "rb") as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+
+# Função para gravar um modelo compilado no cache em disco (falhas são ignoradas)
+def _gravar_modelo_em_disco(caminho, modelo):
+    try:
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        temporario = f"{caminho}.{os.getpid()}.tmp"
+        with open(temporario, "wb") as f:
+            pickle.dump(modelo, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporario, caminho)
+    except OSError:
+        pass
+
+# Modelos compilados por (tipo de ofício, campos opcionais preenchidos)
+_modelos_compilados = {}
+
+# Função para obter (compilando na primeira vez) o modelo de um tipo de ofício
+def _obter_modelo(tipo, opcionais_preenchidos):
+    chave = (tipo, opcionais_preenchidos)
+    if chave in _modelos_compilados:
+        return _modelos_compilados[chave]
+
+    variante = "-".join(opcionais_preenchidos) or "base"
+    caminho = os.path.join(DIRETORIO_CACHE, f"modelo-{tipo}-{variante}-{_versao_modelos()}.pickle")
+    modelo = _ler_modelo_em_disco(caminho)
+    if modelo is None:
+        # Opcionais vazios tiram do documento os parágrafos que dependem deles
+        # (ex.: "Tel:"), então esses campos também saem do modelo
+        vazios = [campo for campo in obter_definicao(tipo).opcionais if campo not in opcionais_preenchidos]
+        campos = tuple(campo for campo in CAMPOS_MODELO[tipo] if campo not in vazios)
+        montar = partial(_montador(tipo), **dict.fromkeys(vazios, ""))
+        with medir("compilacao_modelo"):
+            modelo = compilar_modelo(montar, campos)
+        _gravar_modelo_em_disco(caminho, modelo)
+
+    _modelos_compilados[chave] = modelo
+    return modelo
+
+# Função para compilar (ou carregar do disco) de uma vez os modelos de todos os tipos e
+# variantes, e importar o python-docx usado quando algum valor não cabe no modelo compilado.
+# Usada por processos que atendem pedidos, para que o primeiro ofício não pague essa espera.
+def aquecer_modelos():
+    for tipo, definicao in MODELOS.items():
+        for quantidade in range(len(definicao.opcionais) + 1):
+            for opcionais_preenchidos in combinations(definicao.opcionais, quantidade):
+                _obter_modelo(tipo, opcionais_preenchidos)
+        _montador(tipo)
+
+# Função para verificar se um valor pode ser inserido diretamente no modelo compilado.
+# Textos vazios, com espaços nas pontas ou com quebras/tabulações são tratados de forma
+# especial pelo python-docx, então nesses casos o documento é montado pelo caminho normal.
+def _valor_compativel(valor):
+    texto = str(valor)
+    return texto != "" and texto == texto.strip() and all(ord(caractere) >= 32 for caractere in texto)
+
+# Função para obter o modelo compilado que atende aos valores (None quando algum valor
+# exige montar o documento pelo python-docx)
+def _modelo_para_valores(tipo, valores):
+    opcionais = obter_definicao(tipo).opcionais
+    opcionais_preenchidos = tuple(campo for campo in opcionais if valores.get(campo))
+    campos = [campo for campo in valores if campo not in opcionais or campo in opcionais_preenchidos]
+    if not all(_valor_compativel(valores[campo]) for campo in campos):
+        return None
+    return _obter_modelo(tipo, opcionais_preenchidos)
+
+# Função para montar o documento pelo python-docx e devolver os bytes gravados por ele
+def _gravar_com_python_docx(tipo, valores):
+    incrementar("documentos_python_docx")
+    doc = _montador(tipo)(**valores)
+    with medir("gravacao_docx"):
+        buffer = io.BytesIO()
+        doc.save(buffer)
+        return buffer.getvalue()
+
+# Função para gerar os bytes do .docx a partir dos valores já completos
+def _renderizar_sem_cache(tipo, valores, data_hora):
+    modelo = _modelo_para_valores(tipo, valores)
+    if modelo is None:
+        # O python-docx grava as entradas com o horário atual; regravar fixa as datas
+        return reempacotar(_gravar_com_python_docx(tipo, valores), data_hora)
+
+    incrementar("documentos_modelo_compilado")
+    with medir("renderizacao_modelo"):
+        return renderizar_modelo(modelo, valores, data_hora)
+
+# Cache de documentos prontos usado por renderizar_oficio (desativado por padrão)
+_cache_documentos = None
+
+# Função para ativar (ou desativar, com None) o cache de documentos prontos
+def ativar_cache_documentos(cache):
+    global _cache_documentos
+    _cache_documentos = cache
+
+# Função para calcular a assinatura de um ofício: resume tudo de que o documento depende (tipo,
+# campos preenchidos, data de referência, versão dos modelos e formato), então muda só quando
+# muda o documento
+def assinatura_oficio(tipo, data_referencia, valores, formato="docx"):
+    data_referencia = data_referencia or date.today()
+    valores = {**valores, "ano": data_referencia.year, "data_referencia": data_referencia.isoformat()}
+    if formato != "docx":
+        valores["formato"] = formato
+    if formato == "pdf":
+        valores["fontes"] = _versao_fontes_pdf()
+    return chave_oficio(tipo, _versao_modelos(), valores)
+
+# Função para gerar os bytes do .docx de um tipo de ofício.
+# A data de referência (padrão: hoje) define o ano dos números e as datas gravadas no
+# pacote, então as mesmas entradas com a mesma data geram sempre os mesmos bytes.
+def renderizar_oficio(tipo, data_referencia=None, **valores):
+    data_referencia = data_referencia or date.today()
+    valores["ano"] = data_referencia.year
+    data_hora = data_hora_zip(data_referencia)
+    if _cache_documentos is None:
+        return _renderizar_sem_cache(tipo, valores, data_hora)
+
+    chave = assinatura_oficio(tipo, data_referencia, valores)
+    return _cache_documentos.obter_ou_gerar(chave, lambda: _renderizar_sem_cache(tipo, valores, data_hora))
+
+# Função para desenhar o PDF de um ofício (ver pdf.py) com os mesmos parágrafos e a mesma
+# formatação do .docx, sem passar por um editor de textos
+def _renderizar_pdf_sem_cache(tipo, valores, data_referencia):
+    from pdf import gerar_pdf
+
+    definicao = obter_definicao(tipo)
+    paragrafos = [
+        (paragrafo.texto.format_map(valores), paragrafo.negrito, paragrafo.italico,
+         paragrafo.alinhamento, paragrafo.antes, paragrafo.depois)
+        for paragrafo in definicao.paragrafos
+        if not paragrafo.condicao or valores.get(paragrafo.condicao)
+    ]
+    titulo = nome_arquivo_oficio(tipo, valores.get("numero_oficio", ""))
+    with medir("renderizacao_pdf"):
+        try:
+            conteudo = gerar_pdf(paragrafos, data_referencia, titulo)
+        except ValueError as erro:
+            raise ValueError(f"{titulo}: {erro}") from erro
+    incrementar("documentos_pdf")
+    return conteudo
+
+# Função para gerar os bytes do PDF de um tipo de ofício (mesmas regras de renderizar_oficio)
+def renderizar_oficio_pdf(tipo, data_referencia=None, **valores):
+    data_referencia = data_referencia or date.today()
+    valores["ano"] = data_referencia.year
+    if _cache_documentos is None:
+        return _renderizar_pdf_sem_cache(tipo, valores, data_referencia)
+
+    chave = assinatura_oficio(tipo, data_referencia, valores, "pdf")
+    return _cache_documentos.obter_ou_gerar(chave, lambda: _renderizar_pdf_sem_cache(tipo, valores, data_referencia))
+
+# Formatos em que os ofícios podem ser gerados e a extensão dos seus arquivos
+EXTENSOES_FORMATOS = {"docx": ".docx", "pdf": ".pdf"}
+
+# Função para gerar um ofício no formato pedido ("docx" ou "pdf")
+def renderizar_oficio_formato(tipo, formato, data_referencia=None, **valores):
+    if formato == "docx":
+        return renderizar_oficio(tipo, data_referencia, **valores)
+    if formato == "pdf":
+        return renderizar_oficio_pdf(tipo, data_referencia, **valores)
+    raise ValueError(f"Formato desconhecido: {formato}")
+
+# Função para montar o nome de um documento de um lote. Os .docx são identificados só pelo
+# nome do ofício (a extensão entra ao gravar no ZIP); os demais formatos já levam a extensão.
+def nome_documento(nome_arquivo, formato="docx"):
+    return nome_arquivo if formato == "docx" else nome_arquivo + EXTENSOES_FORMATOS[formato]
+
+# Função para obter o formato de um documento de lote pelo nome (ver nome_documento)
+def formato_documento(nome):
+    for formato, extensao in EXTENSOES_FORMATOS.items():
+        if formato != "docx" and nome.endswith(extensao):
+            return formato
+    return "docx"
+
+# Função para obter o nome do arquivo (com extensão) de um documento de lote
+def arquivo_do_documento(nome):
+    return nome + EXTENSOES_FORMATOS["docx"] if formato_documento(nome) == "docx" else nome
+
+# Função para gerar apenas o XML do documento (word/document.xml) de um ofício,
+# sem montar o pacote .docx em volta
+def renderizar_documento_xml(tipo, data_referencia=None, **valores):
+    valores["ano"] = (data_referencia or date.today()).year
+    modelo = _modelo_para_valores(tipo, valores)
+    if modelo is None:
+        with zipfile.ZipFile(io.BytesIO(_gravar_com_python_docx(tipo, valores))) as pacote:
+            return pacote.read(PARTE_DOCUMENTO)
+
+    incrementar("documentos_modelo_compilado")
+    with medir("renderizacao_modelo"):
+        return preencher_documento(modelo, valores)
+
+# Função para escrever um único .docx de impressão com vários ofícios, um por seção.
+# "oficios" é uma sequência de (tipo, data_referencia, valores); o primeiro ofício também
+# fornece as partes fixas (estilos, configurações...) compartilhadas por todo o arquivo, e
+# é gerado uma única vez: o XML do seu corpo é lido do próprio pacote.
+def escrever_documento_unico_oficios(oficios, destino, data_referencia=None):
+    oficios = iter(oficios)
+    primeiro = next(oficios, None)
+    if primeiro is None:
+        raise ValueError("Nenhum ofício para juntar no arquivo único.")
+    tipo, referencia, valores = primeiro
+    pacote_base = renderizar_oficio(tipo, referencia, **valores)
+
+    def documentos_xml():
+        with zipfile.ZipFile(io.BytesIO(pacote_base)) as pacote:
+            yield pacote.read(PARTE_DOCUMENTO)
+        for tipo_oficio, referencia_oficio, valores_oficio in oficios:
+            yield renderizar_documento_xml(tipo_oficio, referencia_oficio, **valores_oficio)
+
+    with medir("documento_unico"):
+        escrever_documento_unico(pacote_base, documentos_xml(), destino, data_hora_zip(data_referencia))
+    return destino
+
+# Função para criar ofício modelo de comunicação de arquivamento
+def criar_oficio_arquivamento(numero_oficio, data, numero_idea, data_referencia=None):
+    return renderizar_oficio(
+        "arquivamento", data_referencia, numero_oficio=numero_oficio, data=data, numero_idea=numero_idea
+    )
+
+# Função para criar ofício de notificação para vítima (ofício 2)
+def criar_oficio_notificacao_vitima(numero_oficio, data, numero_idea, nome_vitima, endereco, telefone, data_referencia=None):
+    return renderizar_oficio(
+        "notificacao_vitima", data_referencia, numero_oficio=numero_oficio, data=data, numero_idea=numero_idea,
+        nome_vitima=nome_vitima, endereco=endereco, telefone=telefone
+    )
+
+# Função para criar ofício de notificação para o acusado (ofício 3)
+def criar_oficio_notificacao_acusado(numero_oficio, data, numero_idea, nome_acusado, endereco, telefone, data_referencia=None):
+    return renderizar_oficio(
+        "notificacao_acusado", data_referencia, numero_oficio=numero_oficio, data=data, numero_idea=numero_idea,
+        nome_acusado=nome_acusado, endereco=endereco, telefone=telefone
+    )
+
+# Destino de escrita que acumula os bytes produzidos pelo ZipFile até serem consumidos
+class _BufferDeSaida(io.RawIOBase):
+    def __init__(self):
+        self.partes = []
+
+    def writable(self):
+        return True
+
+    def write(self, dados):
+        self.partes.append(bytes(dados))
+        return len(dados)
+
+    def esvaziar(self):
+        dados = b"".join(self.partes)
+        self.partes = []
+        return dados
+
+# Função para gravar um documento (ver nome_documento) como entrada de um ZIP já aberto. A entrada recebe a data
+# de referência (e não o horário atual) para o ZIP ser reproduzível. A assinatura do ofício
+# (ver assinatura_oficio), se informada, fica no comentário da entrada.
+def escrever_entrada_zip(zip_file, nome_arquivo, conteudo, data_referencia=None, assinatura=None):
+    info = zipfile.ZipInfo(arquivo_do_documento(nome_arquivo), date_time=data_hora_zip(data_referencia))
+    info.compress_type = zip_file.compression
+    info.create_system = 3
+    info.external_attr = 0o644 << 16
+    if assinatura:
+        info.comment = assinatura.encode("ascii")
+    with medir("zip_entrada"):
+        zip_file.writestr(info, conteudo)
+    incrementar("zip_entradas")
+
+# Função para copiar uma entrada de outro ZIP, com nome, data e comentário originais.
+# As entradas dos ZIPs de ofícios não são comprimidas, então os bytes passam direto.
+def copiar_entrada_zip(zip_file, zip_origem, info):
+    copia = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+    copia.compress_type = zip_file.compression
+    copia.create_system = info.create_system
+    copia.external_attr = info.external_attr
+    copia.comment = info.comment
+    with medir("zip_entrada_copiada"):
+        zip_file.writestr(copia, zip_origem.read(info))
+    incrementar("zip_entradas_copiadas")
+
+# Função para listar as entradas de um ZIP de ofícios pela assinatura gravada em cada uma
+def entradas_por_assinatura(zip_file):
+    return {info.comment.decode("ascii"): info for info in zip_file.infolist() if info.comment}
+
+# Função para gerar o ZIP em partes, à medida que cada documento é produzido.
+# Os .docx já são pacotes comprimidos, então por padrão entram no ZIP sem recompressão.
+def gerar_zip_em_partes(documentos, compressao=zipfile.ZIP_STORED, data_referencia=None):
+    saida = _BufferDeSaida()
+    with zipfile.ZipFile(saida, "w", compressao) as zip_file:
+        for nome_arquivo, conteudo in documentos:
+            escrever_entrada_zip(zip_file, nome_arquivo, conteudo, data_referencia)
+            yield saida.esvaziar()
+    yield saida.esvaziar()
+
+# Função para escrever o ZIP dos ofícios em um arquivo (ou buffer) de destino
+def escrever_zip_oficios(documentos, destino, compressao=zipfile.ZIP_STORED, data_referencia=None):
+    for parte in gerar_zip_em_partes(documentos, compressao, data_referencia):
+        destino.write(parte)
+    return destino
+
+# Função para criar um arquivo ZIP com os ofícios
+def criar_zip_oficios(arquivos, compressao=zipfile.ZIP_STORED, data_referencia=None):
+    zip_buffer = escrever_zip_oficios(arquivos.items(), io.BytesIO(), compressao, data_referencia)
+    zip_buffer.seek(0)
+    return zip_buffer
@@ -0,0 +1,386 @@
+import os
+import io
+import zlib
+import hashlib
+import importlib.util
+from collections import namedtuple
+from functools import lru_cache
+
+# Página Carta (a mesma do modelo .docx), em pontos
+LARGURA_PAGINA = 612
+ALTURA_PAGINA = 792
+
+# Margens de montagem.formatar_documento (2,5 cm em cima e embaixo, 3 cm à esquerda e 2 cm à direita)
+PONTOS_POR_CM = 72 / 2.54
+MARGEM_SUPERIOR = 2.5 * PONTOS_POR_CM
+MARGEM_INFERIOR = 2.5 * PONTOS_POR_CM
+MARGEM_ESQUERDA = 3 * PONTOS_POR_CM
+MARGEM_DIREITA = 2 * PONTOS_POR_CM
+
+# Fonte do estilo Normal dos ofícios (Arial 12)
+TAMANHO_FONTE = 12
+
+# Espaçamentos herdados do modelo .docx: parágrafos sem espaçamento definido no registro
+# ficam com 10 pt depois (ver montagem.adicionar_paragrafo) e as linhas têm entrelinha 1,15
+ESPACO_DEPOIS_PADRAO = 10
+ENTRELINHA = 1.15
+
+# Medidas verticais do Arial, em frações do tamanho da fonte: altura da linha simples
+# (ascendente + descendente + espaço entre linhas, como o Word calcula) e ascendente
+ALTURA_LINHA_ARIAL = (1854 + 434 + 67) / 2048
+ASCENDENTE_ARIAL = 1854 / 2048
+
+# Fontes por estilo (negrito, itálico)
+ESTILOS = {
+    (False, False): "normal",
+    (True, False): "negrito",
+    (False, True): "italico",
+    (True, True): "negrito_italico",
+}
+
+# Arquivos TrueType procurados para cada estilo: o Arial e, na falta dele, o Liberation Sans,
+# que tem as mesmas medidas. O primeiro encontrado é embutido no PDF (só os glifos usados).
+ARQUIVOS_FONTES = {
+    "normal": ("arial.ttf", "LiberationSans-Regular.ttf"),
+    "negrito": ("arialbd.ttf", "LiberationSans-Bold.ttf"),
+    "italico": ("ariali.ttf", "LiberationSans-Italic.ttf"),
+    "negrito_italico": ("arialbi.ttf", "LiberationSans-BoldItalic.ttf"),
+}
+
+# Sem os arquivos, o PDF usa as fontes padrão do formato (não embutidas), com as mesmas
+# medidas do Arial; as larguras vêm dos arquivos AFM distribuídos com o matplotlib
+FONTES_PADRAO = {
+    "normal": "Helvetica",
+    "negrito": "Helvetica-Bold",
+    "italico": "Helvetica-Oblique",
+    "negrito_italico": "Helvetica-BoldOblique",
+}
+
+# Pastas onde as fontes são procuradas (OFICIOS_FONTES_DIR primeiro)
+DIRETORIOS_FONTES = [
+    os.environ.get("OFICIOS_FONTES_DIR"),
+    os.path.join(os.environ.get("WINDIR", "C:\\Windows"), "Fonts"),
+    "/usr/share/fonts",
+    "/usr/local/share/fonts",
+    os.path.expanduser("~/.fonts"),
+    os.path.expanduser("~/.local/share/fonts"),
+    "/Library/Fonts",
+    "/System/Library/Fonts/Supplemental",
+]
+
+# Os textos são gravados com a codificação WinAnsi (cp1252), que cobre o português
+CODIFICACAO = "cp1252"
+PRIMEIRO_CODIGO = 32
+ULTIMO_CODIGO = 255
+
+# Função para codificar um texto em WinAnsi. Caracteres fora dela (emojis, letras de outros
+# alfabetos, símbolos como "✓") não existem nas fontes do PDF: em vez de virarem "?" em
+# silêncio, eles geram um erro que os identifica.
+def codificar_texto(texto):
+    try:
+        return texto.encode(CODIFICACAO)
+    except UnicodeEncodeError:
+        invalidos = []
+        for caractere in texto:
+            try:
+                caractere.encode(CODIFICACAO)
+            except UnicodeEncodeError:
+                if caractere not in invalidos:
+                    invalidos.append(caractere)
+        lista = ", ".join(f"\"{caractere}\" (U+{ord(caractere):04X})" for caractere in invalidos)
+        raise ValueError(f"Caracteres sem suporte no PDF: {lista}. Corrija o texto ou gere o ofício em .docx.") from None
+
+# Data gravada nas informações do PDF quando não há data de referência
+DATA_PADRAO = "D:20250101000000"
+
+# Fonte carregada: nome PostScript, larguras dos códigos 0-255 (em milésimos do tamanho) e,
+# para as fontes embutidas, o caminho do arquivo e o descritor (sem o arquivo da fonte)
+Fonte = namedtuple("Fonte", "nome larguras caminho descritor")
+
+# Função para localizar os arquivos das fontes de cada estilo (uma única vez por processo)
+@lru_cache(maxsize=None)
+def _arquivos_fontes():
+    procurados = {nome.lower() for nomes in ARQUIVOS_FONTES.values() for nome in nomes}
+    encontrados = {}
+    for diretorio in DIRETORIOS_FONTES:
+        if not diretorio or not os.path.isdir(diretorio):
+            continue
+        for raiz, _, arquivos in os.walk(diretorio):
+            for arquivo in arquivos:
+                if arquivo.lower() in procurados:
+                    encontrados.setdefault(arquivo.lower(), os.path.join(raiz, arquivo))
+    escolhidos = {}
+    for estilo, nomes in ARQUIVOS_FONTES.items():
+        caminho = next((encontrados[nome.lower()] for nome in nomes if nome.lower() in encontrados), None)
+        if caminho is not None:
+            escolhidos[estilo] = caminho
+    return escolhidos
+
+# Função para ler as larguras de uma fonte padrão no arquivo AFM do matplotlib
+def _larguras_afm(nome):
+    from fontTools.agl import UV2AGL
+
+    especificacao = importlib.util.find_spec("matplotlib")
+    if especificacao is None or not especificacao.submodule_search_locations:
+        raise ValueError("Sem as fontes Arial, o PDF precisa das medidas distribuídas com o matplotlib.")
+    caminho = os.path.join(
+        especificacao.submodule_search_locations[0], "mpl-data", "fonts", "pdfcorefonts", f"{nome}.afm"
+    )
+    por_glifo = {}
+    with open(caminho, encoding="latin-1") as f:
+        for linha in f:
+            if linha.startswith("C "):
+                campos = dict(parte.strip().split(" ", 1) for parte in linha.split(";") if parte.strip())
+                por_glifo[campos["N"]] = int(float(campos["WX"]))
+
+    larguras = [0] * 256
+    for codigo in range(PRIMEIRO_CODIGO, ULTIMO_CODIGO + 1):
+        try:
+            caractere = bytes([codigo]).decode(CODIFICACAO)
+        except UnicodeDecodeError:
+            continue
+        larguras[codigo] = por_glifo.get(UV2AGL.get(ord(caractere)), por_glifo["space"])
+    return larguras
+
+# Função para ler o nome, as larguras e o descritor de um arquivo TrueType
+def _medidas_truetype(caminho):
+    from fontTools.ttLib import TTFont
+
+    fonte = TTFont(caminho, lazy=True)
+    escala = 1000 / fonte["head"].unitsPerEm
+    mapa = fonte.getBestCmap()
+    metricas = fonte["hmtx"].metrics
+    padrao = metricas[".notdef"][0] if ".notdef" in metricas else 0
+
+    larguras = [0] * 256
+    for codigo in range(PRIMEIRO_CODIGO, ULTIMO_CODIGO + 1):
+        try:
+            caractere = bytes([codigo]).decode(CODIFICACAO)
+        except UnicodeDecodeError:
+            continue
+        glifo = mapa.get(ord(caractere))
+        larguras[codigo] = round((metricas[glifo][0] if glifo in metricas else padrao) * escala)
+
+    cabecalho, os2, post = fonte["head"], fonte["OS/2"], fonte["post"]
+    italico = post.italicAngle != 0
+    descritor = {
+        "Flags": 32 + (64 if italico else 0),
+        "FontBBox": [round(valor * escala) for valor in (cabecalho.xMin, cabecalho.yMin, cabecalho.xMax, cabecalho.yMax)],
+        "ItalicAngle": post.italicAngle,
+        "Ascent": round(os2.sTypoAscender * escala),
+        "Descent": round(os2.sTypoDescender * escala),
+        "CapHeight": round(getattr(os2, "sCapHeight", 0) * escala or os2.sTypoAscender * escala * 0.7),
+        "StemV": 120 if os2.usWeightClass >= 600 else 80,
+    }
+    nome = fonte["name"].getDebugName(6) or os.path.splitext(os.path.basename(caminho))[0]
+    fonte.close()
+    return Fonte("".join(nome.split()), larguras, caminho, descritor)
+
+# Função para carregar a fonte de um estilo. As medidas são lidas uma única vez por
+# processo e reaproveitadas por todos os documentos.
+@lru_cache(maxsize=None)
+def carregar_fonte(estilo):
+    caminho = _arquivos_fontes().get(estilo)
+    if caminho is None:
+        return Fonte(FONTES_PADRAO[estilo], _larguras_afm(FONTES_PADRAO[estilo]), None, None)
+    return _medidas_truetype(caminho)
+
+# Função para gerar o arquivo TrueType reduzido aos glifos dos códigos informados, já no
+# formato do fluxo que o embute no PDF. Os códigos ASCII entram sempre, então documentos que
+# só diferem em nomes e endereços sem acentos novos reaproveitam o mesmo fluxo já pronto.
+@lru_cache(maxsize=64)
+def _subconjunto_fonte(caminho, codigos):
+    from fontTools import subset
+    from fontTools.ttLib import TTFont
+
+    opcoes = subset.Options()
+    opcoes.layout_features = []
+    opcoes.drop_tables += ["GSUB", "GPOS", "GDEF", "kern", "DSIG", "FFTM"]
+    opcoes.notdef_outline = True
+    fonte = TTFont(caminho)
+    redutor = subset.Subsetter(opcoes)
+    redutor.populate(unicodes=[ord(bytes([codigo]).decode(CODIFICACAO)) for codigo in codigos])
+    redutor.subset(fonte)
+    saida = io.BytesIO()
+    fonte.save(saida)
+    return _fluxo(saida.getvalue(), {"Length1": len(saida.getvalue())})
+
+# Função para medir a largura de um texto (já codificado), em pontos
+def _largura(dados, larguras, tamanho):
+    return sum(larguras[codigo] for codigo in dados) * tamanho / 1000
+
+# Função para quebrar um parágrafo em linhas que caibam na largura disponível.
+# Devolve uma lista de (texto codificado, largura natural).
+def _quebrar_linhas(dados, larguras, tamanho, largura_maxima):
+    largura_espaco = larguras[32] * tamanho / 1000
+    linhas = []
+    atual, largura_atual = [], 0
+    for palavra in dados.split(b" "):
+        largura_palavra = _largura(palavra, larguras, tamanho)
+        # Palavra maior que a linha inteira (ex.: um endereço de e-mail longo): quebrada nos caracteres
+        while largura_palavra > largura_maxima and not atual:
+            corte = len(palavra)
+            while corte > 1 and _largura(palavra[:corte], larguras, tamanho) > largura_maxima:
+                corte -= 1
+            linhas.append((palavra[:corte], _largura(palavra[:corte], larguras, tamanho)))
+            palavra = palavra[corte:]
+            largura_palavra = _largura(palavra, larguras, tamanho)
+        if atual and largura_atual + largura_espaco + largura_palavra > largura_maxima:
+            linhas.append((b" ".join(atual), largura_atual))
+            atual, largura_atual = [], 0
+        largura_atual += (largura_espaco if atual else 0) + largura_palavra
+        atual.append(palavra)
+    linhas.append((b" ".join(atual), largura_atual))
+    return linhas
+
+# Função para escapar um texto codificado como string literal do PDF
+def _texto_pdf(dados):
+    return b"(" + dados.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)").replace(b"\r", b"\\r") + b")"
+
+# Função para formatar um número para o PDF (sem zeros desnecessários)
+def _numero(valor):
+    texto = f"{valor:.3f}".rstrip("0").rstrip(".")
+    return "0" if texto == "-0" else texto
+
+# Função para distribuir os parágrafos em páginas. "paragrafos" é uma sequência de
+# (texto, negrito, italico, alinhamento, antes, depois), com o alinhamento do registro de modelos.
+# Devolve o conteúdo (operadores do PDF) de cada página e os códigos usados por estilo.
+def diagramar(paragrafos, tamanho=TAMANHO_FONTE):
+    largura_maxima = LARGURA_PAGINA - MARGEM_ESQUERDA - MARGEM_DIREITA
+    limite = ALTURA_PAGINA - MARGEM_INFERIOR
+    altura_linha = ALTURA_LINHA_ARIAL * tamanho * ENTRELINHA
+    ascendente = ASCENDENTE_ARIAL * tamanho
+
+    paginas, comandos = [], []
+    codigos_usados = {}
+    topo = MARGEM_SUPERIOR
+    for texto, negrito, italico, alinhamento, antes, depois in paragrafos:
+        if not antes and not depois:
+            depois = ESPACO_DEPOIS_PADRAO
+        estilo = ESTILOS[(bool(negrito), bool(italico))]
+        larguras = carregar_fonte(estilo).larguras
+        dados = codificar_texto(texto)
+        codigos_usados.setdefault(estilo, set()).update(dados)
+
+        topo += antes
+        linhas = _quebrar_linhas(dados, larguras, tamanho, largura_maxima)
+        comandos.append(f"/{estilo} {_numero(tamanho)} Tf".encode("ascii"))
+        for indice, (linha, largura_linha) in enumerate(linhas):
+            if topo + altura_linha > limite and topo > MARGEM_SUPERIOR:
+                paginas.append(comandos)
+                comandos = [f"/{estilo} {_numero(tamanho)} Tf".encode("ascii")]
+                topo = MARGEM_SUPERIOR
+
+            espacamento, x = 0, MARGEM_ESQUERDA
+            ultima = indice == len(linhas) - 1
+            if alinhamento == "justificado" and not ultima and linha.count(b" "):
+                espacamento = (largura_maxima - largura_linha) / linha.count(b" ")
+            elif alinhamento == "direita":
+                x += largura_maxima - largura_linha
+            elif alinhamento == "centro":
+                x += (largura_maxima - largura_linha) / 2
+
+            if linha:
+                y = ALTURA_PAGINA - topo - ascendente
+                comandos.append(
+                    f"{_numero(espacamento)} Tw 1 0 0 1 {_numero(x)} {_numero(y)} Tm ".encode("ascii")
+                    + _texto_pdf(linha) + b" Tj"
+                )
+            topo += altura_linha
+        topo += depois
+
+    paginas.append(comandos)
+    conteudos = [b"BT\n" + b"\n".join(comandos) + b"\nET" for comandos in paginas]
+    return conteudos, codigos_usados
+
+# Função para montar o dicionário de um objeto do PDF
+def _dicionario(itens):
+    partes = []
+    for chave, valor in itens.items():
+        if isinstance(valor, list):
+            valor = "[" + " ".join(_numero(item) if not isinstance(item, str) else item for item in valor) + "]"
+        elif not isinstance(valor, str):
+            valor = _numero(valor)
+        partes.append(f"/{chave} {valor}")
+    return ("<< " + " ".join(partes) + " >>").encode("latin-1")
+
+# Função para montar um objeto de fluxo (stream) comprimido
+def _fluxo(dados, extras=None):
+    comprimido = zlib.compress(dados, 6)
+    return _dicionario({**(extras or {}), "Length": len(comprimido), "Filter": "/FlateDecode"}) + (
+        b"\nstream\n" + comprimido + b"\nendstream"
+    )
+
+# Função para gravar o PDF com as páginas diagramadas e as fontes dos estilos usados
+def escrever_pdf(conteudos, codigos_usados, destino, data_referencia=None, titulo=None):
+    objetos = [None, None]  # 1: catálogo, 2: árvore de páginas
+
+    def adicionar(objeto):
+        objetos.append(objeto)
+        return len(objetos)
+
+    recursos_fontes = []
+    for estilo, codigos in sorted(codigos_usados.items()):
+        fonte = carregar_fonte(estilo)
+        if fonte.caminho is None:
+            referencia = adicionar(_dicionario({
+                "Type": "/Font", "Subtype": "/Type1", "BaseFont": f"/{fonte.nome}", "Encoding": "/WinAnsiEncoding",
+            }))
+        else:
+            codigos = frozenset(codigos) | frozenset(range(PRIMEIRO_CODIGO, 127))
+            # Prefixo de seis letras exigido para fontes reduzidas, derivado dos glifos incluídos
+            resumo = hashlib.sha1(bytes(sorted(codigos))).digest()
+            nome = "".join(chr(65 + byte % 26) for byte in resumo[:6]) + "+" + fonte.nome
+            referencia_arquivo = adicionar(_subconjunto_fonte(fonte.caminho, codigos))
+            referencia_descritor = adicionar(_dicionario({
+                "Type": "/FontDescriptor", "FontName": f"/{nome}", **fonte.descritor,
+                "FontFile2": f"{referencia_arquivo} 0 R",
+            }))
+            referencia = adicionar(_dicionario({
+                "Type": "/Font", "Subtype": "/TrueType", "BaseFont": f"/{nome}",
+                "FirstChar": PRIMEIRO_CODIGO, "LastChar": ULTIMO_CODIGO,
+                "Widths": fonte.larguras[PRIMEIRO_CODIGO:ULTIMO_CODIGO + 1],
+                "Encoding": "/WinAnsiEncoding", "FontDescriptor": f"{referencia_descritor} 0 R",
+            }))
+        recursos_fontes.append(f"/{estilo} {referencia} 0 R")
+
+    recursos = "<< /Font << " + " ".join(recursos_fontes) + " >> >>"
+    paginas = []
+    for conteudo in conteudos:
+        referencia_conteudo = adicionar(_fluxo(conteudo))
+        paginas.append(adicionar(_dicionario({
+            "Type": "/Page", "Parent": "2 0 R", "MediaBox": [0, 0, LARGURA_PAGINA, ALTURA_PAGINA],
+            "Resources": recursos, "Contents": f"{referencia_conteudo} 0 R",
+        })))
+    objetos[0] = _dicionario({"Type": "/Catalog", "Pages": "2 0 R"})
+    objetos[1] = _dicionario({
+        "Type": "/Pages", "Kids": [f"{pagina} 0 R" for pagina in paginas], "Count": len(paginas),
+    })
+
+    # A data de referência (e não o horário atual) torna o arquivo reproduzível
+    data = data_referencia.strftime("D:%Y%m%d000000") if data_referencia else DATA_PADRAO
+    informacoes = {"Producer": "(oficios-arquivamento)", "CreationDate": f"({data})", "ModDate": f"({data})"}
+    if titulo:
+        informacoes["Title"] = _texto_pdf(codificar_texto(titulo)).decode("latin-1")
+    referencia_informacoes = adicionar(_dicionario(informacoes))
+
+    saida = io.BytesIO()
+    saida.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    posicoes = []
+    for numero, objeto in enumerate(objetos, start=1):
+        posicoes.append(saida.tell())
+        saida.write(f"{numero} 0 obj\n".encode("ascii") + objeto + b"\nendobj\n")
+    inicio_xref = saida.tell()
+    saida.write(f"xref\n0 {len(objetos) + 1}\n0000000000 65535 f \n".encode("ascii"))
+    saida.write("".join(f"{posicao:010d} 00000 n \n" for posicao in posicoes).encode("ascii"))
+    saida.write(
+        f"trailer\n<< /Size {len(objetos) + 1} /Root 1 0 R /Info {referencia_informacoes} 0 R >>\n"
+        f"startxref\n{inicio_xref}\n%%EOF\n".encode("ascii")
+    )
+    destino.write(saida.getvalue())
+    return destino
+
+# Função para gerar os bytes de um PDF com os parágrafos informados (ver diagramar)
+def gerar_pdf(paragrafos, data_referencia=None, titulo=None):
+    conteudos, codigos_usados = diagramar(paragrafos)
+    return escrever_pdf(conteudos, codigos_usados, io.BytesIO(), data_referencia, titulo).getvalue()
@@ -0,0 +1,46 @@
+import threading
+import multiprocessing
+from multiprocessing import spawn
+from concurrent.futures import ProcessPoolExecutor
+
+# Marca as threads que estão iniciando os processos de um pool (ver _dados_de_preparacao)
+_iniciando_pool = threading.local()
+
+_obter_dados_de_preparacao = spawn.get_preparation_data
+
+# Função usada pelo multiprocessing para montar os dados com que cada processo filho se prepara.
+# O "spawn" reexecuta o script principal em cada processo filho, e o Streamlit executa o
+# add.py como módulo __main__ (o que montaria a interface e outra fila de tarefas em cada
+# processo). Os processos do pool importam apenas os módulos das funções que executam, então,
+# para eles, o script principal é omitido. O __main__ não é alterado: outras threads do
+# Streamlit podem estar usando-o ao mesmo tempo.
+def _dados_de_preparacao(nome):
+    dados = _obter_dados_de_preparacao(nome)
+    if getattr(_iniciando_pool, "ativo", False):
+        dados.pop("init_main_from_path", None)
+        dados.pop("init_main_from_name", None)
+    return dados
+
+spawn.get_preparation_data = _dados_de_preparacao
+
+# Função enviada a cada processo do pool ao criá-lo, só para que ele seja iniciado
+def _pronto():
+    return True
+
+# Função para criar um pool de processos com todos os processos já iniciados.
+# Usa "spawn", que evita copiar via fork o processo do Streamlit (que possui várias threads).
+# Os processos são todos iniciados aqui, nesta thread, então o pool não inicia outros depois.
+def criar_pool_processos(max_workers, initializer=None, initargs=()):
+    executor = ProcessPoolExecutor(
+        max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"),
+        initializer=initializer, initargs=initargs,
+    )
+    _iniciando_pool.ativo = True
+    try:
+        # Sem processos ociosos, cada envio inicia um novo processo (até max_workers)
+        prontos = [executor.submit(_pronto) for _ in range(max_workers)]
+    finally:
+        _iniciando_pool.ativo = False
+    for pronto in prontos:
+        pronto.result()
+    return executor
@@ -0,0 +1,408 @@
+# Serviço HTTP local para outros sistemas (ex.: o sistema de acompanhamento de casos)
+# pedirem ofícios sem passar pelos formulários da interface do Streamlit.
+#
+# Uso:
+#     python servidor.py                              # http://127.0.0.1:8765
+#     python servidor.py --porta 9000 --processos 4 --limite 16
+#
+# Rotas:
+#     GET  /saude            -> {"situacao": "ok"}
+#     GET  /tipos            -> tipos de ofício e os campos de cada um
+#     GET  /metricas         -> métricas do serviço no formato texto do Prometheus
+#     POST /oficios/<tipo>   -> JSON com os campos do ofício; devolve o .docx
+#     POST /lote             -> JSON {"casos": [...], "numero_inicial": "4886", "data_referencia": "2025-01-02"};
+#                               devolve o ZIP com os três ofícios de cada caso
+#
+# Os casos do lote usam as mesmas colunas da planilha da geração em lote. Sem "numero_oficio"
+# (ou "numero_inicial" no lote), os números são reservados na numeração compartilhada do ano;
+# números já dados a outros casos voltam no cabeçalho X-Conflitos-Numeracao. Os ofícios
+# gerados são gravados no histórico de ofícios emitidos (exceto com --sem-historico).
+#
+# Os documentos são gerados em um pool de processos iniciado, e com os modelos já carregados,
+# antes de o serviço aceitar conexões. As conexões ficam abertas entre pedidos (HTTP/1.1) e
+# no máximo --limite pedidos de geração são atendidos ao mesmo tempo; os demais esperam uma
+# vaga por até ESPERA_VAGA segundos e depois recebem 503.
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+from functools import partial
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote
+
+from modelos import MODELOS, CAMPO_ANO, destinatario_oficio
+from oficios import renderizar_oficio, aquecer_modelos, escrever_zip_oficios, formatar_data_ptbr, nome_arquivo_oficio
+from lote import (
+    COLUNAS_OBRIGATORIAS, COLUNAS_OPCIONAIS, OFICIOS_POR_CASO, LIMITE_ZIP_EM_MEMORIA,
+    preparar_casos, gerar_caso, usos_do_lote, metadados_do_lote,
+)
+from numeracao import reservar_numeros, registrar_usos
+from historico import registrar_oficios, registrar_documentos
+from metricas import observar, incrementar, texto_prometheus, executar_medindo, resultados_medidos, incorporar
+from processos import criar_pool_processos
+
+HOST_PADRAO = "127.0.0.1"
+PORTA_PADRAO = 8765
+
+# Pedidos de geração atendidos ao mesmo tempo por processo do pool (padrão de --limite)
+PEDIDOS_POR_PROCESSO = 4
+
+# Tempo máximo (em segundos) que um pedido espera por uma vaga antes de receber 503
+ESPERA_VAGA = 2.0
+
+# Tempo (em segundos) que uma conexão sem pedidos fica aberta
+TEMPO_CONEXAO_OCIOSA = 30
+
+# Tamanho máximo do corpo de um pedido
+TAMANHO_MAXIMO_CORPO = 16 * 1024 * 1024
+
+# Lotes maiores devem ir para a fila de tarefas (geração em lote da interface ou cli.py)
+MAX_CASOS_POR_PEDIDO = 2000
+
+TIPO_DOCX = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+# Erro de um pedido, devolvido ao cliente com o status HTTP indicado
+class ErroPedido(Exception):
+    def __init__(self, status, mensagem):
+        super().__init__(mensagem)
+        self.status = status
+
+# Função para ler a data de referência de um pedido (padrão: hoje)
+def _data_referencia(texto):
+    if not texto:
+        return date.today()
+    try:
+        return date.fromisoformat(str(texto))
+    except ValueError:
+        raise ErroPedido(HTTPStatus.BAD_REQUEST, f"data_referencia inválida (use AAAA-MM-DD): {texto}") from None
+
+# Função para converter os valores recebidos no JSON para texto
+def _texto(valor):
+    return "" if valor is None else str(valor).strip()
+
+# Função para conferir um número de ofício informado pelo cliente
+def _numero_informado(numero, campo):
+    if not numero.isdigit():
+        raise ErroPedido(HTTPStatus.BAD_REQUEST, f"{campo} deve ser um número inteiro: {numero}")
+    return numero
+
+# Função para montar o cabeçalho Content-Disposition com o nome do arquivo (RFC 6266)
+def _anexo(nome_arquivo):
+    return f"attachment; filename*=UTF-8''{quote(nome_arquivo)}"
+
+# Estado compartilhado pelos pedidos: pool de processos, vagas e onde registrar os ofícios
+class ServicoOficios:
+    def __init__(self, processos=None, limite=None, banco=None, registrar_historico=True):
+        self.processos = processos or os.cpu_count() or 1
+        self.limite = limite or self.processos * PEDIDOS_POR_PROCESSO
+        self.banco = banco
+        self.registrar_historico = registrar_historico
+        self._vagas = threading.BoundedSemaphore(self.limite)
+        self._executor = None
+
+    # Função para iniciar os processos do pool, cada um com os modelos já carregados
+    def iniciar(self):
+        self._executor = criar_pool_processos(self.processos, initializer=aquecer_modelos)
+        return self
+
+    def parar(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    # Função para ocupar uma vaga de geração enquanto o pedido é atendido
+    def _ocupar_vaga(self):
+        if not self._vagas.acquire(timeout=ESPERA_VAGA):
+            incrementar("api_pedidos_recusados")
+            raise ErroPedido(HTTPStatus.SERVICE_UNAVAILABLE, "serviço ocupado; tente novamente em instantes")
+
+    # Função para gerar um ofício a partir dos campos do registro de modelos.
+    # Devolve (nome do arquivo, conteúdo, conflitos de numeração).
+    def gerar_oficio(self, tipo, dados):
+        definicao = MODELOS.get(tipo)
+        if definicao is None:
+            raise ErroPedido(HTTPStatus.NOT_FOUND, f"tipo de ofício desconhecido: {tipo}")
+
+        dados = dict(dados)
+        data_referencia = _data_referencia(dados.pop("data_referencia", None))
+        campos = [campo for campo in definicao.campos if campo != CAMPO_ANO]
+        desconhecidos = sorted(set(dados) - set(campos))
+        if desconhecidos:
+            raise ErroPedido(HTTPStatus.BAD_REQUEST, f"campos desconhecidos: {', '.join(desconhecidos)}")
+
+        valores = {campo: _texto(dados.get(campo)) for campo in campos}
+        if "data" in valores and not valores["data"]:
+            valores["data"] = formatar_data_ptbr(data_referencia)
+        vazios = [
+            campo for campo in campos
+            if not valores[campo] and campo not in definicao.opcionais and campo != "numero_oficio"
+        ]
+        if vazios:
+            raise ErroPedido(HTTPStatus.BAD_REQUEST, f"campos obrigatórios vazios: {', '.join(vazios)}")
+
+        if valores.get("numero_oficio"):
+            _numero_informado(valores["numero_oficio"], "numero_oficio")
+
+        # A vaga é ocupada antes de reservar o número, para que um pedido recusado não gaste números
+        self._ocupar_vaga()
+        try:
+            if "numero_oficio" in valores and not valores["numero_oficio"]:
+                valores["numero_oficio"] = str(reservar_numeros(1, data_referencia.year, caminho=self.banco))
+            conteudo, metricas = self._executor.submit(
+                executar_medindo, renderizar_oficio, tipo, data_referencia, **valores
+            ).result()
+            incorporar(metricas)
+        finally:
+            self._vagas.release()
+
+        numero = valores.get("numero_oficio", "")
+        nome_arquivo = nome_arquivo_oficio(tipo, numero)
+        conflitos = []
+        if numero and valores.get("numero_idea"):
+            conflitos = registrar_usos(
+                data_referencia.year, [(numero, valores["numero_idea"], tipo)], caminho=self.banco
+            )
+        if self.registrar_historico:
+            registrar_oficios([{
+                "tipo": tipo,
+                "idea_numero": valores.get("numero_idea", ""),
+                "numero_oficio": numero,
+                "ano": data_referencia.year,
+                "destinatario": destinatario_oficio(tipo, valores),
+                "data_referencia": data_referencia,
+                "nome_arquivo": nome_arquivo,
+                "conteudo": conteudo,
+            }])
+        return nome_arquivo, conteudo, conflitos
+
+    # Função para gerar o ZIP com os ofícios de um lote de casos.
+    # Devolve (arquivo com o ZIP, primeiro e último números, conflitos de numeração).
+    def gerar_lote(self, dados):
+        casos = dados.get("casos")
+        if not isinstance(casos, list) or not casos:
+            raise ErroPedido(HTTPStatus.BAD_REQUEST, "informe a lista de casos em \"casos\"")
+        if len(casos) > MAX_CASOS_POR_PEDIDO:
+            raise ErroPedido(
+                HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                f"no máximo {MAX_CASOS_POR_PEDIDO} casos por pedido; use a geração em lote para lotes maiores",
+            )
+
+        linhas = []
+        for indice, caso in enumerate(casos):
+            if not isinstance(caso, dict):
+                raise ErroPedido(HTTPStatus.BAD_REQUEST, f"caso {indice}: esperado um objeto JSON")
+            linha = {coluna: _texto(caso.get(coluna)) for coluna in COLUNAS_OBRIGATORIAS + COLUNAS_OPCIONAIS}
+            vazios = [coluna for coluna in COLUNAS_OBRIGATORIAS if not linha[coluna]]
+            if vazios:
+                raise ErroPedido(HTTPStatus.BAD_REQUEST, f"caso {indice}: campos obrigatórios vazios: {', '.join(vazios)}")
+            linhas.append(linha)
+
+        data_referencia = _data_referencia(dados.get("data_referencia"))
+        numero_inicial = _texto(dados.get("numero_inicial"))
+        if numero_inicial:
+            _numero_informado(numero_inicial, "numero_inicial")
+
+        self._ocupar_vaga()
+        try:
+            if not numero_inicial:
+                numero_inicial = reservar_numeros(
+                    len(linhas) * OFICIOS_POR_CASO, data_referencia.year, caminho=self.banco
+                )
+            casos = preparar_casos(linhas, numero_inicial, data_referencia)
+            chunksize = max(1, len(casos) // (self.processos * 4))
+            # As métricas dos processos do pool voltam com os documentos e entram em /metricas
+            chamadas = self._executor.map(partial(executar_medindo, gerar_caso), casos, chunksize=chunksize)
+            documentos = (
+                documento
+                for documentos_caso in resultados_medidos(chamadas)
+                for documento in documentos_caso
+            )
+            if self.registrar_historico:
+                documentos = registrar_documentos(documentos, metadados_do_lote(casos))
+            destino = tempfile.SpooledTemporaryFile(max_size=LIMITE_ZIP_EM_MEMORIA)
+            escrever_zip_oficios(documentos, destino, data_referencia=data_referencia)
+        finally:
+            self._vagas.release()
+
+        conflitos = registrar_usos(data_referencia.year, usos_do_lote(casos), caminho=self.banco)
+        ultimo_numero = int(numero_inicial) + len(casos) * OFICIOS_POR_CASO - 1
+        return destino, numero_inicial, ultimo_numero, conflitos
+
+# Atende os pedidos de uma conexão (uma thread por conexão, mantida aberta entre pedidos)
+class ManipuladorPedidos(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "OficiosMPBA/1.0"
+    timeout = TEMPO_CONEXAO_OCIOSA
+    # Sem o algoritmo de Nagle, respostas pequenas não esperam o próximo pacote
+    disable_nagle_algorithm = True
+
+    # Os pedidos não são escritos no terminal, para não limitar o volume atendido
+    def log_message(self, formato, *args):
+        pass
+
+    def do_GET(self):
+        self._atender(self._rotas_get)
+
+    def do_POST(self):
+        self._atender(self._rotas_post)
+
+    # Função para atender um pedido, medindo sua duração e convertendo erros em respostas JSON
+    def _atender(self, rotas):
+        inicio = time.perf_counter()
+        rota = self.path.split("?", 1)[0]
+        etapa = "api_" + (rota.strip("/").split("/", 1)[0] or "raiz")
+        try:
+            rotas(rota)
+        except ErroPedido as erro:
+            self._responder_json(erro.status, {"erro": str(erro)})
+        except Exception as erro:
+            incrementar("api_erros_internos")
+            self.log_error("erro ao atender %s: %r", rota, erro)
+            self._responder_json(HTTPStatus.INTERNAL_SERVER_ERROR, {"erro": "erro interno ao gerar o ofício"})
+        observar(etapa, time.perf_counter() - inicio)
+
+    def _rotas_get(self, rota):
+        if rota == "/saude":
+            self._responder_json(HTTPStatus.OK, {"situacao": "ok"})
+        elif rota == "/tipos":
+            self._responder_json(HTTPStatus.OK, {
+                tipo: {
+                    "titulo": definicao.titulo,
+                    "campos": [campo for campo in definicao.campos if campo != CAMPO_ANO],
+                    "opcionais": list(definicao.opcionais),
+                }
+                for tipo, definicao in MODELOS.items()
+            })
+        elif rota == "/metricas":
+            self._responder(HTTPStatus.OK, texto_prometheus().encode("utf-8"), "text/plain; version=0.0.4")
+        else:
+            raise ErroPedido(HTTPStatus.NOT_FOUND, f"rota desconhecida: {rota}")
+
+    def _rotas_post(self, rota):
+        servico = self.server.servico
+        if rota.startswith("/oficios/"):
+            nome_arquivo, conteudo, conflitos = servico.gerar_oficio(rota[len("/oficios/"):], self._ler_json())
+            self._responder(HTTPStatus.OK, conteudo, TIPO_DOCX, {
+                "Content-Disposition": _anexo(f"{nome_arquivo}.docx"),
+                **self._cabecalho_conflitos(conflitos),
+            })
+        elif rota == "/lote":
+            destino, primeiro, ultimo, conflitos = servico.gerar_lote(self._ler_json())
+            with destino:
+                self._responder_arquivo(destino, "application/zip", {
+                    "Content-Disposition": _anexo(f"Oficios_{primeiro}_a_{ultimo}.zip"),
+                    "X-Numero-Inicial": str(primeiro),
+                    "X-Numero-Final": str(ultimo),
+                    **self._cabecalho_conflitos(conflitos),
+                })
+        else:
+            raise ErroPedido(HTTPStatus.NOT_FOUND, f"rota desconhecida: {rota}")
+
+    # Função para ler o corpo JSON do pedido
+    def _ler_json(self):
+        tamanho = self.headers.get("Content-Length")
+        # Nos dois casos o corpo não é lido, então a conexão não pode ser reaproveitada
+        if tamanho is None or not tamanho.isdigit():
+            self.close_connection = True
+            raise ErroPedido(HTTPStatus.LENGTH_REQUIRED, "informe o cabeçalho Content-Length")
+        if int(tamanho) > TAMANHO_MAXIMO_CORPO:
+            self.close_connection = True
+            raise ErroPedido(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "corpo do pedido grande demais")
+        corpo = self.rfile.read(int(tamanho))
+        try:
+            dados = json.loads(corpo)
+        except ValueError:
+            raise ErroPedido(HTTPStatus.BAD_REQUEST, "corpo do pedido não é um JSON válido") from None
+        if not isinstance(dados, dict):
+            raise ErroPedido(HTTPStatus.BAD_REQUEST, "esperado um objeto JSON")
+        return dados
+
+    @staticmethod
+    def _cabecalho_conflitos(conflitos):
+        if not conflitos:
+            return {}
+        return {"X-Conflitos-Numeracao": ",".join(str(conflito["numero"]) for conflito in conflitos)}
+
+    def _responder_json(self, status, dados):
+        self._responder(status, json.dumps(dados, ensure_ascii=False).encode("utf-8"), "application/json; charset=utf-8")
+
+    def _responder(self, status, corpo, tipo_conteudo, cabecalhos=None):
+        self.send_response(status)
+        self.send_header("Content-Type", tipo_conteudo)
+        self.send_header("Content-Length", str(len(corpo)))
+        for nome, valor in (cabecalhos or {}).items():
+            self.send_header(nome, valor)
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    # Função para enviar um arquivo (ex.: o ZIP do lote) em partes, sem lê-lo inteiro na memória
+    def _responder_arquivo(self, arquivo, tipo_conteudo, cabecalhos):
+        arquivo.seek(0, os.SEEK_END)
+        tamanho = arquivo.tell()
+        arquivo.seek(0)
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", tipo_conteudo)
+        self.send_header("Content-Length", str(tamanho))
+        for nome, valor in cabecalhos.items():
+            self.send_header(nome, valor)
+        self.end_headers()
+        while parte := arquivo.read(1024 * 1024):
+            self.wfile.write(parte)
+
+# Servidor com uma thread por conexão e fila de conexões maior que a padrão
+class ServidorOficios(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, endereco, servico):
+        self.servico = servico
+        super().__init__(endereco, ManipuladorPedidos)
+
+# Função para criar o servidor (com o pool de processos já iniciado), sem começar a atender
+def criar_servidor(host=HOST_PADRAO, porta=PORTA_PADRAO, processos=None, limite=None, banco=None,
+                   registrar_historico=True):
+    servico = ServicoOficios(processos, limite, banco, registrar_historico).iniciar()
+    try:
+        return ServidorOficios((host, porta), servico)
+    except BaseException:
+        servico.parar()
+        raise
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serviço HTTP local de geração de ofícios")
+    parser.add_argument("--host", default=HOST_PADRAO, help=f"endereço de escuta (padrão: {HOST_PADRAO})")
+    parser.add_argument("--porta", type=int, default=PORTA_PADRAO, help=f"porta (padrão: {PORTA_PADRAO})")
+    parser.add_argument("--processos", type=int, default=None,
+                        help="processos que geram os documentos (padrão: um por CPU)")
+    parser.add_argument("--limite", type=int, default=None,
+                        help=f"pedidos de geração atendidos ao mesmo tempo (padrão: {PEDIDOS_POR_PROCESSO} por processo)")
+    parser.add_argument("--banco", default=None,
+                        help="banco SQLite da numeração (padrão: OFICIOS_DADOS_DIR/oficios.sqlite3)")
+    parser.add_argument("--sem-historico", action="store_true",
+                        help="não gravar os ofícios gerados no histórico de ofícios emitidos")
+    args = parser.parse_args(argv)
+
+    servidor = criar_servidor(args.host, args.porta, args.processos, args.limite, args.banco, not args.sem_historico)
+    servico = servidor.servico
+    print(
+        f"Servindo em http://{args.host}:{args.porta} ({servico.processos} processos, "
+        f"até {servico.limite} pedidos simultâneos)",
+        flush=True,
+    )
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        servico.parar()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,443 @@
+import os
+import time
+import uuid
+import pickle
+import zipfile
+import threading
+from functools import partial
+from datetime import datetime, timedelta
+
+import banco
+from oficios import (
+    DIRETORIO_DADOS,
+    assinatura_oficio,
+    escrever_entrada_zip,
+    copiar_entrada_zip,
+    entradas_por_assinatura,
+    ativar_cache_documentos,
+)
+from lote import (
+    gerar_oficio,
+    gerar_documento_unico,
+    oficios_do_caso,
+    metadados_do_lote,
+    formatos_gerados,
+    FORMATOS_LOTE,
+    OFICIOS_POR_CASO,
+)
+from metricas import medir, incrementar, exportar_prometheus, executar_medindo, resultados_medidos, incorporar
+
+# Banco SQLite com as tarefas de geração e diretório onde ficam os arquivos prontos
+BANCO_PADRAO = os.path.join(DIRETORIO_DADOS, "tarefas.sqlite3")
+DIRETORIO_RESULTADOS = os.path.join(DIRETORIO_DADOS, "tarefas")
+
+# Quantidade de casos gerados de cada vez. Entre uma fatia e outra a tarefa devolve a vez
+# se houver tarefas de outras pessoas esperando, então um lote grande não trava a fila.
+CASOS_POR_FATIA = 64
+
+# Tarefas simultâneas (cada uma envia suas fatias ao mesmo pool de processos)
+TAREFAS_SIMULTANEAS = 2
+
+# Tempo (em segundos) entre consultas à fila quando não há tarefas
+INTERVALO_CONSULTA = 1.0
+
+# Dias que as tarefas concluídas (e seus arquivos) ficam disponíveis
+DIAS_GUARDANDO_RESULTADOS = 7
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS tarefas (
+    id TEXT PRIMARY KEY,
+    dono TEXT NOT NULL,
+    descricao TEXT NOT NULL,
+    estado TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    concluidos INTEGER NOT NULL DEFAULT 0,
+    parametros BLOB NOT NULL,
+    arquivo TEXT,
+    arquivo_impressao TEXT,
+    erro TEXT,
+    criada_em TEXT NOT NULL,
+    atendida_em REAL,
+    concluida_em TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_tarefas_estado ON tarefas (estado);
+CREATE INDEX IF NOT EXISTS idx_tarefas_dono ON tarefas (dono, criada_em);
+"""
+
+# Estados de uma tarefa
+PENDENTE = "pendente"
+EXECUTANDO = "executando"
+CONCLUIDA = "concluida"
+ERRO = "erro"
+
+COLUNAS_TAREFA = (
+    "id", "dono", "descricao", "estado", "total", "concluidos",
+    "arquivo", "arquivo_impressao", "erro", "criada_em", "concluida_em",
+)
+
+# Função para abrir uma conexão com o banco das tarefas
+def conectar(caminho=None):
+    return banco.conectar(caminho or BANCO_PADRAO, ESQUEMA)
+
+# Função para colocar uma geração na fila. "casos" são os casos já numerados (ver
+# lote.preparar_casos). Com "anterior" (o identificador de uma tarefa já concluída), os ofícios
+# cujas entradas não mudaram são copiados do ZIP dela em vez de gerados e registrados de novo.
+# "formatos" são os formatos dos arquivos no ZIP (ver lote.FORMATOS_LOTE).
+# Devolve o identificador da tarefa.
+def enviar_tarefa(dono, descricao, casos, data_referencia=None, impressao=False,
+                  registrar_historico=True, anterior=None, formatos=FORMATOS_LOTE["docx"], caminho=None):
+    if not casos:
+        raise ValueError("A tarefa não possui casos.")
+    id_tarefa = uuid.uuid4().hex
+    parametros = pickle.dumps({
+        "casos": list(casos),
+        "data_referencia": data_referencia,
+        "impressao": impressao,
+        "registrar_historico": registrar_historico,
+        "anterior": anterior,
+        "formatos": tuple(formatos),
+    }, protocol=pickle.HIGHEST_PROTOCOL)
+
+    conexao = conectar(caminho)
+    try:
+        conexao.execute(
+            "INSERT INTO tarefas (id, dono, descricao, estado, total, parametros, criada_em) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (id_tarefa, dono, descricao, PENDENTE, len(casos) * OFICIOS_POR_CASO, parametros,
+             datetime.now().isoformat(timespec="seconds")),
+        )
+    finally:
+        conexao.close()
+    return id_tarefa
+
+# Função para obter uma tarefa (None se não existir)
+def obter_tarefa(id_tarefa, caminho=None):
+    conexao = conectar(caminho)
+    try:
+        linha = conexao.execute(
+            f"SELECT {', '.join(COLUNAS_TAREFA)} FROM tarefas WHERE id = ?", (id_tarefa,)
+        ).fetchone()
+    finally:
+        conexao.close()
+    return dict(zip(COLUNAS_TAREFA, linha)) if linha else None
+
+# Função para listar as tarefas de uma pessoa, das mais recentes às mais antigas
+def listar_tarefas(dono, limite=20, caminho=None):
+    conexao = conectar(caminho)
+    try:
+        linhas = conexao.execute(
+            f"SELECT {', '.join(COLUNAS_TAREFA)} FROM tarefas WHERE dono = ? "
+            "ORDER BY criada_em DESC, rowid DESC LIMIT ?",
+            (dono, limite),
+        ).fetchall()
+    finally:
+        conexao.close()
+    return [dict(zip(COLUNAS_TAREFA, linha)) for linha in linhas]
+
+# Função para escolher e marcar como em execução a próxima tarefa da fila.
+# A vez é de quem tem menos tarefas em execução e, entre esses, da tarefa atendida há mais
+# tempo (tarefas novas primeiro), então várias pessoas usando a fila são atendidas em rodízio.
+def _reservar_proxima(conexao):
+    conexao.execute("BEGIN IMMEDIATE")
+    try:
+        linha = conexao.execute(
+            "SELECT id, parametros FROM tarefas AS t WHERE estado = ? "
+            "ORDER BY (SELECT COUNT(*) FROM tarefas AS e WHERE e.dono = t.dono AND e.estado = ?), "
+            "COALESCE(atendida_em, 0), criada_em, rowid LIMIT 1",
+            (PENDENTE, EXECUTANDO),
+        ).fetchone()
+        if linha is not None:
+            conexao.execute("UPDATE tarefas SET estado = ? WHERE id = ?", (EXECUTANDO, linha[0]))
+        conexao.execute("COMMIT")
+    except BaseException:
+        conexao.execute("ROLLBACK")
+        raise
+    return linha
+
+# Função executada em um processo do pool: grava o arquivo único de impressão de uma tarefa
+def _gravar_impressao(casos, caminho_arquivo, data_referencia):
+    with open(caminho_arquivo, "wb") as destino:
+        gerar_documento_unico(casos, destino=destino, data_referencia=data_referencia)
+    return caminho_arquivo
+
+# Função executada ao iniciar cada processo do pool: ativa o cache de ofícios prontos em disco
+def _iniciar_processo(diretorio_cache):
+    if diretorio_cache:
+        from cache_oficios import CacheOficios
+        ativar_cache_documentos(CacheOficios(diretorio_cache))
+
+# Estado em memória de uma tarefa iniciada: parâmetros, o ZIP aberto sendo gravado e, se houver,
+# o ZIP da tarefa anterior com as suas entradas indexadas pela assinatura de cada ofício
+class _TarefaEmAndamento:
+    def __init__(self, id_tarefa, parametros, diretorio, caminho_anterior=None):
+        self.id = id_tarefa
+        self.casos = parametros["casos"]
+        self.data_referencia = parametros["data_referencia"]
+        self.impressao = parametros["impressao"]
+        self.registrar_historico = parametros["registrar_historico"]
+        self.formatos = parametros.get("formatos", FORMATOS_LOTE["docx"])
+        self.proximo_caso = 0
+        self.caminho_zip = os.path.join(diretorio, f"{id_tarefa}.zip")
+        self.zip_file = zipfile.ZipFile(self.caminho_zip, "w", zipfile.ZIP_STORED)
+        self.zip_anterior = None
+        self.anteriores = {}
+        if caminho_anterior:
+            self.zip_anterior = zipfile.ZipFile(caminho_anterior)
+            self.anteriores = entradas_por_assinatura(self.zip_anterior)
+
+    def fechar(self):
+        self.zip_file.close()
+        if self.zip_anterior is not None:
+            self.zip_anterior.close()
+
+# Fila de tarefas de geração, com threads que coordenam as tarefas e um pool de processos
+# (compartilhado) que gera os documentos. Deve existir uma única fila por servidor: no
+# Streamlit ela é criada com st.cache_resource. Tarefas interrompidas por um reinício do
+# servidor voltam para a fila e são geradas de novo desde o início (o ZIP parcial não pode ser
+# continuado); os ofícios que elas já tinham registrado não entram de novo no histórico.
+class FilaTarefas:
+    def __init__(self, tarefas_simultaneas=TAREFAS_SIMULTANEAS, processos=None, caminho=None,
+                 diretorio=DIRETORIO_RESULTADOS, diretorio_cache=None):
+        self.tarefas_simultaneas = tarefas_simultaneas
+        self.diretorio_cache = diretorio_cache
+        self.processos = processos or os.cpu_count() or 1
+        self.caminho = caminho
+        self.diretorio = diretorio
+        self._em_andamento = {}
+        self._lock = threading.Lock()
+        self._aviso = threading.Event()
+        self._parar = threading.Event()
+        self._threads = []
+        self._executor = None
+
+    # Função para iniciar o pool de processos e as threads da fila
+    def iniciar(self):
+        from processos import criar_pool_processos
+
+        os.makedirs(self.diretorio, exist_ok=True)
+        self._recuperar_interrompidas()
+        self.limpar_antigas()
+
+        # Os processos já ficam prontos (com os módulos importados) para a primeira tarefa
+        self._executor = criar_pool_processos(
+            self.processos, initializer=_iniciar_processo, initargs=(self.diretorio_cache,)
+        )
+
+        for indice in range(self.tarefas_simultaneas):
+            thread = threading.Thread(target=self._laco, name=f"fila-tarefas-{indice}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    # Função para parar as threads e o pool (tarefas em execução voltam para a fila)
+    def parar(self):
+        self._parar.set()
+        self._aviso.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+        with self._lock:
+            for tarefa in self._em_andamento.values():
+                tarefa.fechar()
+            self._em_andamento.clear()
+        self._recuperar_interrompidas()
+
+    # Função para avisar as threads de que há uma tarefa nova (evita esperar a próxima consulta)
+    def avisar(self):
+        self._aviso.set()
+
+    # Função para devolver à fila as tarefas que estavam em execução quando o servidor parou
+    def _recuperar_interrompidas(self):
+        conexao = conectar(self.caminho)
+        try:
+            conexao.execute(
+                "UPDATE tarefas SET estado = ?, concluidos = 0 WHERE estado = ? OR (estado = ? AND concluidos > 0)",
+                (PENDENTE, EXECUTANDO, PENDENTE),
+            )
+        finally:
+            conexao.close()
+
+    # Função para apagar as tarefas concluídas há mais de "dias" e os seus arquivos
+    def limpar_antigas(self, dias=DIAS_GUARDANDO_RESULTADOS):
+        limite = (datetime.now() - timedelta(days=dias)).isoformat(timespec="seconds")
+        conexao = conectar(self.caminho)
+        try:
+            antigas = conexao.execute(
+                "SELECT id, arquivo, arquivo_impressao FROM tarefas WHERE estado IN (?, ?) AND concluida_em < ?",
+                (CONCLUIDA, ERRO, limite),
+            ).fetchall()
+            for id_tarefa, *arquivos in antigas:
+                for arquivo in arquivos:
+                    if arquivo:
+                        try:
+                            os.remove(arquivo)
+                        except OSError:
+                            pass
+                conexao.execute("DELETE FROM tarefas WHERE id = ?", (id_tarefa,))
+        finally:
+            conexao.close()
+
+    def _laco(self):
+        conexao = conectar(self.caminho)
+        try:
+            while not self._parar.is_set():
+                linha = _reservar_proxima(conexao)
+                if linha is None:
+                    self._aviso.wait(INTERVALO_CONSULTA)
+                    self._aviso.clear()
+                    continue
+                self._atender(conexao, *linha)
+        finally:
+            conexao.close()
+
+    # Função para gerar a próxima parte de uma tarefa (ou a tarefa inteira, se ninguém mais esperar)
+    def _atender(self, conexao, id_tarefa, parametros):
+        try:
+            with self._lock:
+                tarefa = self._em_andamento.get(id_tarefa)
+            if tarefa is None:
+                parametros = pickle.loads(parametros)
+                tarefa = _TarefaEmAndamento(
+                    id_tarefa, parametros, self.diretorio, self._resultado_anterior(parametros.get("anterior"))
+                )
+                with self._lock:
+                    self._em_andamento[id_tarefa] = tarefa
+
+            while tarefa.proximo_caso < len(tarefa.casos):
+                if self._parar.is_set():
+                    return
+                self._gerar_fatia(conexao, tarefa)
+                if tarefa.proximo_caso < len(tarefa.casos) and self._ha_outros_esperando(conexao, id_tarefa):
+                    # Devolver a vez: a tarefa volta para a fila e continua de onde parou
+                    conexao.execute(
+                        "UPDATE tarefas SET estado = ?, atendida_em = ? WHERE id = ?",
+                        (PENDENTE, time.time(), id_tarefa),
+                    )
+                    return
+
+            self._concluir(conexao, tarefa)
+        except Exception as erro:
+            self._falhar(conexao, id_tarefa, erro)
+
+    # Função para obter o ZIP de uma tarefa anterior, se ela foi concluída e o arquivo ainda existe
+    def _resultado_anterior(self, id_anterior):
+        if not id_anterior:
+            return None
+        anterior = obter_tarefa(id_anterior, self.caminho)
+        if anterior is None or anterior["estado"] != CONCLUIDA or not anterior["arquivo"]:
+            return None
+        return anterior["arquivo"] if os.path.exists(anterior["arquivo"]) else None
+
+    # Função para verificar se há tarefas de outras pessoas esperando na fila
+    def _ha_outros_esperando(self, conexao, id_tarefa):
+        return conexao.execute(
+            "SELECT 1 FROM tarefas WHERE estado = ? AND dono != (SELECT dono FROM tarefas WHERE id = ?) LIMIT 1",
+            (PENDENTE, id_tarefa),
+        ).fetchone() is not None
+
+    # Função para gerar uma fatia de casos no pool de processos e gravá-la no ZIP da tarefa.
+    # Cada ofício é gerado em cada formato da tarefa. Só vão ao pool os documentos cuja
+    # assinatura não está no ZIP da tarefa anterior; os demais são copiados de lá, sem gerar
+    # nem recomprimir, e não entram de novo no histórico.
+    def _gerar_fatia(self, conexao, tarefa):
+        fatia = tarefa.casos[tarefa.proximo_caso:tarefa.proximo_caso + CASOS_POR_FATIA]
+        metadados = list(metadados_do_lote(fatia))
+        oficios = [(caso, oficio) for caso in fatia for oficio in oficios_do_caso(caso)]
+        formatos = formatos_gerados(tarefa.formatos, tarefa.registrar_historico)
+        # (posição do ofício na fatia, ofício, data de referência, formato) de cada documento
+        itens = [
+            (posicao, oficio, caso["data_referencia"], formato)
+            for posicao, (caso, oficio) in enumerate(oficios)
+            for formato in formatos
+        ]
+        assinaturas = [
+            assinatura_oficio(oficio["tipo"], data, oficio["valores"], formato) for _, oficio, data, formato in itens
+        ]
+        novos = [indice for indice, assinatura in enumerate(assinaturas) if assinatura not in tarefa.anteriores]
+        chunksize = max(1, len(novos) // (self.processos * 4))
+        with medir("tarefa_fatia"):
+            documentos = dict(zip(novos, resultados_medidos(self._executor.map(
+                partial(executar_medindo, gerar_oficio),
+                [itens[indice][1] for indice in novos],
+                [itens[indice][2] for indice in novos],
+                [itens[indice][3] for indice in novos],
+                chunksize=chunksize,
+            ))))
+            if tarefa.registrar_historico and documentos:
+                from historico import registrar_oficios
+                registrar_oficios(
+                    {**metadados[itens[indice][0]], "nome_arquivo": nome_arquivo, "conteudo": conteudo,
+                     "tarefa": tarefa.id}
+                    for indice, (nome_arquivo, conteudo) in documentos.items()
+                    if itens[indice][3] == "docx"
+                )
+            for indice, assinatura in enumerate(assinaturas):
+                if itens[indice][3] not in tarefa.formatos:
+                    continue
+                if indice in documentos:
+                    nome_arquivo, conteudo = documentos[indice]
+                    escrever_entrada_zip(tarefa.zip_file, nome_arquivo, conteudo, tarefa.data_referencia, assinatura)
+                else:
+                    copiar_entrada_zip(tarefa.zip_file, tarefa.zip_anterior, tarefa.anteriores[assinatura])
+        if len(assinaturas) > len(documentos):
+            incrementar("oficios_reaproveitados", len(assinaturas) - len(documentos))
+
+        tarefa.proximo_caso += len(fatia)
+        conexao.execute(
+            "UPDATE tarefas SET concluidos = ?, atendida_em = ? WHERE id = ?",
+            (tarefa.proximo_caso * OFICIOS_POR_CASO, time.time(), tarefa.id),
+        )
+
+    def _concluir(self, conexao, tarefa):
+        tarefa.fechar()
+        caminho_impressao = None
+        if tarefa.impressao:
+            caminho_impressao, metricas = self._executor.submit(
+                executar_medindo, _gravar_impressao, tarefa.casos,
+                os.path.join(self.diretorio, f"{tarefa.id}-impressao.docx"), tarefa.data_referencia,
+            ).result()
+            incorporar(metricas)
+
+        conexao.execute(
+            "UPDATE tarefas SET estado = ?, arquivo = ?, arquivo_impressao = ?, concluida_em = ? WHERE id = ?",
+            (CONCLUIDA, tarefa.caminho_zip, caminho_impressao,
+             datetime.now().isoformat(timespec="seconds"), tarefa.id),
+        )
+        with self._lock:
+            self._em_andamento.pop(tarefa.id, None)
+        incrementar("tarefas_concluidas")
+        exportar_prometheus()
+
+    def _falhar(self, conexao, id_tarefa, erro):
+        with self._lock:
+            tarefa = self._em_andamento.pop(id_tarefa, None)
+        if tarefa is not None:
+            tarefa.fechar()
+            try:
+                os.remove(tarefa.caminho_zip)
+            except OSError:
+                pass
+        conexao.execute(
+            "UPDATE tarefas SET estado = ?, erro = ?, concluida_em = ? WHERE id = ?",
+            (ERRO, str(erro) or type(erro).__name__, datetime.now().isoformat(timespec="seconds"), id_tarefa),
+        )
+        incrementar("tarefas_com_erro")
+        exportar_prometheus()
+
+# Função para ler um arquivo pronto de uma tarefa
+def ler_resultado(caminho_arquivo):
+    with open(caminho_arquivo, "rb") as f:
+        return f.read()
+
+# Função para ler um único arquivo (nome com extensão) do ZIP pronto de uma tarefa
+def ler_oficio_do_resultado(caminho_arquivo, nome_arquivo):
+    with zipfile.ZipFile(caminho_arquivo) as zip_file:
+        return zip_file.read(nome_arquivo)
+
+# Função para listar os arquivos (nomes com extensão) do ZIP pronto de uma tarefa
+def oficios_do_resultado(caminho_arquivo):
+    with zipfile.ZipFile(caminho_arquivo) as zip_file:
+        return zip_file.namelist()
@@ -0,0 +1,12 @@
+import os
+import sys
+import tempfile
+
+# Os testes usam diretórios temporários para os dados, o cache e as métricas. As variáveis
+# são definidas antes de importar os módulos do projeto (e são herdadas pelos processos do pool).
+_temporario = tempfile.mkdtemp(prefix="oficios-testes-")
+os.environ["OFICIOS_DADOS_DIR"] = os.path.join(_temporario, "dados")
+os.environ["OFICIOS_CACHE_DIR"] = os.path.join(_temporario, "cache")
+os.environ["OFICIOS_METRICAS_ARQUIVO"] = os.path.join(_temporario, "metricas.prom")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
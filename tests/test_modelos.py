@@ -0,0 +1,39 @@
+import json
+
+import pytest
+
+from lote import preparar_casos, oficios_do_caso
+from modelos import carregar_modelos, destinatario_oficio
+
+# Função para gravar um registro com um único tipo de ofício e compilá-lo
+def _carregar(tmp_path, **definicao):
+    oficio = {"titulo": "Teste", "campos": ["numero_oficio", "nome"], "paragrafos": [{"texto": "Ofício {numero_oficio}"}]}
+    oficio.update(definicao)
+    caminho = tmp_path / "modelos.json"
+    caminho.write_text(json.dumps({"oficios": {"teste": oficio}}), encoding="utf-8")
+    return carregar_modelos(str(caminho))
+
+def test_destinatario_literal_ou_campo(tmp_path):
+    assert _carregar(tmp_path, destinatario="Cartório").get("teste").destinatario == "Cartório"
+    definicao = _carregar(tmp_path, destinatario="{nome}")["teste"]
+    assert definicao.destinatario.format_map({"nome": "Maria"}) == "Maria"
+
+def test_destinatario_obrigatorio(tmp_path):
+    with pytest.raises(ValueError, match="destinatário"):
+        _carregar(tmp_path)
+
+def test_destinatario_com_campo_nao_declarado(tmp_path):
+    with pytest.raises(ValueError, match="nome_vitima"):
+        _carregar(tmp_path, destinatario="{nome_vitima}")
+
+def test_destinatarios_dos_oficios_do_caso():
+    from datetime import date
+
+    caso = preparar_casos([{
+        "idea_numero": "1", "nome_vitima": "Ana", "endereco_vitima": "Rua A", "telefone_vitima": "",
+        "nome_acusado": "Bruno", "endereco_acusado": "Rua B", "telefone_acusado": "",
+    }], 10, date(2026, 3, 2))[0]
+    destinatarios = [oficio["destinatario"] for oficio in oficios_do_caso(caso)]
+    assert destinatarios[1:] == ["Ana", "Bruno"]
+    assert destinatarios[0] == destinatario_oficio("arquivamento", {})
+    assert "DEAM" in destinatarios[0]
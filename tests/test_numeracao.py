@@ -0,0 +1,27 @@
+import numeracao
+
+def test_proximo_numero(tmp_path):
+    caminho = str(tmp_path / "oficios.sqlite3")
+    assert numeracao.proximo_numero(2026, caminho) is None
+
+    inicio = numeracao.reservar_numeros(3, 2026, numero_sugerido=100, caminho=caminho)
+    assert inicio == 100
+    assert numeracao.proximo_numero(2026, caminho) == 103
+
+    # Números digitados à mão também avançam a sequência
+    numeracao.registrar_usos(2026, [(200, "IDEA-1", "arquivamento")], caminho)
+    assert numeracao.proximo_numero(2026, caminho) == 201
+    assert numeracao.proximo_numero(2025, caminho) is None
+
+def test_numeros_do_caso(tmp_path):
+    caminho = str(tmp_path / "oficios.sqlite3")
+    numeracao.registrar_usos(2026, [
+        (11, "IDEA-1", "notificacao_vitima"), (10, "IDEA-1", "arquivamento"), (12, "IDEA-2", "arquivamento"),
+    ], caminho)
+    numeracao.registrar_usos(2025, [(90, "IDEA-1", "notificacao_acusado")], caminho)
+
+    numeros = numeracao.numeros_do_caso("IDEA-1", caminho)
+    assert [(numero["ano"], numero["numero"], numero["tipo"]) for numero in numeros] == [
+        (2025, 90, "notificacao_acusado"), (2026, 10, "arquivamento"), (2026, 11, "notificacao_vitima"),
+    ]
+    assert numeracao.numeros_do_caso("IDEA-3", caminho) == []
@@ -0,0 +1,24 @@
+from datetime import date
+
+import pytest
+
+from pdf import gerar_pdf
+from oficios import renderizar_oficio_pdf
+
+PARAGRAFO = ("Notificação de arquivamento", False, False, "esquerda", 0, 0)
+
+def test_pdf_com_acentos():
+    conteudo = gerar_pdf([PARAGRAFO], date(2026, 3, 2), "Ofício 1")
+    assert conteudo.startswith(b"%PDF-1.4")
+    assert conteudo.rstrip().endswith(b"%%EOF")
+
+def test_caractere_fora_da_codificacao_gera_erro():
+    with pytest.raises(ValueError, match="U\\+2713"):
+        gerar_pdf([("Conferido ✓", False, False, "esquerda", 0, 0)])
+
+def test_erro_indica_o_oficio():
+    with pytest.raises(ValueError, match="Ofício 11.*U\\+0141"):
+        renderizar_oficio_pdf(
+            "notificacao_vitima", date(2026, 3, 2), numero_oficio="11", data="2 de março de 2026",
+            numero_idea="123", nome_vitima="Łucja Nowak", endereco="Rua A", telefone="",
+        )
@@ -0,0 +1,86 @@
+import time
+from datetime import date
+
+import pytest
+
+import historico
+import metricas
+import tarefas
+from lote import preparar_casos, OFICIOS_POR_CASO
+
+DATA = date(2026, 3, 2)
+
+# Função para montar "quantidade" casos numerados a partir do ofício 1
+def _casos(quantidade):
+    linhas = [
+        {
+            "idea_numero": f"IDEA-{indice}", "nome_vitima": f"Vítima {indice}", "endereco_vitima": "Rua A",
+            "nome_acusado": f"Acusado {indice}", "endereco_acusado": "Rua B",
+            "telefone_vitima": "", "telefone_acusado": "",
+        }
+        for indice in range(quantidade)
+    ]
+    return preparar_casos(linhas, 1, DATA)
+
+# Função para esperar a conclusão de uma tarefa
+def _esperar(id_tarefa, caminho, limite=60):
+    fim = time.monotonic() + limite
+    while time.monotonic() < fim:
+        tarefa = tarefas.obter_tarefa(id_tarefa, caminho)
+        if tarefa["estado"] in (tarefas.CONCLUIDA, tarefas.ERRO):
+            return tarefa
+        time.sleep(0.1)
+    raise AssertionError("A tarefa não terminou a tempo.")
+
+@pytest.fixture
+def ambiente(tmp_path, monkeypatch):
+    monkeypatch.setattr(historico, "BANCO_PADRAO", str(tmp_path / "historico.sqlite3"))
+    return {"caminho": str(tmp_path / "tarefas.sqlite3"), "diretorio": str(tmp_path / "resultados")}
+
+# Função para iniciar uma fila com um pool de dois processos
+def _fila(ambiente):
+    return tarefas.FilaTarefas(
+        processos=2, caminho=ambiente["caminho"], diretorio=ambiente["diretorio"]
+    ).iniciar()
+
+def test_tarefa_interrompida_nao_registra_duas_vezes(ambiente):
+    casos = _casos(5)
+    id_tarefa = tarefas.enviar_tarefa("pessoa", "lote", casos, DATA, caminho=ambiente["caminho"])
+    fila = _fila(ambiente)
+    try:
+        assert _esperar(id_tarefa, ambiente["caminho"])["estado"] == tarefas.CONCLUIDA
+    finally:
+        fila.parar()
+
+    # Simular um reinício com a tarefa ainda em execução: ela é gerada de novo desde o início
+    conexao = tarefas.conectar(ambiente["caminho"])
+    try:
+        conexao.execute("UPDATE tarefas SET estado = ? WHERE id = ?", (tarefas.EXECUTANDO, id_tarefa))
+    finally:
+        conexao.close()
+    fila = _fila(ambiente)
+    try:
+        assert _esperar(id_tarefa, ambiente["caminho"])["estado"] == tarefas.CONCLUIDA
+    finally:
+        fila.parar()
+
+    total = len(casos) * OFICIOS_POR_CASO
+    assert len(historico.buscar_oficios(limite=1000)) == total
+    assert sum(quantidade for *_, quantidade in historico.producao_por_tipo()) == total
+    assert sum(quantidade for *_, quantidade in historico.producao_por_faixa()) == total
+
+def test_metricas_dos_processos_chegam_ao_resumo(ambiente):
+    metricas.zerar()
+    id_tarefa = tarefas.enviar_tarefa("pessoa", "lote", _casos(4), DATA, caminho=ambiente["caminho"])
+    fila = _fila(ambiente)
+    try:
+        assert _esperar(id_tarefa, ambiente["caminho"])["estado"] == tarefas.CONCLUIDA
+    finally:
+        fila.parar()
+
+    etapas, contadores = metricas.resumo()
+    chamadas = {etapa["etapa"]: etapa["chamadas"] for etapa in etapas}
+    # Renderização (nos processos do pool) e gravação do ZIP (na fila)
+    assert chamadas.get("renderizacao_modelo", 0) > 0
+    assert chamadas.get("zip_entrada", 0) > 0
+    assert contadores.get("documentos_modelo_compilado", 0) == 4 * OFICIOS_POR_CASO
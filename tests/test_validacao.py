@@ -0,0 +1,27 @@
+import io
+
+import pytest
+
+from lote import COLUNAS_OBRIGATORIAS, ler_planilha
+from validacao import importar_planilha
+
+def _csv(delimitador):
+    cabecalho = delimitador.join(COLUNAS_OBRIGATORIAS)
+    linha = delimitador.join(f"{coluna} 1" for coluna in COLUNAS_OBRIGATORIAS)
+    return f"{cabecalho}\n{linha}\n".encode("utf-8-sig")
+
+@pytest.mark.parametrize("delimitador", [",", ";"])
+def test_csv_com_virgula_ou_ponto_e_virgula(delimitador):
+    importacao = importar_planilha(io.BytesIO(_csv(delimitador)), "casos.csv")
+    assert len(importacao.casos) == 1
+    assert importacao.casos[0]["endereco_acusado"] == "endereco_acusado 1"
+
+    linhas = ler_planilha(io.BytesIO(_csv(delimitador)), "casos.csv")
+    assert len(linhas) == 1
+
+def test_xlsx_invalido():
+    # Um CSV renomeado para .xlsx não é um arquivo ZIP
+    with pytest.raises(ValueError, match="planilha inválida"):
+        importar_planilha(io.BytesIO(_csv(",")), "casos.xlsx")
+    with pytest.raises(ValueError, match="planilha inválida"):
+        ler_planilha(io.BytesIO(b""), "casos.xlsx")
@@ -0,0 +1,194 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from lote import COLUNAS_OBRIGATORIAS, COLUNAS_OPCIONAIS, OFICIOS_POR_CASO, delimitador_csv, ler_xlsx_df
+
+# Número IDEA no formato 000.0.000000, aceitando outros separadores (ou nenhum) e o ano no final
+PADRAO_IDEA = r"^\d{3}[.\-/ ]?\d[.\-/ ]?\d{6}(?:/\d{4})?$"
+
+# CEP citado no endereço (ex.: "CEP 44001344", "cep: 44.001-344")
+PADRAO_CEP = r"(?i)\bCEP\W*(\d{2})\.?(\d{3})\W?(\d{3})\b"
+
+# DDD usado quando o telefone é informado sem ele
+DDD_PADRAO = "75"
+
+# Partículas que ficam em minúsculas nos nomes próprios
+PARTICULAS_NOMES = ("da", "das", "de", "do", "dos", "e")
+
+COLUNAS_TELEFONE = ["telefone_vitima", "telefone_acusado"]
+COLUNAS_NOME = ["nome_vitima", "nome_acusado"]
+COLUNAS_ENDERECO = ["endereco_vitima", "endereco_acusado"]
+
+# Tipo de ofício correspondente a cada um dos três números de um caso
+TIPOS_POR_POSICAO = ("arquivamento", "notificacao_vitima", "notificacao_acusado")
+
+COLUNAS_PROBLEMA = ["linha", "coluna", "valor", "mensagem"]
+
+# Resultado da importação: casos normalizados (lista de dicionários, como em lote.ler_planilha),
+# erros que impedem a geração e avisos, ambos em DataFrames com as colunas COLUNAS_PROBLEMA
+ResultadoImportacao = namedtuple("ResultadoImportacao", "casos erros avisos")
+
+# Função para ler a planilha de casos (CSV ou XLSX) como DataFrame de textos. A coluna
+# "linha" guarda o número da linha na planilha (o cabeçalho é a linha 1).
+def ler_planilha_df(arquivo, nome_arquivo=None):
+    if nome_arquivo is None:
+        nome_arquivo = arquivo if isinstance(arquivo, str) else getattr(arquivo, "name", "")
+    if str(nome_arquivo).lower().endswith(".csv"):
+        df = pd.read_csv(
+            arquivo, sep=delimitador_csv(arquivo), dtype=str, keep_default_na=False, encoding="utf-8-sig",
+        )
+    else:
+        df = ler_xlsx_df(arquivo)
+
+    df.columns = [str(coluna).strip().lower() for coluna in df.columns]
+    faltando = [coluna for coluna in COLUNAS_OBRIGATORIAS if coluna not in df.columns]
+    if faltando:
+        raise ValueError(f"Colunas obrigatórias ausentes na planilha: {', '.join(faltando)}")
+    for coluna in COLUNAS_OPCIONAIS:
+        if coluna not in df.columns:
+            df[coluna] = ""
+
+    df = df[COLUNAS_OBRIGATORIAS + COLUNAS_OPCIONAIS].astype(str)
+    df.insert(0, "linha", np.arange(2, len(df) + 2))
+    # Ignorar linhas totalmente vazias (comuns no final de planilhas)
+    preenchida = (df[COLUNAS_OBRIGATORIAS + COLUNAS_OPCIONAIS].apply(lambda coluna: coluna.str.strip()) != "").any(axis=1)
+    return df[preenchida].reset_index(drop=True)
+
+# Função para montar o DataFrame de problemas das linhas marcadas em "mascara"
+def _problemas(df, mascara, coluna, mensagem):
+    selecionadas = df.loc[mascara]
+    return pd.DataFrame({
+        "linha": selecionadas["linha"].to_numpy(),
+        "coluna": coluna,
+        "valor": selecionadas[coluna].to_numpy(),
+        "mensagem": mensagem if isinstance(mensagem, str) else mensagem.loc[mascara].to_numpy(),
+    }, columns=COLUNAS_PROBLEMA)
+
+# Função para juntar listas de problemas em um único DataFrame, em ordem de linha
+def _juntar(problemas):
+    problemas = [problema for problema in problemas if len(problema)]
+    if not problemas:
+        return pd.DataFrame(columns=COLUNAS_PROBLEMA)
+    return pd.concat(problemas, ignore_index=True).sort_values("linha", kind="stable", ignore_index=True)
+
+# Função para colocar os nomes com a primeira letra de cada palavra maiúscula (partículas em minúsculas)
+def _normalizar_nomes(nomes):
+    nomes = nomes.str.title()
+    for particula in PARTICULAS_NOMES:
+        nomes = nomes.str.replace(f" {particula.title()} ", f" {particula} ", regex=False)
+    return nomes
+
+# Função para normalizar telefones para (DD) 00000-0000 ou (DD) 0000-0000.
+# Devolve os telefones normalizados e a máscara dos que não puderam ser reconhecidos.
+def _normalizar_telefones(telefones):
+    digitos = telefones.str.replace(r"\D", "", regex=True)
+    # Sem o código do país (55) e sem o zero da discagem interurbana
+    digitos = digitos.where(~(digitos.str.len().isin([12, 13]) & digitos.str.startswith("55")), digitos.str[2:])
+    digitos = digitos.where(~(digitos.str.len().isin([11, 12]) & digitos.str.startswith("0")), digitos.str[1:])
+    digitos = digitos.where(~digitos.str.len().isin([8, 9]), DDD_PADRAO + digitos)
+
+    tamanho = digitos.str.len()
+    fixo = tamanho == 10
+    celular = (tamanho == 11) & (digitos.str[2] == "9")
+    normalizados = pd.Series("", index=telefones.index)
+    normalizados[fixo] = "(" + digitos[fixo].str[:2] + ") " + digitos[fixo].str[2:6] + "-" + digitos[fixo].str[6:]
+    normalizados[celular] = (
+        "(" + digitos[celular].str[:2] + ") " + digitos[celular].str[2:7] + "-" + digitos[celular].str[7:]
+    )
+    invalidos = (telefones != "") & ~fixo & ~celular
+    return normalizados.where(~invalidos, telefones), invalidos
+
+# Função para normalizar e validar os casos lidos da planilha, sem percorrer as linhas em Python.
+# Devolve o DataFrame normalizado e um DataFrame com todos os erros encontrados.
+def normalizar_casos(df):
+    df = df.copy()
+    problemas = []
+
+    # Espaços repetidos e nas pontas de todos os campos
+    for coluna in COLUNAS_OBRIGATORIAS + COLUNAS_OPCIONAIS:
+        df[coluna] = df[coluna].str.replace(r"\s+", " ", regex=True).str.strip()
+
+    for coluna in COLUNAS_OBRIGATORIAS:
+        problemas.append(_problemas(df, df[coluna] == "", coluna, "campo obrigatório vazio"))
+
+    # Número IDEA no formato 000.0.000000
+    # (str.match roda vetorizado; str.extract percorreria as linhas em Python)
+    idea_valido = df["idea_numero"].str.match(PADRAO_IDEA)
+    digitos = df.loc[idea_valido, "idea_numero"].str.replace(r"/\d{4}$", "", regex=True).str.replace(r"\D", "", regex=True)
+    df.loc[idea_valido, "idea_numero"] = digitos.str[:3] + "." + digitos.str[3] + "." + digitos.str[4:]
+    problemas.append(_problemas(
+        df, ~idea_valido & (df["idea_numero"] != ""), "idea_numero",
+        "número IDEA inválido (formato esperado: 000.0.000000)"
+    ))
+
+    # Casos repetidos: o mesmo número IDEA em mais de uma linha
+    repetido = idea_valido & df.duplicated("idea_numero", keep="first")
+    primeira_linha = df.groupby("idea_numero")["linha"].transform("first").astype(str)
+    problemas.append(_problemas(
+        df, repetido, "idea_numero", "caso repetido (mesmo número IDEA da linha " + primeira_linha + ")"
+    ))
+
+    for coluna in COLUNAS_NOME:
+        df[coluna] = _normalizar_nomes(df[coluna])
+
+    for coluna in COLUNAS_ENDERECO:
+        df[coluna] = df[coluna].str.replace(PADRAO_CEP, r"CEP: \1\2-\3", regex=True)
+        cep_invalido = df[coluna].str.contains(r"(?i)\bCEP\b") & ~df[coluna].str.contains(r"CEP: \d{5}-\d{3}\b")
+        problemas.append(_problemas(df, cep_invalido, coluna, "CEP inválido (formato esperado: 00000-000)"))
+
+    for coluna in COLUNAS_TELEFONE:
+        df[coluna], invalidos = _normalizar_telefones(df[coluna])
+        problemas.append(_problemas(df, invalidos, coluna, "telefone inválido (informe DDD e número)"))
+
+    return df, _juntar(problemas)
+
+# Função para conferir os casos contra a numeração compartilhada do ano.
+# Com um número inicial digitado, os números do lote já dados a outros casos são erros;
+# casos que já receberam ofícios em algum lote anterior são avisos.
+def verificar_numeracao(df, ano, numero_inicial=None, caminho=None):
+    from numeracao import usos_registrados, ideas_registradas
+
+    erros = []
+    if numero_inicial is not None and len(df):
+        inicio = int(numero_inicial)
+        fim = inicio + len(df) * OFICIOS_POR_CASO - 1
+        registrados = pd.DataFrame(
+            usos_registrados(ano, inicio, fim, caminho), columns=["numero", "idea_registrado", "tipo_registrado"]
+        )
+        if len(registrados):
+            posicao = registrados["numero"] - inicio
+            registrados["indice"] = posicao // OFICIOS_POR_CASO
+            registrados["tipo"] = np.array(TIPOS_POR_POSICAO)[posicao % OFICIOS_POR_CASO]
+            registrados = registrados.join(df[["linha", "idea_numero"]], on="indice")
+            conflito = (registrados["idea_registrado"] != registrados["idea_numero"]) | (
+                registrados["tipo_registrado"] != registrados["tipo"]
+            )
+            registrados = registrados[conflito]
+            erros.append(pd.DataFrame({
+                "linha": registrados["linha"].to_numpy(),
+                "coluna": "numero_oficio",
+                "valor": registrados["numero"].astype(str).to_numpy(),
+                "mensagem": (
+                    "o ofício nº " + registrados["numero"].astype(str) + "/" + str(ano)
+                    + " já foi dado ao IDEA " + registrados["idea_registrado"]
+                ).to_numpy(),
+            }, columns=COLUNAS_PROBLEMA))
+
+    ja_emitido = df["idea_numero"].isin(ideas_registradas(caminho))
+    avisos = [_problemas(df, ja_emitido, "idea_numero", "caso já recebeu ofícios em outro lote")]
+    return _juntar(erros), _juntar(avisos)
+
+# Função para importar uma planilha de casos: lê, normaliza e valida todas as linhas de uma vez.
+# Com o ano, também confere os casos contra a numeração (ver verificar_numeracao).
+def importar_planilha(arquivo, nome_arquivo=None, ano=None, numero_inicial=None, caminho_numeracao=None):
+    df, erros = normalizar_casos(ler_planilha_df(arquivo, nome_arquivo))
+    avisos = pd.DataFrame(columns=COLUNAS_PROBLEMA)
+    if ano is not None:
+        erros_numeracao, avisos = verificar_numeracao(df, ano, numero_inicial, caminho_numeracao)
+        erros = _juntar([erros, erros_numeracao])
+    # Montados a partir das colunas, bem mais rápido que DataFrame.to_dict com textos do Arrow
+    colunas = COLUNAS_OBRIGATORIAS + COLUNAS_OPCIONAIS
+    casos = [dict(zip(colunas, valores)) for valores in zip(*(df[coluna].tolist() for coluna in colunas))]
+    return ResultadoImportacao(casos, erros, avisos)